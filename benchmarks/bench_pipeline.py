@@ -0,0 +1,207 @@
+"""Offline benchmark of the data pipeline stages over the cached NEAR corpus.
+
+Runs fetch-from-cache, split_content, process_repo_data, token counting,
+create_fine_tuning_data and save_as_jsonl against the `cache/*.pkl` corpus,
+and example generation against a local FakeOpenAIServer with configurable
+latency. Each stage reports throughput, p50/p99 latency per work item and
+peak memory, and can be saved as a baseline or compared against one:
+
+    python -m benchmarks.bench_pipeline --cache-dir cache --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_pipeline --cache-dir cache --baseline benchmarks/baseline.json
+
+Exits with status 1 if any stage regressed by more than --tolerance.
+"""
+import argparse
+import copy
+import glob
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from openai import OpenAI
+from fine_tuning.config import load_config
+from fine_tuning.data_fetchers import DataFetcher
+from fine_tuning.data_processors import DataProcessor
+from tests.fake_openai import FakeOpenAIServer
+from fine_tuning.utils import split_list
+
+MB = 1024 * 1024
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def measure(func, make_items, unit, count_units=len, repeat=1):
+    """Time `func` on every work item over `repeat` passes, then trace one more pass for peak memory.
+
+    `make_items()` is called once per pass so memoized state never carries
+    over from one pass to the next; `count_units(items)` gives the number of
+    `unit`s the throughput is reported in.
+    """
+    latencies = []
+    elapsed = 0.0
+    units = 0
+    for _ in range(repeat):
+        items = make_items()
+        units += count_units(items)
+        start = time.perf_counter()
+        for item in items:
+            item_start = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - item_start)
+        elapsed += time.perf_counter() - start
+
+    items = make_items()
+    tracemalloc.start()
+    for item in items:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'unit': unit,
+        'units': units,
+        'seconds': elapsed,
+        'throughput': units / elapsed if elapsed else math.inf,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_mb': peak / MB,
+    }
+
+def load_corpus(cache_dir, fetcher):
+    """Import every legacy `cache/*.pkl` file into the fetcher's store; returns `(identifier, is_repo)` pairs."""
+    sources = []
+    for cache_file in sorted(glob.glob(os.path.join(cache_dir, '*.pkl'))):
+        identifier = os.path.splitext(os.path.basename(cache_file))[0]
+        is_repo = identifier.startswith('repo_')
+        fetcher.store.import_pickle(identifier, 'repo' if is_repo else 'article', cache_file)
+        sources.append((identifier, is_repo))
+    return sources
+
+def run_benchmarks(args, work_dir):
+    config = load_config(args.config)
+    config['cache']['dir'] = os.path.join(work_dir, 'cache')
+    config['cache']['expiry_days'] = 365_000  # The corpus is benchmarked however old it is
+    config['cache']['completions'] = {'enabled': False}
+    config['data_processing']['workers'] = 1
+    config['example_generation']['journal'] = os.path.join(work_dir, 'generation_journal.jsonl')
+    config['example_generation']['backend'] = 'scheduler'
+    max_tokens = config['data_processing']['max_tokens']
+
+    fetcher = DataFetcher(None, config)
+    processor = DataProcessor(None, config)
+    sources = load_corpus(args.cache_dir, fetcher)
+    if not sources:
+        sys.exit(f"No cached corpus found in {args.cache_dir}/*.pkl")
+    repos = {identifier: fetcher.get_cached_data(identifier, is_repo=True) for identifier, is_repo in sources if is_repo}
+    articles = [fetcher.get_cached_data(identifier) for identifier, is_repo in sources if not is_repo]
+    articles = [article for article in articles if article]
+    prompts = processor.process_all(repos, {str(index): article for index, article in enumerate(articles)})
+    examples = [processor.make_example(data['prompt'], data['prompt'].split('\n', 1)[-1], source=data.get('_source'))
+                for data in prompts]
+    fine_tuning_data = processor.create_fine_tuning_data(copy.deepcopy(examples))
+    output_file = os.path.join(work_dir, 'fine_tuning_data.jsonl')
+    print(f"Corpus: {len(repos)} repositories, {len(articles)} articles, {len(prompts)} prompts")
+
+    def fetch_from_cache(source):
+        data = fetcher.get_cached_data(*source)
+        return list(data) if source[1] else data  # Read every blob, not just the index
+
+    def generate(batch):
+        return processor.generate_refined_examples(batch)
+
+    def total_length(items):
+        return sum(len(item) for item in items)
+
+    repeat = args.repeat
+    stages = {
+        'fetch_cache': lambda: measure(fetch_from_cache, lambda: sources, 'sources', repeat=repeat),
+        'split_content': lambda: measure(
+            lambda text: processor.split_content(text, max_tokens), lambda: articles, 'articles', repeat=repeat),
+        'process_repo_data': lambda: measure(
+            processor.process_repo_data, lambda: list(repos.values()), 'files', total_length, repeat),
+        'token_counting': lambda: measure(
+            processor.token_counter.count_examples,
+            lambda: [list(batch) for batch in split_list(copy.deepcopy(examples), args.batch_size)], 'examples',
+            total_length, repeat),
+        'create_fine_tuning_data': lambda: measure(
+            processor.create_fine_tuning_data, lambda: [copy.deepcopy(examples)], 'examples', total_length, repeat),
+        'save_as_jsonl': lambda: measure(
+            lambda data: processor.save_as_jsonl(data, output_file=output_file),
+            lambda: [fine_tuning_data], 'examples', total_length, repeat),
+    }
+
+    with FakeOpenAIServer(latency=args.latency) as server:
+        processor.client = OpenAI(api_key='benchmark', base_url=server.base_url, max_retries=0)
+        generation_prompts = prompts[:args.generation_prompts]
+        stages['generation'] = lambda: measure(
+            generate, lambda: [list(batch) for batch in split_list(generation_prompts, args.batch_size)], 'prompts',
+            total_length, repeat)
+        selected = args.stages or list(stages)
+        return {name: stages[name]() for name in selected}
+
+def compare(results, baseline, tolerance):
+    """Return a message for every stage metric that is worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']:.1f} < baseline {base['throughput']:.1f} {result['unit']}/s")
+        for key in ('p99_ms', 'peak_mb'):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {result[key]:.2f} > baseline {base[key]:.2f}")
+    return regressions
+
+def print_results(results, baseline):
+    print(f"{'stage':<24} {'throughput':>18} {'p50 ms':>10} {'p99 ms':>10} {'peak MB':>9} {'vs baseline':>12}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        change = f"{result['throughput'] / base['throughput'] - 1:+.0%}" if base else '-'
+        throughput = f"{result['throughput']:.1f} {result['unit']}/s"
+        print(f"{name:<24} {throughput:>18} {result['p50_ms']:10.2f} {result['p99_ms']:10.2f} "
+              f"{result['peak_mb']:9.1f} {change:>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--cache-dir', default='cache', help="Directory holding the cached corpus as *.pkl files.")
+    parser.add_argument('--stages', nargs='+', help="Only run these stages.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed passes per stage.")
+    parser.add_argument('--batch-size', type=int, default=256, help="Examples per token-counting item and prompts per generation item.")
+    parser.add_argument('--generation-prompts', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds the fake OpenAI server takes per completion.")
+    parser.add_argument('--baseline', default='benchmarks/baseline.json')
+    parser.add_argument('--save-baseline', metavar='PATH', help="Write the results as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed fractional regression per metric.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmarks(args, work_dir)
+
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
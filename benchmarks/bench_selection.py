@@ -0,0 +1,32 @@
+"""Micro-benchmark for example selection over a large synthetic candidate pool.
+
+Times ExampleSelector filling a target from tens of thousands of candidates:
+
+    python -m benchmarks.bench_selection --examples 50000 --target 5000
+"""
+import argparse
+import random
+import time
+from fine_tuning.selection import ExampleSelector
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--examples', type=int, default=50_000)
+    parser.add_argument('--target', type=int, default=5000)
+    parser.add_argument('--max-tokens', type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    sizes = [random.randint(100, 4000) for _ in range(args.examples)]
+    examples = [{'messages': [], '_source': f'source-{i % 20}'} for i in range(args.examples)]
+    selector = ExampleSelector(max_tokens=args.max_tokens, target_examples=args.target)
+
+    start = time.perf_counter()
+    selected = selector.select(examples, sizes)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.examples} candidates, {len(selected)} selected, {selector.stats['total_tokens']} tokens")
+    print(f"{'select':<14} {elapsed:8.3f}s")
+
+if __name__ == '__main__':
+    main()
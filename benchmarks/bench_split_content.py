@@ -0,0 +1,69 @@
+"""Micro-benchmark for token chunking over the cached NEAR corpus.
+
+Compares the original per-token splitting loop with TokenChunker's sliced
+single-text and batch paths:
+
+    python -m benchmarks.bench_split_content --cache-dir cache --max-tokens 1000
+"""
+import argparse
+import glob
+import os
+import pickle
+import time
+from tiktoken import get_encoding
+from fine_tuning.chunking import TokenChunker
+
+def legacy_split_content(content, max_tokens):
+    """The per-token loop `DataProcessor.split_content` used before TokenChunker."""
+    encoding = get_encoding('cl100k_base')
+    tokens = encoding.encode(content)
+    splits = []
+    current_chunk = []
+    for token in tokens:
+        current_chunk.append(token)
+        if len(current_chunk) >= max_tokens:
+            splits.append(encoding.decode(current_chunk))
+            current_chunk = []
+    if current_chunk:
+        splits.append(encoding.decode(current_chunk))
+    return splits
+
+def load_corpus(cache_dir):
+    """Load every cached repository file and article as a flat list of texts."""
+    texts = []
+    for cache_file in sorted(glob.glob(os.path.join(cache_dir, '*.pkl'))):
+        with open(cache_file, 'rb') as f:
+            data = pickle.load(f)['data']
+        if isinstance(data, str):
+            texts.append(data)
+        else:
+            texts.extend(content for _, content in data)
+    return texts
+
+def time_call(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cache-dir', default='cache')
+    parser.add_argument('--max-tokens', type=int, default=1000)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.cache_dir)
+    chunker = TokenChunker(args.max_tokens)
+    print(f"Corpus: {len(texts)} texts, {sum(len(text) for text in texts) / 1e6:.1f}M characters")
+
+    legacy_time, legacy_splits = time_call(lambda: [legacy_split_content(text, args.max_tokens) for text in texts])
+    single_time, single_splits = time_call(lambda: [chunker.split(text) for text in texts])
+    batch_time, batch_splits = time_call(lambda: chunker.split_batch(texts))
+
+    chunk_count = sum(len(splits) for splits in legacy_splits)
+    print(f"{'legacy loop':<14} {legacy_time:8.2f}s  {chunk_count} chunks")
+    for name, elapsed, splits in (('sliced', single_time, single_splits), ('sliced batch', batch_time, batch_splits)):
+        print(f"{name:<14} {elapsed:8.2f}s  {sum(len(s) for s in splits)} chunks  "
+              f"{legacy_time / elapsed:5.1f}x faster")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Micro-benchmark for token counting over a synthetic fine-tuning dataset.
+
+Compares `utils.num_tokens_from_messages` per example with TokenCounter's
+batched, memoized count:
+
+    python -m benchmarks.bench_token_counter --examples 5000
+"""
+import argparse
+import time
+from fine_tuning.token_counter import TokenCounter
+from fine_tuning.utils import num_tokens_from_messages
+
+def make_examples(count):
+    """Build examples shaped like generated NEAR question/answer pairs."""
+    return [
+        {
+            "messages": [
+                {"role": "user", "content": f"Explain how cross-contract call {i} is scheduled on NEAR. " * 20},
+                {"role": "assistant", "content": f"Receipt {i} is routed to the receiver shard and executed. " * 60}
+            ]
+        }
+        for i in range(count)
+    ]
+
+def time_call(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--examples', type=int, default=5000)
+    args = parser.parse_args()
+
+    examples = make_examples(args.examples)
+    counter = TokenCounter()
+    counter.encoding()  # Load the encoder outside the timed region
+
+    legacy_time, legacy_total = time_call(lambda: sum(num_tokens_from_messages(example['messages']) for example in examples))
+    batch_time, batch_total = time_call(lambda: counter.count_examples(examples))
+    memo_time, _ = time_call(lambda: counter.count_examples(examples))
+
+    assert legacy_total == batch_total
+    print(f"{args.examples} examples, {batch_total} tokens")
+    print(f"{'legacy':<14} {legacy_time:8.3f}s")
+    print(f"{'batched':<14} {batch_time:8.3f}s  {legacy_time / batch_time:5.1f}x faster")
+    print(f"{'memoized':<14} {memo_time:8.3f}s")
+
+if __name__ == '__main__':
+    main()
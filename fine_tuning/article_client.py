@@ -0,0 +1,110 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from fine_tuning.metrics import metrics
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+
+class ArticleClient:
+    """Fetch articles over one pooled keep-alive session, revalidating cached copies.
+
+    Connections are kept per host in the session's pool, so the articles on a
+    host share a connection instead of each paying for a new TCP and TLS
+    handshake. Every stored article keeps the response's ETag and
+    Last-Modified validators in its corpus store metadata; once the copy
+    expires it is revalidated with a conditional GET, and a 304 response only
+    refreshes its timestamp. Pages that yield no text (or are forbidden) are
+    stored as empty entries and not requested again for `negative_ttl_hours`;
+    an article that already has text keeps it when revalidation fails.
+    """
+
+    def __init__(self, store, config):
+        articles_config = config['articles']
+        self.store = store
+        self.expiry = timedelta(days=config['cache'].get('expiry_days', 7))
+        self.negative_ttl = timedelta(hours=articles_config.get('negative_ttl_hours', 24))
+        self.timeout = articles_config.get('timeout', 30)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(
+            pool_connections=articles_config.get('pool_connections', 10),
+            pool_maxsize=articles_config.get('per_host_limit', 2),
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stats = {'fresh': 0, 'negative': 0, 'not_modified': 0, 'downloaded': 0, 'empty': 0, 'stale': 0}
+        self._lock = threading.Lock()
+
+    def fetch(self, url, extract):
+        """Return an article's text, requesting it only when the cached copy is stale.
+
+        `extract(content, content_type)` turns a downloaded body into text.
+        Returns "" for pages without content.
+        """
+        timestamp = self.store.get_timestamp(url)
+        metadata = self.store.get_metadata(url) if timestamp else {}
+        cached_text = self.store.load(url) if timestamp else None
+        if timestamp:
+            age = datetime.now() - timestamp
+            if not cached_text and age < self.negative_ttl:
+                self._count('negative')
+                return ""
+            if cached_text and age < self.expiry:
+                self._count('fresh')
+                return cached_text
+
+        headers = {}
+        if cached_text:
+            if metadata.get('etag'):
+                headers['If-None-Match'] = metadata['etag']
+            if metadata.get('last_modified'):
+                headers['If-Modified-Since'] = metadata['last_modified']
+
+        try:
+            with metrics.timer('article_request_seconds'):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached_text:
+                self.store.touch(url)
+                self._count('not_modified')
+                logging.info(f"Article unchanged since last fetch: {url}")
+                return cached_text
+            if response.status_code == 403 and not cached_text:
+                logging.error(f"Access forbidden for URL: {url}")
+                self._save_empty(url)
+                return ""
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if not cached_text:
+                raise
+            # A failed revalidation keeps serving the copy we have rather than dropping the article
+            logging.warning(f"Could not revalidate article {url}; using the stale copy: {e}")
+            self._count('stale')
+            return cached_text
+
+        article_text = extract(response.content, response.headers.get('Content-Type', ''))
+        if not article_text:
+            logging.warning(f"Could not find content in article: {url}")
+            self._save_empty(url)
+            return ""
+        self.store.save(url, 'article', article_text, metadata={
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        })
+        self._count('downloaded')
+        logging.info(f"Successfully fetched article: {url}")
+        return article_text
+
+    def close(self):
+        self.session.close()
+
+    def _save_empty(self, url):
+        """Record a page without content so it is skipped until the negative TTL passes."""
+        self.store.save(url, 'article', "", metadata={'empty': True})
+        self._count('empty')
+
+    def _count(self, key):
+        metrics.inc('article_fetches_total', result=key)
+        with self._lock:
+            self.stats[key] += 1
@@ -0,0 +1,128 @@
+import io
+import json
+import time
+import logging
+from fine_tuning.metrics import metrics
+
+# Per-batch input limits of the OpenAI Batch API
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+TERMINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+def batch_line(custom_id, request):
+    """Serialize one chat completion request as a Batch API input line."""
+    line = {'custom_id': str(custom_id), 'method': 'POST', 'url': BATCH_ENDPOINT, 'body': request}
+    return (json.dumps(line) + '\n').encode('utf-8')
+
+def shard_requests(requests, max_requests=MAX_BATCH_REQUESTS, max_bytes=MAX_BATCH_BYTES):
+    """Split requests into Batch API input files within the request and byte limits.
+
+    Yields one list of `(index, line)` pairs per shard, where `index` is the
+    request's position in `requests`.
+    """
+    shard, shard_bytes = [], 0
+    for index, request in enumerate(requests):
+        line = batch_line(index, request)
+        if shard and (len(shard) >= max_requests or shard_bytes + len(line) > max_bytes):
+            yield shard
+            shard, shard_bytes = [], 0
+        shard.append((index, line))
+        shard_bytes += len(line)
+    if shard:
+        yield shard
+
+class BatchGenerator:
+    """Generate chat completions through the OpenAI Batch API.
+
+    Requests are written as JSONL shards, uploaded and submitted as batches
+    together, then polled until each finishes. Output files are streamed back
+    line by line, so results arrive without holding a whole shard in memory.
+    """
+
+    def __init__(self, client, config):
+        self.client = client
+        self.config = config
+        batch_config = config['example_generation'].get('batch', {})
+        self.poll_interval = batch_config.get('poll_interval', 30)
+        self.completion_window = batch_config.get('completion_window', '24h')
+        self.max_requests = batch_config.get('max_requests', MAX_BATCH_REQUESTS)
+        self.max_bytes = batch_config.get('max_bytes', MAX_BATCH_BYTES)
+        self.stats = {'batches': 0, 'requests': 0, 'completed': 0, 'failed': 0}
+
+    def run(self, requests, on_result=None):
+        """Complete every request; returns the assistant messages in request order.
+
+        Requests that fail in the batch yield None. `on_result(index, content)`
+        is called as each result is read back.
+        """
+        results = [None] * len(requests)
+        reported = set()
+        batch_ids = [self.submit(shard) for shard in shard_requests(requests, self.max_requests, self.max_bytes)]
+        for batch in self.wait(batch_ids):
+            for index, content in self.read_results(batch):
+                results[index] = content
+                reported.add(index)
+                self.stats['completed' if content is not None else 'failed'] += 1
+                if on_result:
+                    on_result(index, content)
+        # Requests of expired or cancelled batches never show up in an output file
+        for index in range(len(requests)):
+            if index not in reported:
+                self.stats['failed'] += 1
+                if on_result:
+                    on_result(index, None)
+        return results
+
+    def submit(self, shard):
+        """Upload a shard as a batch input file and create its batch; returns the batch id."""
+        input_file = self.client.files.create(
+            file=('batch_input.jsonl', io.BytesIO(b''.join(line for _, line in shard))),
+            purpose='batch',
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        self.stats['batches'] += 1
+        self.stats['requests'] += len(shard)
+        logging.info(f"Submitted batch {batch.id} with {len(shard)} requests.")
+        return batch.id
+
+    def wait(self, batch_ids):
+        """Poll the batches and yield each one as it reaches a terminal status."""
+        pending = list(batch_ids)
+        while pending:
+            for batch_id in list(pending):
+                batch = self.client.batches.retrieve(batch_id)
+                if batch.status in TERMINAL_STATUSES:
+                    pending.remove(batch_id)
+                    logging.info(f"Batch {batch.id} {batch.status}: {batch.request_counts}")
+                    yield batch
+            if pending:
+                time.sleep(self.poll_interval)
+
+    def read_results(self, batch):
+        """Stream `(index, content)` pairs from a finished batch's output and error files."""
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            with self.client.files.with_streaming_response.content(file_id) as response:
+                for line in response.iter_lines():
+                    if line.strip():
+                        yield self.parse_result(json.loads(line))
+
+    def parse_result(self, result):
+        """Extract the assistant message from a Batch API output line."""
+        index = int(result['custom_id'])
+        response = result.get('response') or {}
+        if result.get('error') or response.get('status_code') != 200:
+            logging.error(f"Batch request {index} failed: {result.get('error') or response.get('body')}")
+            metrics.inc('openai_failures_total', endpoint='batches')
+            return index, None
+        usage = response['body'].get('usage') or {}
+        metrics.inc('openai_tokens_total', usage.get('prompt_tokens', 0), direction='in')
+        metrics.inc('openai_tokens_total', usage.get('completion_tokens', 0), direction='out')
+        return index, response['body']['choices'][0]['message']['content']
@@ -0,0 +1,63 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+def prompt_id(data):
+    """Stable identifier for a prompt, independent of its position in the shuffled list."""
+    return hashlib.sha256(data['prompt'].encode('utf-8')).hexdigest()
+
+class GenerationJournal:
+    """Append-only JSONL journal of finished examples.
+
+    Each line records a prompt ID and the example generated for it, and is
+    flushed as soon as it is written. A crashed or interrupted run loses at most
+    the requests that were in flight.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self):
+        """Return `{prompt_id: example}` for every completed prompt in the journal."""
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be cut short if the process was killed mid-write
+                    logging.warning(f"Skipping unreadable line {line_number} in {self.path}")
+                    continue
+                completed[entry['prompt_id']] = entry['example']
+        return completed
+
+    def open(self, resume=False):
+        """Open the journal for appending; a fresh run starts from an empty journal."""
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        return self
+
+    def append(self, prompt_id, example):
+        """Record a finished example."""
+        line = json.dumps({'prompt_id': prompt_id, 'example': example}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,190 @@
+import os
+import re
+import tiktoken
+
+class TokenChunker:
+    """Split text into chunks of at most `max_tokens` tokens.
+
+    The encoding is loaded once per chunker and chunks are cut by slicing the
+    token list, so no Python-level work is done per token.
+    """
+
+    def __init__(self, max_tokens, overlap=0, encoding_name='cl100k_base', num_threads=8):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be a positive integer.")
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("overlap must be non-negative and smaller than max_tokens.")
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.num_threads = num_threads
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def split(self, text):
+        """Split a single text into chunk strings."""
+        return [self.encoding.decode(window) for window in self._windows(self.encoding.encode_ordinary(text))]
+
+    def split_batch(self, texts, paths=None):
+        """Split many texts at once, encoding them on tiktoken's thread pool.
+
+        Returns one list of chunk strings per input text, in input order. File
+        paths are accepted for parity with StructuredChunker and ignored.
+        """
+        token_lists = self.encoding.encode_ordinary_batch(texts, num_threads=self.num_threads)
+        # Decoding stays sequential: decode_batch's thread hand-off costs more than the decode itself
+        decode = self.encoding.decode
+        return [[decode(window) for window in self._windows(tokens)] for tokens in token_lists]
+
+    def split_stream(self, segments, path=None):
+        """Yield chunk strings for text that arrives in segments, such as the pages of a document.
+
+        Segments are joined with newlines. The last chunk of what has arrived so
+        far is held back and split again together with the next segment, so only
+        one chunk and one segment are ever in memory.
+        """
+        tail = None
+        for segment in segments:
+            chunks = self.split_batch([segment if tail is None else f"{tail}\n{segment}"], [path])[0]
+            if chunks:
+                yield from chunks[:-1]
+                tail = chunks[-1]
+        if tail is not None:
+            yield tail
+
+    def _windows(self, tokens):
+        """Slice a token list into windows, each overlapping the previous one by `overlap` tokens."""
+        if not tokens:
+            return []
+        step = self.max_tokens - self.overlap
+        # A trailing window that would only repeat the previous overlap is dropped
+        last_start = max(len(tokens) - self.overlap, 1)
+        return [tokens[start:start + self.max_tokens] for start in range(0, last_start, step)]
+
+LANGUAGES = {
+    '.rs': 'rust',
+    '.ts': 'javascript', '.tsx': 'javascript', '.js': 'javascript', '.jsx': 'javascript', '.mjs': 'javascript',
+    '.py': 'python',
+    '.md': 'markdown', '.mdx': 'markdown',
+}
+
+# Lines that open a syntactic unit; group 1 is the indentation, which ranks nesting depth
+BOUNDARY_PATTERNS = {
+    'rust': re.compile(
+        r'^(\s*)(?:pub(?:\([^)]*\))?\s+)?(?:(?:async|const|unsafe|extern(?:\s+"[^"]*")?)\s+)*'
+        r'(?:fn|impl|struct|enum|trait|mod|type|macro_rules!)\b'
+    ),
+    'javascript': re.compile(
+        r'^(\s*)(?:export\s+(?:default\s+)?)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?'
+        r'(?:function\*?|class|interface|type|enum|namespace|const|let|var)\b'
+        r'|^(\s+)(?:(?:public|private|protected|static|async|readonly|get|set)\s+)*[\w$]+\s*\(.*\)\s*(?::[^{]*)?\{\s*$'
+    ),
+    'python': re.compile(r'^(\s*)(?:async\s+def|def|class)\b'),
+    'markdown': re.compile(r'^(#{1,6})\s'),
+}
+
+# Comments, attributes and decorators that belong to the unit below them
+LEADING_PATTERN = re.compile(r'^\s*(?:#\[|@|//|/\*|\*|#(?!\[))')
+
+class StructuredChunker(TokenChunker):
+    """Split source files on syntactic boundaries within a token budget.
+
+    Code is cut before functions, impls, classes and similar top-level items,
+    keeping their doc comments, attributes and decorators attached; Markdown is
+    cut before headings and plain text between paragraphs. A unit larger than
+    `max_tokens` is cut again at the next nesting level (methods inside an impl
+    or class, subsections under a heading), and only falls back to fixed token
+    windows when it has no inner boundaries. Neighbouring units are then merged
+    while they fit, so small items share one chunk.
+    """
+
+    def split(self, text, path=None):
+        """Split a single text into chunk strings; the path's extension selects the language."""
+        return self.split_batch([text], [path])[0]
+
+    def split_batch(self, texts, paths=None):
+        """Split many texts, token-counting all their lines in one batch call.
+
+        Returns one list of chunk strings per input text, in input order.
+        """
+        paths = paths or [None] * len(texts)
+        lines_per_text = [text.splitlines(keepends=True) for text in texts]
+        line_counts = iter(self.encoding.encode_ordinary_batch(
+            [line for lines in lines_per_text for line in lines], num_threads=self.num_threads
+        ))
+        spans_per_text = []
+        for lines, path in zip(lines_per_text, paths):
+            prefix = [0]
+            for _ in lines:
+                prefix.append(prefix[-1] + len(next(line_counts)))
+            marks = self._boundaries(lines, self._language(path))
+            spans_per_text.append(self._merge(self._split_span(marks, prefix, 0, len(lines)), prefix))
+
+        chunks = [''.join(lines[start:end]) for lines, spans in zip(lines_per_text, spans_per_text) for start, end in spans]
+        # Line counts can differ slightly from the joined text's count, so every chunk is checked
+        chunk_tokens = iter(self.encoding.encode_ordinary_batch(chunks, num_threads=self.num_threads))
+        chunks = iter(chunks)
+        results = []
+        for spans in spans_per_text:
+            splits = []
+            for _ in spans:
+                chunk, tokens = next(chunks), next(chunk_tokens)
+                if not chunk.strip():
+                    continue
+                if len(tokens) <= self.max_tokens:
+                    splits.append(chunk)
+                else:
+                    splits.extend(self.encoding.decode(window) for window in self._windows(tokens))
+            results.append(splits)
+        return results
+
+    def _language(self, path):
+        if not path:
+            return 'text'
+        return LANGUAGES.get(os.path.splitext(path)[1].lower(), 'text')
+
+    def _boundaries(self, lines, language):
+        """Return `(line_index, rank)` for every line that starts a unit; lower ranks are outer units."""
+        marks = []
+        if language == 'text':
+            # Paragraphs: a non-blank line after a blank one
+            return [(i, 0) for i in range(1, len(lines)) if lines[i].strip() and not lines[i - 1].strip()]
+        pattern = BOUNDARY_PATTERNS[language]
+        in_fence = False
+        for i, line in enumerate(lines):
+            if language == 'markdown' and line.lstrip().startswith(('```', '~~~')):
+                in_fence = not in_fence
+                continue
+            match = None if in_fence else pattern.match(line)
+            if not match:
+                continue
+            rank = len(next(group for group in match.groups() if group is not None).expandtabs(4))
+            start = i
+            if language != 'markdown':
+                while start > 0 and LEADING_PATTERN.match(lines[start - 1]) and (not marks or start - 1 > marks[-1][0]):
+                    start -= 1
+            if start > 0:
+                marks.append((start, rank))
+        return marks
+
+    def _split_span(self, marks, prefix, start, end):
+        """Cut `lines[start:end]` at its outermost boundaries until every piece fits, or cannot be cut."""
+        if prefix[end] - prefix[start] <= self.max_tokens:
+            return [(start, end)]
+        inner = [(i, rank) for i, rank in marks if start < i < end]
+        if not inner:
+            return [(start, end)]
+        outer_rank = min(rank for _, rank in inner)
+        cuts = [start] + [i for i, rank in inner if rank == outer_rank] + [end]
+        spans = []
+        for span_start, span_end in zip(cuts, cuts[1:]):
+            spans.extend(self._split_span(marks, prefix, span_start, span_end))
+        return spans
+
+    def _merge(self, spans, prefix):
+        """Merge neighbouring spans while the merged span stays within `max_tokens`."""
+        merged = []
+        for start, end in spans:
+            if merged and prefix[end] - prefix[merged[-1][0]] <= self.max_tokens:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
@@ -0,0 +1,155 @@
+import os
+import json
+import mmap
+import pickle
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections.abc import Sequence
+from datetime import datetime
+
+class LazyRepoData(Sequence):
+    """Read-only `(path, content)` sequence whose file bodies are loaded on access.
+
+    Only paths and blob digests are held in memory, so a repository costs a few
+    bytes per file until its contents are iterated. Instances are picklable and can
+    be handed to worker processes.
+    """
+
+    def __init__(self, blob_dir, entries):
+        self.blob_dir = blob_dir
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyRepoData(self.blob_dir, self.entries[index])
+        path, digest = self.entries[index]
+        return path, read_blob(self.blob_dir, digest)
+
+    def digests(self):
+        """Return the `(path, digest)` pairs without reading any file bodies."""
+        return list(self.entries)
+
+def blob_path(blob_dir, digest):
+    """Return the on-disk location of a blob, fanned out by digest prefix."""
+    return os.path.join(blob_dir, digest[:2], digest)
+
+def read_blob(blob_dir, digest):
+    """Decode a blob straight from a memory map, without first copying it into a bytes object."""
+    with open(blob_path(blob_dir, digest), 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return str(mapped, 'utf-8')
+
+class CorpusStore:
+    """Content-addressed cache for fetched repositories and articles.
+
+    A small SQLite index records each source's timestamp, metadata and the SHA-256
+    digest of every file. File bodies live once per digest under `blobs/`, so
+    boilerplate shared between repositories is stored a single time.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.blob_dir = os.path.join(store_dir, 'blobs')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(store_dir, 'index.sqlite'), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "identifier TEXT PRIMARY KEY, kind TEXT NOT NULL, timestamp REAL NOT NULL, metadata TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "identifier TEXT NOT NULL, position INTEGER NOT NULL, path TEXT NOT NULL, "
+                "digest TEXT NOT NULL, size INTEGER NOT NULL, PRIMARY KEY (identifier, position))"
+            )
+
+    def get_timestamp(self, identifier):
+        """Return when a source was stored, without touching any file bodies."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT timestamp FROM entries WHERE identifier = ?", (identifier,)
+            ).fetchone()
+        return datetime.fromtimestamp(row[0]) if row else None
+
+    def get_metadata(self, identifier):
+        """Return the metadata dict stored alongside a source."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metadata FROM entries WHERE identifier = ?", (identifier,)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    def load(self, identifier):
+        """Load a source as a `LazyRepoData` for repositories or a string for articles."""
+        with self._lock:
+            entry = self._conn.execute(
+                "SELECT kind FROM entries WHERE identifier = ?", (identifier,)
+            ).fetchone()
+            if not entry:
+                return None
+            rows = self._conn.execute(
+                "SELECT path, digest FROM files WHERE identifier = ? ORDER BY position", (identifier,)
+            ).fetchall()
+        if entry[0] == 'repo':
+            return LazyRepoData(self.blob_dir, rows)
+        return read_blob(self.blob_dir, rows[0][1]) if rows else ""
+
+    def save(self, identifier, kind, data, timestamp=None, metadata=None):
+        """Store a repository's `(path, content)` list or an article's text."""
+        files = data if kind == 'repo' else [('', data)]
+        rows = []
+        for position, (path, content) in enumerate(files):
+            digest, size = self._write_blob(content.encode('utf-8'))
+            rows.append((identifier, position, path, digest, size))
+        timestamp = (timestamp or datetime.now()).timestamp()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (identifier, kind, timestamp, metadata) VALUES (?, ?, ?, ?)",
+                (identifier, kind, timestamp, json.dumps(metadata or {})),
+            )
+            self._conn.execute("DELETE FROM files WHERE identifier = ?", (identifier,))
+            self._conn.executemany(
+                "INSERT INTO files (identifier, position, path, digest, size) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def touch(self, identifier, metadata=None):
+        """Mark a source as fresh without rewriting its files."""
+        with self._lock, self._conn:
+            if metadata is None:
+                self._conn.execute(
+                    "UPDATE entries SET timestamp = ? WHERE identifier = ?",
+                    (datetime.now().timestamp(), identifier),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE entries SET timestamp = ?, metadata = ? WHERE identifier = ?",
+                    (datetime.now().timestamp(), json.dumps(metadata), identifier),
+                )
+
+    def _write_blob(self, content):
+        """Write a blob once per digest; identical content is never stored twice."""
+        digest = hashlib.sha256(content).hexdigest()
+        path = blob_path(self.blob_dir, digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent readers never see a partial blob
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        return digest, len(content)
+
+    def import_pickle(self, identifier, kind, pickle_path):
+        """Import a legacy `cache/*.pkl` entry, keeping its original timestamp."""
+        with open(pickle_path, 'rb') as f:
+            cached_data = pickle.load(f)
+        self.save(identifier, kind, cached_data['data'], timestamp=cached_data['timestamp'])
+        logging.info(f"Migrated legacy cache file {pickle_path} into the corpus store.")
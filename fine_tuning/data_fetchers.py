@@ -1,12 +1,27 @@
 import os
+import base64
+import hashlib
 import logging
 from fine_tuning.utils import error_handler, retry_on_exception
+from fine_tuning.corpus_store import CorpusStore
+from fine_tuning.file_filter import FileFilter
+from fine_tuning.article_client import ArticleClient
+from fine_tuning.extraction import TextExtractor
+from fine_tuning.metrics import metrics
 import requests
-from bs4 import BeautifulSoup
-import pickle
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from PyPDF2 import PdfReader
-from io import BytesIO
+from urllib.parse import urlparse
+from github import RateLimitExceededException
+from tqdm import tqdm
+
+def git_blob_sha(content):
+    """Compute the SHA git assigns to a blob with the given bytes."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
 
 class DataFetcher:
     def __init__(self, github_client, config):
@@ -15,34 +30,324 @@ class DataFetcher:
         self.cache_dir = config['cache']['dir']
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
+        self.store = CorpusStore(os.path.join(self.cache_dir, 'store'))
+        self.file_filter = FileFilter(config)
+        self.article_client = ArticleClient(self.store, config)
+        self.text_extractor = TextExtractor(config)
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+        self._quota_lock = threading.Lock()
+
+    def fetch_all(self, repo_names, urls):
+        """Fetch repositories and articles concurrently.
+
+        Returns two dicts, `{repo_name: repo_data}` and `{url: article_text}`, in
+        configuration order. Sources that fail or yield no data are left out.
+        """
+        results = {}
+        with tqdm(total=len(repo_names) + len(urls), desc="Fetching sources") as progress:
+            for kind, identifier, data in self.iter_sources(repo_names, urls):
+                results[(kind, identifier)] = data
+                progress.update(1)
+
+        all_repo_data = {name: results[('repo', name)] for name in repo_names if results.get(('repo', name))}
+        all_article_data = {url: results[('article', url)] for url in urls if results.get(('article', url))}
+        failed = len(repo_names) + len(urls) - len(all_repo_data) - len(all_article_data)
+        logging.info(f"Fetched {len(all_repo_data)}/{len(repo_names)} repositories and "
+                     f"{len(all_article_data)}/{len(urls)} articles ({failed} failed or empty).")
+        return all_repo_data, all_article_data
+
+    def iter_sources(self, repo_names, urls):
+        """Fetch repositories and articles concurrently, yielding each as it completes.
+
+        Yields `(kind, identifier, data)` tuples where kind is 'repo' or 'article'.
+        A failed source is logged and yielded with `data=None`.
+        """
+        tasks = [('repo', repo_name) for repo_name in repo_names] + [('article', url) for url in urls]
+        max_workers = self.config['github'].get('max_workers', 10)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._fetch_source, kind, identifier): (kind, identifier)
+                       for kind, identifier in tasks}
+            for future in as_completed(futures):
+                kind, identifier = futures[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to fetch {kind} {identifier}: {e}")
+                    data = None
+                yield kind, identifier, data
+        logging.info(f"File filter stats: {self.file_filter.stats}")
+        logging.info(f"Article fetch stats: {self.article_client.stats}")
+
+    def _fetch_source(self, kind, identifier):
+        """Fetch a single repository or article while holding a slot for its host."""
+        with metrics.timer('fetch_seconds', kind=kind):
+            if kind == 'article':
+                with self._host_slot(urlparse(identifier).netloc):
+                    return self.fetch_article_data(identifier)
+
+            max_retries = self.config['github'].get('rate_limit_retries', 3)
+            for attempt in range(max_retries + 1):
+                self._wait_for_github_quota()
+                try:
+                    with self._host_slot('github.com'):
+                        return self.fetch_repo_data(identifier)
+                except RateLimitExceededException as e:
+                    metrics.inc('github_rate_limited_total')
+                    if attempt == max_retries:
+                        raise
+                    self._sleep_until_reset(e.headers or {})
+
+    @contextmanager
+    def _host_slot(self, host):
+        """Bound the number of concurrent requests made to a single host."""
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                if host == 'github.com':
+                    limit = self.config['github'].get('per_host_limit', self.config['github'].get('max_workers', 10))
+                else:
+                    limit = self.config['articles'].get('per_host_limit', 2)
+                self._host_limits[host] = threading.BoundedSemaphore(limit)
+            semaphore = self._host_limits[host]
+        with semaphore:
+            yield
+
+    def _wait_for_github_quota(self):
+        """Sleep until the GitHub quota resets when the remaining requests run low."""
+        # Only one thread waits on the quota; the others queue up behind it
+        with self._quota_lock:
+            remaining, _ = self.github_client.rate_limiting
+            if remaining > self.config['github'].get('min_remaining_quota', 50):
+                return
+            wait_seconds = max(self.github_client.rate_limiting_resettime - time.time(), 0) + 1
+            metrics.inc('github_quota_waits_total')
+            logging.warning(f"GitHub quota low ({remaining} requests left). Waiting {wait_seconds:.0f}s for reset.")
+            time.sleep(wait_seconds)
+
+    def _sleep_until_reset(self, headers):
+        """Back off according to GitHub's rate-limit response headers."""
+        headers = {key.lower(): value for key, value in headers.items()}
+        if 'retry-after' in headers:
+            wait_seconds = float(headers['retry-after'])
+        elif 'x-ratelimit-reset' in headers:
+            wait_seconds = max(float(headers['x-ratelimit-reset']) - time.time(), 0) + 1
+        else:
+            wait_seconds = 60
+        logging.warning(f"GitHub rate limit exceeded. Backing off for {wait_seconds:.0f}s.")
+        time.sleep(wait_seconds)
 
     @error_handler
     @retry_on_exception(exceptions=(requests.RequestException,))
     def fetch_repo_data(self, repo_name):
-        """Fetch and process repository data from a given GitHub repository."""
+        """Fetch and process repository data from a given GitHub repository.
+
+        A cached copy is only reused as-is while the file filter settings it was
+        fetched with are unchanged; otherwise it is refreshed against the tree.
+        """
         logging.info(f"Fetching repository data: {repo_name}")
         cached_data = self.get_cached_data(repo_name, is_repo=True)
-        if cached_data:
+        metadata = self.store.get_metadata(repo_name)
+        filter_changed = metadata.get('file_filter') != self.file_filter.fingerprint()
+        if cached_data and not filter_changed:
             logging.info(f"Using cached data for repository: {repo_name}")
             return cached_data
+        if cached_data:
+            logging.info(f"File filter changed since {repo_name} was cached; fetching it again.")
 
-        repo = self.github_client.get_repo(repo_name)
-        contents = repo.get_contents("")
-        repo_data = self._process_contents(contents, repo)
-        self.save_cached_data(repo_name, repo_data, is_repo=True)
+        # Re-validate an expired cache entry before downloading the repository again
+        head_sha, etag = None, None
+        if not self._local_archive_path(repo_name):
+            head_sha, etag = self._get_head_commit(repo_name, metadata)
+        if head_sha and metadata.get('head_sha'):
+            refreshed_data = self._refresh_repo(repo_name, metadata, head_sha, etag, filter_changed)
+            if refreshed_data is not None:
+                return refreshed_data
+
+        blob_shas = {}
+        if self.config['github'].get('fetch_mode', 'archive') == 'archive':
+            repo_data = self._fetch_filtered_blobs(repo_name, head_sha, blob_shas) if head_sha else None
+            if repo_data is None:
+                repo_data = self._fetch_repo_archive(repo_name, blob_shas, ref=head_sha)
+        else:
+            repo = self.github_client.get_repo(repo_name)
+            ref_kwargs = {'ref': head_sha} if head_sha else {}
+            repo_data = self._process_contents(repo.get_contents("", **ref_kwargs), repo, blob_shas, ref=head_sha)
+        self.store.save(repo_name, 'repo', repo_data, metadata=self._repo_metadata(head_sha, etag, blob_shas))
         logging.info(f"Successfully fetched repository: {repo_name}")
+        # Hand back the lazy view so file bodies are not kept in memory
+        return self.store.load(repo_name)
+
+    def _get_head_commit(self, repo_name, metadata):
+        """Resolve the default branch head SHA with a conditional request.
+
+        Returns `(sha, etag)`. A 304 reply reuses the stored SHA and does not count
+        against the GitHub rate limit.
+        """
+        headers = {'Accept': 'application/vnd.github.sha'}
+        if metadata.get('etag'):
+            headers['If-None-Match'] = metadata['etag']
+        status, response_headers, body = self.github_client.requester.requestJson(
+            "GET", f"/repos/{repo_name}/commits/HEAD", headers=headers
+        )
+        if status == 304:
+            return metadata.get('head_sha'), metadata['etag']
+        if status != 200:
+            logging.warning(f"Could not resolve head commit for {repo_name} (HTTP {status}).")
+            return None, None
+        return body.strip(), response_headers.get('etag')
+
+    def _repo_metadata(self, head_sha, etag, blob_shas):
+        return {'head_sha': head_sha, 'etag': etag, 'blob_shas': blob_shas,
+                'file_filter': self.file_filter.fingerprint()}
+
+    def _refresh_repo(self, repo_name, metadata, head_sha, etag, filter_changed=False):
+        """Bring an expired cached repository up to date, downloading only changed blobs.
+
+        After a file filter change the tree is compared even if the head is
+        unchanged: newly excluded files are dropped and newly included ones
+        downloaded. Returns None when the tree cannot be compared and a full
+        fetch is needed.
+        """
+        if head_sha == metadata['head_sha'] and not filter_changed:
+            logging.info(f"Repository unchanged since last fetch: {repo_name}")
+            self.store.touch(repo_name, {**metadata, 'etag': etag})
+            return self.store.load(repo_name)
+
+        repo = self.github_client.get_repo(repo_name, lazy=True)
+        tree = repo.get_git_tree(head_sha, recursive=True)
+        if tree.raw_data.get('truncated'):
+            logging.info(f"Tree listing for {repo_name} is truncated; falling back to a full fetch.")
+            return None
+
+        cached_data = self.store.load(repo_name)
+        cached_positions = {path: position for position, (path, _) in enumerate(cached_data.digests())}
+        previous_shas = metadata.get('blob_shas', {})
+        repo_data, blob_shas, changed = [], {}, 0
+        for element in tree.tree:
+            # Submodules and symlinks never reach the cache
+            if element.type != 'blob' or element.mode == '120000':
+                continue
+            if not self.file_filter.check_path(element.path, element.size):
+                continue
+            blob_shas[element.path] = element.sha
+            if previous_shas.get(element.path) == element.sha:
+                if element.path in cached_positions:
+                    repo_data.append(cached_data[cached_positions[element.path]])
+                continue
+            changed += 1
+            content = self.file_filter.decode(element.path, base64.b64decode(repo.get_git_blob(element.sha).content))
+            if content is not None:
+                repo_data.append((element.path, content))
+
+        self.store.save(repo_name, 'repo', repo_data, metadata=self._repo_metadata(head_sha, etag, blob_shas))
+        logging.info(f"Refreshed repository {repo_name}: {changed} changed files downloaded.")
+        return self.store.load(repo_name)
+
+    def _fetch_filtered_blobs(self, repo_name, head_sha, blob_shas):
+        """Download only the files that pass the file filter when it rejects most of the repository.
+
+        The recursive tree listing gives every file's path and size. If the kept
+        files hold less than `github.blob_fetch_max_share` of the repository's
+        bytes and number at most `github.blob_fetch_max_files` (one API request
+        each), they are fetched as single blobs instead of the whole tarball.
+        Returns None when the tarball is the better choice or the listing is
+        truncated.
+        """
+        max_share = self.config['github'].get('blob_fetch_max_share', 0.2)
+        max_files = self.config['github'].get('blob_fetch_max_files', 300)
+        repo = self.github_client.get_repo(repo_name, lazy=True)
+        tree = repo.get_git_tree(head_sha, recursive=True)
+        if tree.raw_data.get('truncated'):
+            return None
+        # Submodules and symlinks never reach the cache
+        blobs = [element for element in tree.tree if element.type == 'blob' and element.mode != '120000']
+        kept = [element for element in blobs if self.file_filter.passes(element.path, element.size)]
+        total_bytes = sum(element.size or 0 for element in blobs)
+        kept_bytes = sum(element.size or 0 for element in kept)
+        if len(kept) > max_files or kept_bytes >= max_share * total_bytes:
+            return None
+
+        logging.info(f"Fetching {len(kept)} of {len(blobs)} files of {repo_name} as blobs "
+                     f"({kept_bytes} of {total_bytes} bytes).")
+        repo_data = []
+        for element in blobs:
+            if not self.file_filter.check_path(element.path, element.size):
+                continue
+            blob_shas[element.path] = element.sha
+            content = self.file_filter.decode(element.path, base64.b64decode(repo.get_git_blob(element.sha).content))
+            if content is not None:
+                repo_data.append((element.path, content))
         return repo_data
 
-    def _process_contents(self, contents, repo):
-        """Recursively process repository contents."""
+    def _process_contents(self, contents, repo, blob_shas=None, ref=None):
+        """Recursively process repository contents.
+
+        Directories and files rejected by the file filter are never requested.
+        Every request is pinned to `ref`, so all files come from the same commit.
+        """
+        ref_kwargs = {'ref': ref} if ref else {}
         repo_data = []
         while contents:
             file_content = contents.pop(0)
             if file_content.type == "dir":
-                contents.extend(repo.get_contents(file_content.path))
-            else:
-                file_data = repo.get_contents(file_content.path).decoded_content.decode("utf-8")
-                repo_data.append((file_content.path, file_data))
+                if self.file_filter.check_dir(file_content.path):
+                    contents.extend(repo.get_contents(file_content.path, **ref_kwargs))
+            elif self.file_filter.check_path(file_content.path, file_content.size):
+                if blob_shas is not None:
+                    blob_shas[file_content.path] = file_content.sha
+                file_data = self.file_filter.decode(
+                    file_content.path, repo.get_contents(file_content.path, **ref_kwargs).decoded_content
+                )
+                if file_data is not None:
+                    repo_data.append((file_content.path, file_data))
+        return repo_data
+
+    def _fetch_repo_archive(self, repo_name, blob_shas=None, ref=None):
+        """Fetch a whole repository with a single tarball request."""
+        local_archive = self._local_archive_path(repo_name)
+        if local_archive:
+            logging.info(f"Using local archive for repository: {repo_name}")
+            with open(local_archive, 'rb') as f:
+                return self._process_archive(f, blob_shas)
+
+        repo = self.github_client.get_repo(repo_name)
+        archive_url = repo.get_archive_link("tarball", **({'ref': ref} if ref else {}))
+        with requests.get(archive_url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            return self._process_archive(response.raw, blob_shas)
+
+    def _local_archive_path(self, repo_name):
+        """Return the path of a local `<owner>_<repo>.tar.gz` stand-in, if one exists."""
+        archive_dir = self.config['github'].get('archive_dir')
+        if not archive_dir:
+            return None
+        archive_path = os.path.join(archive_dir, f"{repo_name.replace('/', '_')}.tar.gz")
+        return archive_path if os.path.exists(archive_path) else None
+
+    def _process_archive(self, fileobj, blob_shas=None):
+        """Unpack a gzipped repository tarball as a stream into (path, content) pairs.
+
+        Files rejected by the file filter's path checks are skipped unread. When
+        `blob_shas` is given it is filled with the git blob SHA of every other file,
+        including undecodable ones, so later refreshes can tell which files changed.
+        """
+        repo_data = []
+        # 'r|gz' reads the archive sequentially, so the response body is never buffered whole
+        with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                # GitHub wraps the tree in a single `<owner>-<repo>-<sha>/` directory
+                path = member.name.split('/', 1)[1] if '/' in member.name else member.name
+                if not self.file_filter.check_path(path, member.size):
+                    continue
+                raw_content = archive.extractfile(member).read()
+                if blob_shas is not None:
+                    blob_shas[path] = git_blob_sha(raw_content)
+                content = self.file_filter.decode(path, raw_content)
+                if content is not None:
+                    repo_data.append((path, content))
         return repo_data
 
     @error_handler
@@ -55,66 +360,30 @@ class DataFetcher:
             logging.info(f"Using cached data for article: {url}")
             return cached_data
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 403:
-                logging.error(f"Access forbidden for URL: {url}")
-                return ""
-            else:
-                raise e
-
-        if 'application/pdf' in response.headers.get('Content-Type', ''):
-            article_text = self._extract_text_from_pdf(response.content)
-        else:
-            article_text = self._extract_text_from_html(response.content)
-
-        if article_text:
-            self.save_cached_data(url, article_text, is_repo=False)
-            logging.info(f"Successfully fetched article: {url}")
-            return article_text
-        else:
-            logging.warning(f"Could not find content in article: {url}")
-            return ""
-
-    def _extract_text_from_html(self, html_content):
-        """Extract text from HTML content."""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        content = soup.find('main') or soup.find('article') or soup.find('div', class_='content') or soup.body
-        if content:
-            article_text = content.get_text(separator='\n', strip=True)
-            return ' '.join(article_text.split())
-        return ""
-
-    def _extract_text_from_pdf(self, pdf_content):
-        """Extract text from PDF content."""
-        try:
-            pdf_reader = PdfReader(BytesIO(pdf_content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-            return text
-        except Exception as e:
-            logging.error(f"Failed to extract text from PDF: {e}")
-            return ""
+        # Stale or empty copies are revalidated over the pooled session
+        return self.article_client.fetch(url, self.text_extractor.extract)
 
     def get_cached_data(self, identifier, is_repo=False):
-        """Retrieve cached data if available."""
-        cache_file = os.path.join(self.cache_dir, f"{'repo' if is_repo else 'article'}_{identifier.replace('/', '_').replace(':', '_')}.pkl")
-        if os.path.exists(cache_file):
-            with open(cache_file, 'rb') as f:
-                cached_data = pickle.load(f)
-            if datetime.now() - cached_data['timestamp'] < timedelta(days=self.config['cache'].get('expiry_days', 7)):
-                return cached_data['data']
+        """Retrieve cached data if available and not expired."""
+        timestamp = self.store.get_timestamp(identifier)
+        if timestamp is None:
+            # Fall back to a legacy pickle once; afterwards it is served from the store
+            legacy_file = self._legacy_cache_file(identifier, is_repo)
+            if not os.path.exists(legacy_file):
+                metrics.inc('cache_lookups_total', cache='corpus', result='miss')
+                return None
+            self.store.import_pickle(identifier, 'repo' if is_repo else 'article', legacy_file)
+            timestamp = self.store.get_timestamp(identifier)
+        if datetime.now() - timestamp < timedelta(days=self.config['cache'].get('expiry_days', 7)):
+            metrics.inc('cache_lookups_total', cache='corpus', result='hit')
+            return self.store.load(identifier)
+        metrics.inc('cache_lookups_total', cache='corpus', result='miss')
         return None
 
     def save_cached_data(self, identifier, data, is_repo=False):
         """Save data to cache."""
-        cache_file = os.path.join(self.cache_dir, f"{'repo' if is_repo else 'article'}_{identifier.replace('/', '_').replace(':', '_')}.pkl")
-        with open(cache_file, 'wb') as f:
-            pickle.dump({'timestamp': datetime.now(), 'data': data}, f)
\ No newline at end of file
+        self.store.save(identifier, 'repo' if is_repo else 'article', data)
+
+    def _legacy_cache_file(self, identifier, is_repo):
+        """Return the path the pickle cache used for an identifier."""
+        return os.path.join(self.cache_dir, f"{'repo' if is_repo else 'article'}_{identifier.replace('/', '_').replace(':', '_')}.pkl")
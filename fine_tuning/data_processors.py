@@ -1,31 +1,167 @@
 import logging
 import os
-from fine_tuning.utils import error_handler, num_tokens_from_messages, split_list
+from fine_tuning.utils import error_handler, split_list, strip_private_keys
+from fine_tuning.chunking import TokenChunker, StructuredChunker
+from fine_tuning.completion_cache import CompletionCache
+from fine_tuning.checkpoint import GenerationJournal, prompt_id
+from fine_tuning.scheduler import CompletionScheduler
+from fine_tuning.batch_generation import BatchGenerator
+from fine_tuning.token_counter import TokenCounter
+from fine_tuning.dedup import Deduplicator
+from fine_tuning.selection import ExampleSelector
+from fine_tuning.extraction import PAGE_BREAK
+from fine_tuning.metrics import metrics
 from tqdm import tqdm
 import random
 import json
-from tiktoken import get_encoding
 import openai
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import threading
+from openai import AsyncOpenAI
+from concurrent.futures import ProcessPoolExecutor
+
+SYSTEM_PROMPT = (
+    "You are a highly knowledgeable and helpful assistant specialized in NEAR Protocol development, "
+    "blockchain architecture, and AI technologies within the NEAR ecosystem. "
+    "Your primary tasks include generating accurate and efficient code examples, providing detailed explanations of NEAR's architecture, "
+    "and assisting developers with technical guidance. "
+    "When generating code, use appropriate programming languages such as Rust, TypeScript, and JavaScript. "
+    "Adhere to NEAR's coding standards and best practices, and include comprehensive comments. "
+    "Ensure all code is functional, secure, and optimized for performance. "
+    "Provide clear, concise, and informative responses to enhance developers' understanding and implementation of NEAR technologies. "
+    "NEAR Protocol is a blockchain platform that allows developers to build and deploy smart contracts and decentralized applications (dApps) on its blockchain network. "
+    "Write for a technical audience and prioritize clarity and accuracy in your responses. Developers are your primary users, so ensure your explanations are comprehensive and easy to understand. "
+    "This fine-tuning data will be used to improve the assistant's ability to understand and generate code and explanations related to NEAR. "
+    "Focus on creating concise and informative responses that are both technically accurate and easy to understand. "
+    "Use markdown code blocks to format your responses, and include inline comments to explain your code. "
+    "When providing answers, ensure they are structured in a way that is easy to follow and implement. "
+    "Include examples where applicable to illustrate your points effectively."
+)
+
+PACKED_INSTRUCTIONS = (
+    "The user message is a JSON object whose `snippets` list holds several independent tasks, each with an `id` "
+    "and a `prompt`. Answer every prompt on its own, exactly as you would if it were the whole message. "
+    'Reply with a JSON object of the form {"responses": [{"id": <id>, "completion": "<answer>"}]} '
+    "containing one entry for every snippet."
+)
+
+# Per-process DataProcessor used by process-pool workers; keeps its tiktoken encoder warm
+_worker_processor = None
+
+def _init_worker(config):
+    """Build the worker's DataProcessor and load its encoder once."""
+    global _worker_processor
+    _worker_processor = DataProcessor(None, config)
+    _worker_processor.get_chunker(config['data_processing']['max_tokens'])
+
+def _snippet(data):
+    """The source text of a prompt, without the instruction line naming its file."""
+    return data['prompt'].split('\n', 1)[-1]
+
+def _process_with(processor, task):
+    """Turn one batch of repository files, or one article, into prompts."""
+    kind, payload = task
+    if kind == 'repo':
+        return processor.process_repo_data(payload)
+    return processor.process_article_data(payload)
+
+def _process_task(task):
+    return _process_with(_worker_processor, task)
 
 class DataProcessor:
     def __init__(self, openai_client, config):
         self.client = openai_client
         self.config = config
+        self._chunkers = {}
+        self.token_counter = TokenCounter(config['fine_tuning'].get('model', "gpt-4o-2024-08-06"))
+        self._completion_cache = None
+        self._completion_cache_lock = threading.Lock()
 
     def process_repo_data(self, repo_data):
         """Process repository data into prompts."""
         processed_data = []
-        for file_path, content in repo_data:
-            splits = self.split_content(content, self.config['data_processing']['max_tokens'])
-            for split_content in splits:
-                prompt = f"Explain the following code snippet from NEAR repository file `{file_path}`:\n```{split_content}```"
-                processed_data.append({'prompt': prompt, 'completion': ''})
+        chunker = self.get_chunker(self.config['data_processing']['max_tokens'])
+        # Encode files in batches so large repositories are never fully decoded at once
+        batch_size = self.config['data_processing'].get('encode_batch_size', 64)
+        for batch in split_list(repo_data, batch_size):
+            batch = list(batch)
+            splits_per_file = chunker.split_batch([content for _, content in batch], [file_path for file_path, _ in batch])
+            for (file_path, _), splits in zip(batch, splits_per_file):
+                for split_content in splits:
+                    prompt = f"Explain the following code snippet from NEAR repository file `{file_path}`:\n```{split_content}```"
+                    processed_data.append({'prompt': prompt, 'completion': ''})
         return processed_data
 
+    def process_all(self, all_repo_data, all_article_data):
+        """Process every fetched repository and article into prompts.
+
+        With `data_processing.workers` above 1, files are spread across worker
+        processes. Results come back in source order, so the output matches the
+        sequential run exactly. Each prompt records the repository name or
+        article URL it came from under `_source`.
+        """
+        workers = self.config['data_processing'].get('workers', 1)
+        batch_size = self.config['data_processing'].get('worker_batch_size', 32)
+        sources = [repo_name for repo_name, repo_data in all_repo_data.items() for _ in split_list(repo_data, batch_size)]
+        sources += list(all_article_data)
+        tasks = [('repo', batch) for repo_data in all_repo_data.values() for batch in split_list(repo_data, batch_size)]
+        tasks += [('article', article_text) for article_text in all_article_data.values()]
+
+        if workers <= 1:
+            results = (_process_with(self, task) for task in tasks)
+            return self._tag_sources(tqdm(results, total=len(tasks), desc="Processing sources"), sources)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.config,)) as executor:
+            # map() yields in submission order while later tasks keep running
+            results = executor.map(_process_task, tasks)
+            return self._tag_sources(tqdm(results, total=len(tasks), desc="Processing sources"), sources)
+
+    def _tag_sources(self, results, sources):
+        """Flatten per-task prompts, tagging each with the source its task came from."""
+        processed_data = []
+        for prompts, source in zip(results, sources):
+            for data in prompts:
+                data['_source'] = source
+            processed_data.extend(prompts)
+        return processed_data
+
+    def make_deduplicator(self):
+        """A Deduplicator configured from `data_processing.dedup`; None when disabled."""
+        dedup_config = self.config['data_processing'].get('dedup', {})
+        if not dedup_config.get('enabled', True):
+            return None
+        return Deduplicator(
+            threshold=dedup_config.get('threshold', 0.8),
+            num_perm=dedup_config.get('num_perm', 128),
+            bands=dedup_config.get('bands', 32),
+            shingle_size=dedup_config.get('shingle_size', 5),
+        )
+
+    def is_duplicate(self, deduplicator, data):
+        """Check a prompt's snippet against a Deduplicator, so copies of a file in other repos match."""
+        return deduplicator.check(_snippet(data)) is not None
+
+    def deduplicate(self, processed_data):
+        """Drop prompts whose snippet exactly or nearly duplicates an earlier one."""
+        deduplicator = self.make_deduplicator()
+        if deduplicator is None:
+            return processed_data
+        kept, removed = [], []
+        for data in tqdm(processed_data, desc="Deduplicating prompts"):
+            (removed if self.is_duplicate(deduplicator, data) else kept).append(data)
+        encoding = self.token_counter.encoding()
+        removed_tokens = sum(len(tokens) for tokens in encoding.encode_ordinary_batch([data['prompt'] for data in removed]))
+        logging.info(
+            f"Deduplication removed {deduplicator.stats['exact']} exact and {deduplicator.stats['near']} "
+            f"near-duplicate prompts ({removed_tokens} prompt tokens); {len(kept)} prompts remain."
+        )
+        return kept
+
     def process_article_data(self, article_text):
         """Process article data into prompts."""
-        splits = self.split_content(article_text, self.config['data_processing']['max_tokens'])
+        # PDFs are chunked page by page
+        chunker = self.get_chunker(self.config['data_processing']['max_tokens'])
+        splits = chunker.split_stream(article_text.split(PAGE_BREAK))
         processed_data = []
         for split_content in splits:
             prompt = f"Summarize the following section of a NEAR Protocol article:\n{split_content}"
@@ -34,77 +170,319 @@ class DataProcessor:
 
     def split_content(self, content, max_tokens):
         """Split content into chunks no longer than max_tokens."""
-        encoding = get_encoding('cl100k_base')
-        tokens = encoding.encode(content)
-        splits = []
-        current_chunk = []
-        for token in tokens:
-            current_chunk.append(token)
-            if len(current_chunk) >= max_tokens:
-                chunk_text = encoding.decode(current_chunk)
-                splits.append(chunk_text)
-                current_chunk = []
-        if current_chunk:
-            chunk_text = encoding.decode(current_chunk)
-            splits.append(chunk_text)
-        return splits
+        return self.get_chunker(max_tokens).split(content)
+
+    def get_chunker(self, max_tokens):
+        """Return a warm chunker for the given chunk size.
+
+        `data_processing.chunking` selects 'structured' (syntactic boundaries)
+        or 'tokens' (fixed windows with `chunk_overlap`).
+        """
+        if max_tokens not in self._chunkers:
+            if self.config['data_processing'].get('chunking', 'structured') == 'structured':
+                self._chunkers[max_tokens] = StructuredChunker(max_tokens)
+            else:
+                self._chunkers[max_tokens] = TokenChunker(
+                    max_tokens, overlap=self.config['data_processing'].get('chunk_overlap', 0)
+                )
+        return self._chunkers[max_tokens]
 
     @error_handler
-    def generate_refined_examples(self, processed_data):
-        """Generate assistant responses for each prompt using OpenAI API."""
-        refined_examples = []
-        random.shuffle(processed_data)  # Shuffle the order of the prompts
-
-        def process_prompt(data):
-            messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a highly knowledgeable and helpful assistant specialized in NEAR Protocol development, "
-                        "blockchain architecture, and AI technologies within the NEAR ecosystem. "
-                        "Your primary tasks include generating accurate and efficient code examples, providing detailed explanations of NEAR's architecture, "
-                        "and assisting developers with technical guidance. "
-                        "When generating code, use appropriate programming languages such as Rust, TypeScript, and JavaScript. "
-                        "Adhere to NEAR's coding standards and best practices, and include comprehensive comments. "
-                        "Ensure all code is functional, secure, and optimized for performance. "
-                        "Provide clear, concise, and informative responses to enhance developers' understanding and implementation of NEAR technologies. "
-                        "NEAR Protocol is a blockchain platform that allows developers to build and deploy smart contracts and decentralized applications (dApps) on its blockchain network. "
-                        "Write for a technical audience and prioritize clarity and accuracy in your responses. Developers are your primary users, so ensure your explanations are comprehensive and easy to understand. "
-                        "This fine-tuning data will be used to improve the assistant's ability to understand and generate code and explanations related to NEAR. "
-                        "Focus on creating concise and informative responses that are both technically accurate and easy to understand. "
-                        "Use markdown code blocks to format your responses, and include inline comments to explain your code. "
-                        "When providing answers, ensure they are structured in a way that is easy to follow and implement. "
-                        "Include examples where applicable to illustrate your points effectively."
-                    ),
-                },
-                {"role": "user", "content": data['prompt']}
-            ]
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.config['openai']['model'],
-                    messages=messages,
-                    temperature=self.config['openai']['temperature'],
-                    max_tokens=self.config['openai']['max_tokens']
+    def generate_refined_examples(self, processed_data, resume=False):
+        """Generate assistant responses for each prompt using OpenAI API.
+
+        Requests go through a CompletionScheduler that keeps within the
+        configured token and request budgets, or through the Batch API when
+        `example_generation.backend` is 'batch'. In 'packed' mode,
+        `batch_size` prompts share one JSON-mode request and system prompt;
+        prompts missing from a packed reply are retried one per request. Every
+        finished example is appended to the generation journal. With
+        `resume=True`, prompts already in the journal are reused and only the
+        missing ones are sent to the API.
+        """
+        journal = GenerationJournal(self.config['example_generation'].get('journal', 'generation_journal.jsonl'))
+        completed = journal.load() if resume else {}
+        prompt_ids = {prompt_id(data) for data in processed_data}
+        refined_examples = [example for pid, example in completed.items() if pid in prompt_ids]
+        pending = [data for data in processed_data if prompt_id(data) not in completed]
+        if resume:
+            logging.info(f"Resuming generation: {len(refined_examples)} prompts done, {len(pending)} remaining.")
+        random.shuffle(pending)  # Shuffle the order of the prompts
+
+        with journal.open(resume=resume), tqdm(total=len(pending), desc="Generating refined examples") as progress:
+            def record(data, assistant_message):
+                progress.update(1)
+                if assistant_message:
+                    example = self.make_example(data['prompt'], assistant_message, source=data.get('_source'))
+                    journal.append(prompt_id(data), example)
+                    refined_examples.append(example)
+
+            batch_size = self.packed_batch_size()
+
+            # Completions already in the cache need no API call
+            uncached = []
+            for data in pending:
+                request = self.build_request(data['prompt'])
+                assistant_message = self.lookup_completion(request, packed=batch_size > 1)
+                if assistant_message is None:
+                    uncached.append((data, request))
+                else:
+                    record(data, assistant_message)
+
+            if uncached and batch_size > 1:
+                uncached = self._generate_packed(uncached, record, batch_size)
+
+            def on_result(index, assistant_message):
+                data, request = uncached[index]
+                self.store_completion(request, assistant_message)
+                record(data, assistant_message)
+
+            if uncached:
+                self._complete_requests([request for _, request in uncached], on_result)
+
+        random.shuffle(refined_examples)  # Mix resumed and fresh examples before selection
+        if self._completion_cache:
+            logging.info(f"Completion cache stats: {self._completion_cache.stats()}")
+        return refined_examples
+
+    def packed_batch_size(self):
+        """Prompts per request: `example_generation.batch_size` in 'packed' mode, else 1."""
+        generation_config = self.config['example_generation']
+        if generation_config.get('mode', 'single') != 'packed':
+            return 1
+        return max(1, generation_config.get('batch_size', 1))
+
+    def lookup_completion(self, request, packed=False):
+        """Return the cached answer to a single-prompt request; packed mode also reuses its own earlier answers."""
+        assistant_message = self.get_cached_completion(request)
+        if assistant_message is None and packed:
+            assistant_message = self.get_cached_completion(self.packed_cache_request(request))
+        return assistant_message
+
+    def _generate_packed(self, uncached, record, batch_size):
+        """Complete `(data, request)` pairs `batch_size` prompts per request.
+
+        Each parsed completion is cached under `packed_cache_request`, so only
+        packed mode reuses it later. Returns the pairs that still need a
+        request of their own.
+        """
+        groups = [list(group) for group in split_list(uncached, batch_size)]
+        fallback = []
+
+        def on_packed_result(index, content):
+            group = groups[index]
+            completions = self.parse_packed_response(content, len(group))
+            for (data, request), assistant_message in zip(group, completions):
+                if assistant_message is None:
+                    fallback.append((data, request))
+                else:
+                    self.store_completion(self.packed_cache_request(request), assistant_message)
+                    record(data, assistant_message)
+
+        self._complete_requests([self.build_packed_request([data['prompt'] for data, _ in group]) for group in groups],
+                                on_packed_result)
+        metrics.inc('packed_fallbacks_total', len(fallback))
+        logging.info(f"Packed {len(uncached)} prompts into {len(groups)} requests; "
+                     f"{len(fallback)} prompts missing from the replies are retried one by one.")
+        return fallback
+
+    def _complete_requests(self, requests, on_result):
+        """Send requests through the configured backend; `on_result(index, content)` is called as each finishes."""
+        if self.config['example_generation'].get('backend', 'scheduler') == 'batch':
+            batch_generator = BatchGenerator(self.client, self.config)
+            batch_generator.run(requests, on_result)
+            logging.info(f"Batch generation stats: {batch_generator.stats}")
+        else:
+            stats = asyncio.run(self._run_scheduler(requests, on_result))
+            logging.info(f"Completion scheduler stats: {stats}")
+
+    async def _run_scheduler(self, requests, on_result):
+        """Complete requests on an AsyncOpenAI client sharing the sync client's credentials."""
+        async with self.make_async_client() as client:
+            scheduler = self.make_scheduler(client)
+            await scheduler.run(requests, on_result=on_result)
+        return scheduler.stats
+
+    def make_async_client(self):
+        """An AsyncOpenAI client sharing the sync client's credentials; the scheduler does the retrying."""
+        return AsyncOpenAI(api_key=self.client.api_key, base_url=self.client.base_url, max_retries=0)
+
+    def make_scheduler(self, client):
+        """Build a CompletionScheduler with the configured rate budgets and concurrency."""
+        generation_config = self.config['example_generation']
+        return CompletionScheduler(
+            client,
+            tokens_per_minute=self.config['openai'].get('tokens_per_minute', 2_000_000),
+            requests_per_minute=self.config['openai'].get('requests_per_minute', 5_000),
+            estimate_tokens=self.estimate_request_tokens,
+            max_concurrency=generation_config.get('max_concurrency', 10),
+            max_retries=generation_config.get('max_retries', 6),
+        )
+
+    def estimate_request_tokens(self, request):
+        """Upper bound on the tokens a request draws from the rate limit: prompt plus max_tokens."""
+        return self.token_counter.count_messages(request['messages'], model=request['model']) + request['max_tokens']
+
+    @property
+    def completion_cache(self):
+        """The on-disk completion cache, opened on first use; None when disabled."""
+        cache_config = self.config['cache'].get('completions', {})
+        if not cache_config.get('enabled', True):
+            return None
+        with self._completion_cache_lock:
+            if self._completion_cache is None:
+                self._completion_cache = CompletionCache(
+                    cache_config.get('path', os.path.join(self.config['cache']['dir'], 'completions.sqlite')),
+                    max_size_mb=cache_config.get('max_size_mb', 500),
                 )
+        return self._completion_cache
+
+    def get_cached_completion(self, request):
+        """Return the cached assistant message for a request, if any."""
+        cache = self.completion_cache
+        if not cache:
+            return None
+        assistant_message = cache.get(CompletionCache.make_key(request))
+        metrics.inc('cache_lookups_total', cache='completions', result='miss' if assistant_message is None else 'hit')
+        return assistant_message
+
+    def store_completion(self, request, assistant_message):
+        """Cache a successful assistant message for a request."""
+        cache = self.completion_cache
+        if cache and assistant_message:
+            cache.put(CompletionCache.make_key(request), assistant_message)
+
+    def generate_example(self, data):
+        """Generate the assistant response for a single prompt.
+
+        Returns the fine-tuning example, or None if the request failed.
+        """
+        try:
+            request = self.build_request(data['prompt'])
+            assistant_message = self.get_cached_completion(request)
+            if assistant_message is None:
+                response = self.client.chat.completions.create(**request)
                 assistant_message = response.choices[0].message.content
-                return {
-                    "messages": [
-                        {"role": "user", "content": data['prompt']},
-                        {"role": "assistant", "content": assistant_message}
-                    ]
-                }
-            except Exception as e:
-                logging.error(f"Failed to generate response for prompt: {data['prompt']}\nError: {e}")
-                return None
-
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(process_prompt, data) for data in processed_data]
-            for future in tqdm(as_completed(futures), total=len(futures), desc="Generating refined examples"):
-                result = future.result()
-                if result:
-                    refined_examples.append(result)
+                self.store_completion(request, assistant_message)
+            return self.make_example(data['prompt'], assistant_message, source=data.get('_source'))
+        except Exception as e:
+            logging.error(f"Failed to generate response for prompt: {data['prompt']}\nError: {e}")
+            return None
 
-        return refined_examples
+    async def generate_examples_async(self, scheduler, group):
+        """Generate the examples for a group of prompts through a CompletionScheduler.
+
+        In 'packed' mode the uncached prompts of the group share one request,
+        and any missing from its reply are retried one per request. Returns one
+        example per prompt, None for those that failed.
+        """
+        packed = self.packed_batch_size() > 1
+        requests = [self.build_request(data['prompt']) for data in group]
+        completions = [self.lookup_completion(request, packed) for request in requests]
+        uncached = [index for index, completion in enumerate(completions) if completion is None]
+        if packed and len(uncached) > 1:
+            content = await scheduler.complete(self.build_packed_request([group[index]['prompt'] for index in uncached]))
+            for index, completion in zip(list(uncached), self.parse_packed_response(content, len(uncached))):
+                if completion is not None:
+                    self.store_completion(self.packed_cache_request(requests[index]), completion)
+                    completions[index] = completion
+                    uncached.remove(index)
+            metrics.inc('packed_fallbacks_total', len(uncached))
+
+        async def complete_single(index):
+            completions[index] = await scheduler.complete(requests[index])
+            self.store_completion(requests[index], completions[index])
+
+        await asyncio.gather(*(complete_single(index) for index in uncached))
+        return [self.make_example(data['prompt'], completion, source=data.get('_source')) if completion else None
+                for data, completion in zip(group, completions)]
+
+    def make_example(self, prompt, assistant_message, source=None):
+        """Build a fine-tuning example from a prompt and its generated response."""
+        example = {
+            "messages": [
+                {"role": "user", "content": prompt},
+                {"role": "assistant", "content": assistant_message}
+            ]
+        }
+        if source:
+            example['_source'] = source
+        return example
+
+    def build_request(self, prompt):
+        """Build the chat completion request parameters for a prompt."""
+        return {
+            'model': self.config['openai']['model'],
+            'messages': self.build_messages(prompt),
+            'temperature': self.config['openai']['temperature'],
+            'max_tokens': self.config['openai']['max_tokens'],
+        }
+
+    def build_messages(self, prompt):
+        """Build the chat messages sent to generate a response for a prompt."""
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def build_packed_request(self, prompts):
+        """Build one JSON-mode request asking for a separate response to each of several prompts.
+
+        The output budget grows with the number of prompts, up to
+        `example_generation.max_output_tokens`.
+        """
+        snippets = [{'id': index, 'prompt': prompt} for index, prompt in enumerate(prompts)]
+        max_output_tokens = self.config['example_generation'].get('max_output_tokens', 16384)
+        return {
+            'model': self.config['openai']['model'],
+            'messages': [
+                {"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{PACKED_INSTRUCTIONS}"},
+                {"role": "user", "content": json.dumps({'snippets': snippets}, ensure_ascii=False)}
+            ],
+            'temperature': self.config['openai']['temperature'],
+            'max_tokens': min(self.config['openai']['max_tokens'] * len(prompts), max_output_tokens),
+            'response_format': {'type': 'json_object'},
+        }
+
+    def packed_cache_request(self, request):
+        """The request a packed answer to a single-prompt `request` is cached under.
+
+        A packed answer was written under different instructions, a shared
+        output budget and JSON mode, so it must not be served as the answer to
+        the single-prompt request itself. The marker records the packing setup.
+        """
+        generation_config = self.config['example_generation']
+        return {**request, 'packed': {
+            'instructions': PACKED_INSTRUCTIONS,
+            'batch_size': generation_config.get('batch_size', 1),
+            'max_output_tokens': generation_config.get('max_output_tokens', 16384),
+        }}
+
+    def parse_packed_response(self, response_content, count):
+        """Split a packed reply into one completion per prompt, with None for any that is missing or malformed.
+
+        Replies that are not JSON are read as delimited Prompt:/Completion:
+        pairs, matched to the prompts by position if there is one per prompt.
+        """
+        completions = [None] * count
+        if not response_content:
+            return completions
+        try:
+            payload = json.loads(response_content)
+        except ValueError:
+            examples = self.parse_assistant_response(response_content)
+            if len(examples) == count:
+                completions = [example['messages'][1]['content'] or None for example in examples]
+            return completions
+        responses = payload.get('responses') if isinstance(payload, dict) else None
+        for item in responses if isinstance(responses, list) else []:
+            if not isinstance(item, dict):
+                continue
+            index, completion = item.get('id'), item.get('completion')
+            valid_index = isinstance(index, int) and not isinstance(index, bool) and 0 <= index < count
+            if valid_index and isinstance(completion, str) and completion.strip():
+                completions[index] = completion.strip()
+        return completions
 
     def parse_assistant_response(self, response_content):
         """Parse the assistant's response into prompts and completions."""
@@ -112,7 +490,7 @@ class DataProcessor:
         pairs = response_content.strip().split('\n\n')
         for pair in pairs:
             if 'Prompt:' in pair and 'Completion:' in pair:
-                prompt_part, completion_part = pair.split('Completion:')
+                prompt_part, completion_part = pair.split('Completion:', 1)
                 prompt = prompt_part.replace('Prompt:', '').strip()
                 completion = completion_part.strip()
                 examples.append({
@@ -124,25 +502,29 @@ class DataProcessor:
         return examples
 
     def create_fine_tuning_data(self, refined_examples):
-        """Prepare the fine-tuning data."""
-        fine_tuning_data = []
-        total_tokens = 0
-        target_examples = self.config['fine_tuning']['target_examples']
-        max_tokens = self.config['fine_tuning']['max_tokens']
-        for example in refined_examples:
-            num_tokens = num_tokens_from_messages(example['messages'])
-            if total_tokens + num_tokens > max_tokens:
-                break
-            # Validate the example
-            if not self.validate_example(example):
-                logging.warning("Invalid example detected and skipped.")
-                continue
-            fine_tuning_data.append(example)
-            total_tokens += num_tokens
-            if len(fine_tuning_data) >= target_examples:
-                break
+        """Prepare the fine-tuning data.
+
+        An ExampleSelector picks the examples that best fill `target_examples`
+        and the token budget, within the per-source quotas in `fine_tuning.selection`.
+        """
+        fine_tuning_config = self.config['fine_tuning']
+        selection_config = fine_tuning_config.get('selection', {})
+        # Validate the examples
+        valid_examples = [example for example in refined_examples if self.validate_example(example)]
+        if len(valid_examples) < len(refined_examples):
+            logging.warning(f"{len(refined_examples) - len(valid_examples)} invalid examples detected and skipped.")
+        # Count every example in one batch; the counts are memoized for cost estimation
+        self.token_counter.count_examples(valid_examples)
+        selector = ExampleSelector(
+            fine_tuning_config['max_tokens'],
+            fine_tuning_config['target_examples'],
+            max_source_share=selection_config.get('max_source_share'),
+            source_quotas=selection_config.get('source_quotas'),
+        )
+        fine_tuning_data = selector.select(valid_examples, [example['_num_tokens'] for example in valid_examples])
         logging.info(f"Total examples for fine-tuning: {len(fine_tuning_data)}")
-        logging.info(f"Total tokens: {total_tokens}")
+        logging.info(f"Total tokens: {selector.stats['total_tokens']}")
+        logging.info(f"Examples per source: {selector.stats['per_source']}")
         return fine_tuning_data
 
     def validate_example(self, example):
@@ -167,6 +549,6 @@ class DataProcessor:
         """Save data to a JSONL file with UTF-8 encoding and proper escaping."""
         with open(output_file, 'w', encoding='utf-8') as f:
             for item in data:
-                json_line = json.dumps(item, ensure_ascii=False)
+                json_line = json.dumps(strip_private_keys(item), ensure_ascii=False)
                 f.write(json_line + '\n')
         logging.info(f"Fine-tuning data saved to {output_file}")
\ No newline at end of file
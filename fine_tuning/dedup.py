@@ -0,0 +1,90 @@
+import re
+import hashlib
+from collections import defaultdict
+
+MASK_64 = (1 << 64) - 1
+WORD_PATTERN = re.compile(r'\w+')
+
+class Deduplicator:
+    """Drop exact and near-duplicate texts, keeping the first occurrence.
+
+    Exact duplicates are caught by a SHA-256 of the whitespace-normalized text.
+    Near-duplicates are found with MinHash over word shingles and LSH banding:
+    texts sharing any band of their signature become candidates, and a
+    candidate counts as a duplicate when the estimated Jaccard similarity is at
+    least `threshold`. Signatures use one-permutation hashing (each shingle is
+    hashed once and binned), so cost grows with text length, not `num_perm`.
+
+    Shingle hashes are 64-bit BLAKE2b digests, so signatures are the same in
+    every process and every run.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, bands=32, shingle_size=5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands.")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._hashes = set()
+        self._signatures = []
+        self._buckets = defaultdict(list)
+        self.stats = {'kept': 0, 'exact': 0, 'near': 0}
+
+    def check(self, text):
+        """Return 'exact' or 'near' if `text` duplicates an earlier one, else record it and return None."""
+        digest = hashlib.sha256(' '.join(text.split()).encode('utf-8')).digest()
+        if digest in self._hashes:
+            self.stats['exact'] += 1
+            return 'exact'
+        signature = self.minhash(text)
+        band_keys = [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+        candidates = {index for key in band_keys for index in self._buckets.get(key, ())}
+        for index in candidates:
+            if self.similarity(signature, self._signatures[index]) >= self.threshold:
+                self.stats['near'] += 1
+                return 'near'
+        self._hashes.add(digest)
+        for key in band_keys:
+            self._buckets[key].append(len(self._signatures))
+        self._signatures.append(signature)
+        self.stats['kept'] += 1
+        return None
+
+    def minhash(self, text):
+        """One-permutation MinHash signature of a text's word shingles."""
+        words = WORD_PATTERN.findall(text.lower())
+        size = self.shingle_size
+        shingles = {' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        bins = [MASK_64] * self.num_perm
+        for shingle in shingles:
+            value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+            slot = value % self.num_perm
+            value //= self.num_perm
+            if value < bins[slot]:
+                bins[slot] = value
+        return tuple(self._densify(bins))
+
+    def _densify(self, bins):
+        """Fill empty bins from the next non-empty one so short texts still get full signatures."""
+        filled = [index for index, value in enumerate(bins) if value != MASK_64]
+        if not filled or len(filled) == len(bins):
+            return bins
+        size = len(bins)
+        densified = list(bins)
+        # Walk right to left so the nearest non-empty bin to the right is always known
+        next_filled = filled[0] + size
+        for index in range(size - 1, -1, -1):
+            if bins[index] != MASK_64:
+                next_filled = index
+                continue
+            offset = next_filled - index
+            # Offsetting keeps borrowed values from colliding across unrelated texts
+            densified[index] = (bins[next_filled % size] + offset * 0x9E3779B97F4A7C15) & MASK_64
+        return densified
+
+    @staticmethod
+    def similarity(signature, other):
+        """Estimated Jaccard similarity: the share of matching signature positions."""
+        return sum(a == b for a, b in zip(signature, other)) / len(signature)
@@ -0,0 +1,80 @@
+import os
+import logging
+import importlib.util
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup
+from PyPDF2 import PdfReader
+
+# lxml parses several times faster than the pure-Python parser; it is used when installed
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+# Separates the pages of an extracted PDF so processing can stream them one at a time
+PAGE_BREAK = '\f'
+
+def extract_html(html_content, parser=HTML_PARSER):
+    """Return the main text of an HTML page as a single line, or "" if it has no body."""
+    soup = BeautifulSoup(html_content, parser)
+    content = soup.find('main') or soup.find('article') or soup.find('div', class_='content') or soup.body
+    if content:
+        return ' '.join(content.get_text(separator='\n', strip=True).split())
+    return ""
+
+# Per-process PDF reader used by pool workers, parsed once per document
+_worker_reader = None
+
+def _init_pdf_worker(pdf_content):
+    global _worker_reader
+    _worker_reader = PdfReader(BytesIO(pdf_content))
+
+def _extract_page_range(page_range):
+    start, stop = page_range
+    return [_worker_reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+def iter_pdf_pages(pdf_content, workers=1, pages_per_task=8, pool_min_pages=16):
+    """Yield the text of every page of a PDF in order.
+
+    Documents with at least `pool_min_pages` pages are spread across `workers`
+    processes in runs of `pages_per_task` pages; each worker parses the
+    document once. Pages are yielded as soon as their run is done. Workers are
+    spawned rather than forked: extraction runs on fetcher threads, and a fork
+    taken while another thread holds a logging or SQLite lock would deadlock
+    the child.
+    """
+    reader = PdfReader(BytesIO(pdf_content))
+    num_pages = len(reader.pages)
+    if workers <= 1 or num_pages < pool_min_pages:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+    page_ranges = [(start, min(start + pages_per_task, num_pages)) for start in range(0, num_pages, pages_per_task)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(page_ranges)), mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_pdf_worker, initargs=(pdf_content,)) as executor:
+        for pages in executor.map(_extract_page_range, page_ranges):
+            yield from pages
+
+class TextExtractor:
+    """Turn downloaded article bodies into text.
+
+    HTML is parsed with lxml when it is installed. PDF pages are extracted on a
+    process pool (see `iter_pdf_pages`) and joined with `PAGE_BREAK`, so the
+    splitter can later take a long paper one page at a time instead of as one
+    string.
+    """
+
+    def __init__(self, config):
+        extraction_config = config['articles'].get('extraction', {})
+        self.workers = extraction_config.get('workers', min(os.cpu_count() or 1, 4))
+        self.pages_per_task = extraction_config.get('pages_per_task', 8)
+        self.pool_min_pages = extraction_config.get('pool_min_pages', 16)
+
+    def extract(self, content, content_type):
+        """Extract the text of an HTML page or PDF document; returns "" when nothing can be read."""
+        if 'application/pdf' not in content_type:
+            return extract_html(content)
+        try:
+            return PAGE_BREAK.join(iter_pdf_pages(content, self.workers, self.pages_per_task, self.pool_min_pages))
+        except Exception as e:
+            logging.error(f"Failed to extract text from PDF: {e}")
+            return ""
@@ -0,0 +1,100 @@
+import os
+import json
+import hashlib
+import threading
+from fnmatch import fnmatchcase
+
+# Directories that hold third-party, build or tooling output rather than project sources
+VENDORED_DIRS = {
+    'node_modules', 'vendor', 'third_party', 'third-party', 'bower_components', 'dist', 'build',
+    'target', '.git', '__pycache__', '.next', '.venv', 'venv', 'coverage',
+}
+
+# Markers tools leave at the top of generated files
+GENERATED_MARKERS = (b'@generated', b'DO NOT EDIT', b'Code generated by', b'auto-generated')
+
+class FileFilter:
+    """Decide which repository files are worth downloading and turning into prompts.
+
+    Path checks (`check_path`) only need tree metadata, so they run before any
+    content is read: extension allow-list, include/exclude globs, vendored
+    directories and maximum size. Content checks (`decode`) catch binary,
+    generated and non-UTF-8 files among the rest. Every rejection is counted in
+    `stats` by reason, together with the bytes that were not kept.
+    """
+
+    def __init__(self, config):
+        filter_config = config['data_processing'].get('file_filter', {})
+        self.extensions = tuple(ext.lower() for ext in config['data_processing'].get('extensions') or ())
+        self.include = filter_config.get('include') or []
+        self.exclude = filter_config.get('exclude') or []
+        max_file_size_kb = filter_config.get('max_file_size_kb')
+        self.max_file_size = max_file_size_kb * 1024 if max_file_size_kb else None
+        self.skip_vendored = filter_config.get('skip_vendored', True)
+        self.stats = {'kept': 0, 'skipped_bytes': 0}
+        self._lock = threading.Lock()
+
+    def fingerprint(self):
+        """Hash of the filter settings, stored with a fetched repository to tell when they change."""
+        settings = [self.extensions, self.include, self.exclude, self.max_file_size, self.skip_vendored]
+        return hashlib.sha256(json.dumps(settings).encode('utf-8')).hexdigest()
+
+    def check_dir(self, path):
+        """Return True if a directory may contain files worth keeping."""
+        return not (self.skip_vendored and os.path.basename(path) in VENDORED_DIRS)
+
+    def check_path(self, path, size=None):
+        """Return True if a file passes the metadata filters; otherwise count why it did not."""
+        reason = self._path_rejection(path, size)
+        if reason:
+            self._count(reason, size or 0)
+            return False
+        return True
+
+    def passes(self, path, size=None):
+        """Return True if a file passes the metadata filters, without counting a rejection."""
+        return self._path_rejection(path, size) is None
+
+    def decode(self, path, raw_content):
+        """Decode a file that passed `check_path`, or return None for binary, generated or non-UTF-8 content."""
+        head = raw_content[:8000]
+        if b'\0' in head:
+            # Git's heuristic: a NUL byte near the start marks a binary file
+            self._count('binary', len(raw_content))
+            return None
+        if any(marker in head[:1024] for marker in GENERATED_MARKERS):
+            self._count('generated', len(raw_content))
+            return None
+        try:
+            content = raw_content.decode('utf-8')
+        except UnicodeDecodeError:
+            self._count('encoding', len(raw_content))
+            return None
+        self._count('kept', 0)
+        return content
+
+    def _path_rejection(self, path, size):
+        name = os.path.basename(path)
+        if self.extensions and not name.lower().endswith(self.extensions):
+            return 'extension'
+        if self.include and not self._matches(path, name, self.include):
+            return 'include'
+        if self._matches(path, name, self.exclude):
+            return 'exclude'
+        if self.skip_vendored and any(part in VENDORED_DIRS for part in path.split('/')[:-1]):
+            return 'vendored'
+        if self.max_file_size and size is not None and size > self.max_file_size:
+            return 'size'
+        return None
+
+    @staticmethod
+    def _matches(path, name, patterns):
+        """Match globs against the full path, and against the file name for patterns without a '/'."""
+        return any(fnmatchcase(path, pattern) or ('/' not in pattern and fnmatchcase(name, pattern))
+                   for pattern in patterns)
+
+    def _count(self, reason, size):
+        with self._lock:
+            self.stats[reason] = self.stats.get(reason, 0) + 1
+            if reason != 'kept':
+                self.stats['skipped_bytes'] += size
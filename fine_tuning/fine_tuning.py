@@ -1,15 +1,29 @@
 import logging
 import os
 import time
+import asyncio
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from fine_tuning.utils import error_handler
+from fine_tuning.uploads import MultipartUploader, shard_jsonl, MB
+from fine_tuning.job_monitor import JobMonitor
+from fine_tuning.metrics import metrics
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 class FineTuner:
-    def __init__(self, config):
+    def __init__(self, config, openai_client=None):
         self.config = config
+        self.client = openai_client or client
+
+    @error_handler
+    def upload_training_files(self, file_path):
+        """Upload a training file, split into several files if it exceeds `upload.max_file_mb`.
+
+        Returns the processed file IDs in order.
+        """
+        max_file_mb = self.config['fine_tuning'].get('upload', {}).get('max_file_mb', 512)
+        return [self.upload_training_file(shard_path) for shard_path in shard_jsonl(file_path, max_file_mb * MB)]
 
     @error_handler
     def upload_training_file(self, file_path):
@@ -20,28 +34,31 @@ class FineTuner:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Training file {file_path} does not exist.")
 
-        # Validate the file size (less than 1GB per OpenAI limits)
+        upload_config = self.config['fine_tuning'].get('upload', {})
         file_size = os.path.getsize(file_path)
-        if file_size > 1e9:
-            raise ValueError(f"Training file {file_path} exceeds the 1GB size limit.")
 
-        # Attempt to upload the file
+        # Attempt to upload the file; large files go through the multipart Uploads API
         try:
-            with open(file_path, 'rb') as f:
-                response = client.files.create(file=f, purpose='fine-tune')
-            file_id = response.id
+            with metrics.timer('upload_seconds'):
+                if file_size > upload_config.get('multipart_threshold_mb', 64) * MB:
+                    file_id = MultipartUploader(self.client, self.config).upload(file_path)
+                else:
+                    with open(file_path, 'rb') as f:
+                        response = self.client.files.create(file=f, purpose='fine-tune')
+                    file_id = response.id
+            metrics.inc('upload_bytes_total', file_size)
             logging.info(f"Training file uploaded successfully. File ID: {file_id}")
         except openai.OpenAIError as e:
             logging.error(f"Failed to upload training file: {e}")
             raise
 
-        # Wait until the file status is 'processed'
+        # Wait until the file status is 'processed', polling quickly at first
         max_wait_time = 600  # Maximum wait time in seconds (10 minutes)
-        wait_interval = 10   # Wait interval in seconds
+        wait_interval = upload_config.get('poll_interval', 1)
         elapsed_time = 0
 
         while elapsed_time < max_wait_time:
-            file_info = client.files.retrieve(file_id)
+            file_info = self.client.files.retrieve(file_id)
             status = file_info.status
             if status == 'processed':
                 logging.info(f"Training file {file_id} is processed and ready.")
@@ -53,65 +70,102 @@ class FineTuner:
                 logging.info(f"Waiting for training file {file_id} to be processed... Status: {status}")
                 time.sleep(wait_interval)
                 elapsed_time += wait_interval
+                wait_interval = min(wait_interval * 2, 10)
 
         raise TimeoutError(f"Training file {file_id} was not processed within the expected time.")
 
+    def training_schedule(self, training_file_ids, n_epochs=None):
+        """Return the `(training_file_id, n_epochs)` jobs that train on the uploaded files, in order.
+
+        A single file is trained in one job. A dataset split into several files
+        is only trained when `upload.sequential_training` opts in: the jobs then
+        run epoch by epoch, one epoch per file, each continuing the previous
+        model, so every file is seen once per epoch and `n_epochs` epochs take
+        `n_epochs` x files jobs.
+        """
+        n_epochs = n_epochs or self.config['fine_tuning']['n_epochs']
+        if len(training_file_ids) == 1:
+            return [(training_file_ids[0], n_epochs)]
+        if not self.config['fine_tuning'].get('upload', {}).get('sequential_training', False):
+            raise ValueError(
+                f"The training data was split into {len(training_file_ids)} files. Raise upload.max_file_mb, "
+                f"shrink the dataset, or set upload.sequential_training to train the files as a chain of jobs."
+            )
+        return [(training_file_id, 1) for _ in range(n_epochs) for training_file_id in training_file_ids]
+
+    def training_files_available(self, file_ids):
+        """Return True if every file ID still refers to a processed file, as when reusing an earlier upload."""
+        try:
+            return all(self.client.files.retrieve(file_id).status == 'processed' for file_id in file_ids)
+        except openai.NotFoundError:
+            return False
+
     @error_handler
-    def create_fine_tune_job(self, training_file_id):
-        """Create a fine-tuning job using the specified model with validation."""
+    def create_fine_tune_job(self, training_file_id, model=None, hyperparameters=None):
+        """Create a fine-tuning job using the specified model with validation.
+
+        `model` continues training an earlier fine-tuned model of the configured
+        base model, as when a dataset was split into several training files.
+        `hyperparameters` override the configured `n_epochs` and
+        `learning_rate_multiplier`.
+        """
         logging.info("Creating fine-tuning job...")
 
         # Validate that the training_file_id is valid and processed
-        file_info = client.files.retrieve(training_file_id)
+        file_info = self.client.files.retrieve(training_file_id)
         if file_info.status != 'processed':
             raise ValueError(f"Training file {training_file_id} is not ready. Status: {file_info.status}")
 
         # Check if the model is available for fine-tuning
         allowed_models = ["gpt-4o-mini-2024-07-18", "gpt-4o-2024-08-06"]
-        model = self.config['fine_tuning']['model']
-        if model not in allowed_models:
-            raise ValueError(f"The model '{model}' is not available for fine-tuning. Allowed models: {allowed_models}")
+        base_model = self.config['fine_tuning']['model']
+        if base_model not in allowed_models:
+            raise ValueError(f"The model '{base_model}' is not available for fine-tuning. Allowed models: {allowed_models}")
+        if model is None:
+            model = base_model
+        elif not model.startswith(f"ft:{base_model}:"):
+            raise ValueError(f"Can only continue training a model fine-tuned from '{base_model}', not '{model}'.")
 
         # Create the fine-tuning job
         try:
-            response = client.fine_tuning.jobs.create(
+            metrics.inc('openai_requests_total', endpoint='fine_tuning.jobs')
+            response = self.client.fine_tuning.jobs.create(
                 training_file=training_file_id,
                 model=model,
                 hyperparameters={
                     "n_epochs": self.config['fine_tuning']['n_epochs'],
                     "learning_rate_multiplier": self.config['fine_tuning']['learning_rate_multiplier'],
+                    **(hyperparameters or {}),
                 }
             )
             job_id = response.id
             logging.info(f"Fine-tuning job created successfully. Job ID: {job_id}")
             return job_id
         except openai.OpenAIError as e:
+            if isinstance(e, openai.RateLimitError):
+                metrics.inc('openai_rate_limited_total', endpoint='fine_tuning.jobs')
             logging.error(f"Failed to create fine-tuning job: {e}")
             raise
 
     @error_handler
     def monitor_fine_tune_job(self, job_id):
-        """Monitor the fine-tuning job until completion."""
+        """Monitor the fine-tuning job until completion.
+
+        Returns the fine-tuned model ID, or None if the job did not succeed.
+        """
         logging.info(f"Monitoring fine-tuning job: {job_id}")
-        while True:
-            try:
-                response = client.fine_tuning.jobs.retrieve(job_id)
-                logging.info(f"Job response: {response}")  # Log the entire response object
-                status = response.status
-                logging.info(f"Job status: {status}")
-                if status == 'succeeded':
-                    model_id = response.fine_tuned_model
-                    logging.info(f"Fine-tuning succeeded. Fine-tuned model ID: {model_id}")
-                    return model_id
-                elif status in ['failed', 'cancelled']:
-                    # Access the error message properly
-                    error_message = response.error['message'] if response.error else 'No error details provided'
-                    logging.error(f"Fine-tuning {status}. Reason: {error_message}")
-                    return None
-                else:
-                    # Wait before the next status check
-                    time.sleep(self.config['fine_tuning'].get('monitoring_interval', 60))
-            except openai.OpenAIError as e:
-                logging.error(f"Error while checking fine-tuning job status: {e}")
-                # Wait before retrying in case of an API error
-                time.sleep(self.config['fine_tuning'].get('monitoring_interval', 60))
\ No newline at end of file
+        result = self.monitor_fine_tune_jobs([job_id])[0]
+        if result['status'] == 'succeeded':
+            logging.info(f"Fine-tuning succeeded. Fine-tuned model ID: {result['fine_tuned_model']}")
+            return result['fine_tuned_model']
+        logging.error(f"Fine-tuning {result['status']}. Reason: {result['error'] or 'No error details provided'}")
+        return None
+
+    def monitor_fine_tune_jobs(self, job_ids):
+        """Monitor several fine-tuning jobs from one event loop; returns a JobMonitor result per job."""
+        with metrics.timer('stage_seconds', stage='fine_tune'):
+            return asyncio.run(self._watch_jobs(job_ids))
+
+    async def _watch_jobs(self, job_ids):
+        async with AsyncOpenAI(api_key=self.client.api_key, base_url=self.client.base_url) as async_client:
+            return await JobMonitor(async_client, self.config).watch_all(job_ids)
@@ -0,0 +1,115 @@
+import json
+import time
+import asyncio
+import logging
+import openai
+from fine_tuning.metrics import metrics
+
+TERMINAL_STATUSES = {'succeeded', 'failed', 'cancelled'}
+
+class JobMonitor:
+    """Follow fine-tuning jobs through their event stream.
+
+    Each poll fetches only the events newer than the last one seen, paging
+    through `jobs.list_events` until it reaches that event. The job itself is
+    re-read only when new events arrive or the poll interval has backed off to
+    its maximum. The interval resets to `min_interval` whenever there is news
+    and grows by `backoff` while the job is quiet. Metrics events become
+    structured records, logged as JSON and, with `metrics_file`, appended to
+    a JSONL file. A job that outlives `timeout` seconds, or fails to be read
+    `max_errors` times in a row, stops being monitored.
+
+    Every job shares one asyncio loop, so `watch_all` follows many at once.
+    """
+
+    def __init__(self, client, config):
+        monitoring_config = config['fine_tuning'].get('monitoring', {})
+        self.client = client
+        self.min_interval = monitoring_config.get('min_interval', 5)
+        self.max_interval = monitoring_config.get('max_interval', config['fine_tuning'].get('monitoring_interval', 60))
+        self.backoff = monitoring_config.get('backoff', 1.5)
+        self.timeout = monitoring_config.get('timeout_hours', 24) * 3600
+        self.max_errors = monitoring_config.get('max_errors', 10)
+        self.metrics_file = monitoring_config.get('metrics_file')
+        self.page_size = monitoring_config.get('page_size', 100)
+
+    async def watch_all(self, job_ids):
+        """Monitor several jobs concurrently; returns their results in job order."""
+        return await asyncio.gather(*(self.watch(job_id) for job_id in job_ids))
+
+    async def watch(self, job_id):
+        """Monitor a job until it finishes, times out or cannot be read.
+
+        Returns a dict with the job's final `status`, `fine_tuned_model`,
+        `error` message and the `metrics` records seen along the way.
+        """
+        result = {'job_id': job_id, 'status': None, 'fine_tuned_model': None, 'error': None, 'metrics': []}
+        deadline = time.monotonic() + self.timeout
+        last_event_id = None
+        interval = self.min_interval
+        errors = 0
+        while True:
+            metrics.inc('fine_tuning_polls_total')
+            try:
+                events = await self.new_events(job_id, last_event_id)
+                if events or interval >= self.max_interval or result['status'] is None:
+                    job = await self.client.fine_tuning.jobs.retrieve(job_id)
+                    if job.status != result['status']:
+                        logging.info(f"Job {job_id} status: {job.status}")
+                    result['status'] = job.status
+                errors = 0
+            except openai.OpenAIError as e:
+                errors += 1
+                metrics.inc('openai_failures_total', endpoint='fine_tuning.jobs')
+                logging.warning(f"Error while checking fine-tuning job {job_id} ({errors}/{self.max_errors}): {e}")
+                if errors >= self.max_errors:
+                    result['status'], result['error'] = 'error', str(e)
+                    return result
+                events = []
+
+            for event in events:
+                last_event_id = event.id
+                self.handle_event(job_id, event, result)
+
+            if result['status'] in TERMINAL_STATUSES:
+                result['fine_tuned_model'] = job.fine_tuned_model
+                if job.error and job.error.message:
+                    result['error'] = job.error.message
+                return result
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logging.error(f"Stopped monitoring job {job_id} after {self.timeout / 3600:.1f} hours.")
+                result['status'], result['error'] = 'timeout', 'Monitoring timed out'
+                return result
+            interval = self.min_interval if events else min(self.max_interval, interval * self.backoff)
+            await asyncio.sleep(min(interval, remaining))
+
+    async def new_events(self, job_id, last_event_id):
+        """Return the events after `last_event_id` in chronological order."""
+        events = []
+        after = None
+        while True:
+            page = await self.client.fine_tuning.jobs.list_events(
+                job_id, limit=self.page_size, **({'after': after} if after else {})
+            )
+            for event in page.data:
+                if event.id == last_event_id:
+                    return events[::-1]
+                events.append(event)
+            # With no previous event, the first page is enough to catch up
+            if not page.has_more or not page.data or last_event_id is None:
+                return events[::-1]
+            after = page.data[-1].id
+
+    def handle_event(self, job_id, event, result):
+        """Log an event, recording metrics events as structured records."""
+        if event.type == 'metrics' and event.data:
+            record = {'job_id': job_id, 'created_at': event.created_at, **event.data}
+            result['metrics'].append(record)
+            logging.info(f"Job metrics: {json.dumps(record)}")
+            if self.metrics_file:
+                with open(self.metrics_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+        else:
+            logging.info(f"Job {job_id}: {event.message}")
@@ -1,19 +1,115 @@
+import atexit
+import argparse
 import logging
 import sys
 from fine_tuning.config import load_config, validate_config
-from fine_tuning.utils import setup_logging, estimate_cost, num_tokens_from_messages, error_handler
+from fine_tuning.utils import setup_logging, estimate_cost, error_handler
 from fine_tuning.api_clients import get_github_client, initialize_openai, validate_openai_api_key
 from fine_tuning.data_fetchers import DataFetcher
 from fine_tuning.data_processors import DataProcessor
 from fine_tuning.fine_tuning import FineTuner
+from fine_tuning.pipeline import StreamingPipeline
+from fine_tuning.sweep import SweepOrchestrator
+from fine_tuning.stages import StageRunner, hash_file, hash_sources
+from fine_tuning.metrics import metrics
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Build a NEAR fine-tuning dataset and fine-tune a model.")
+    parser.add_argument('--stream', action='store_true',
+                        help="Stream fetched data through generation straight into the JSONL file.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Resume an interrupted generation run from its journal, generating only missing prompts.")
+    parser.add_argument('--sweep', action='store_true',
+                        help="Fine-tune once per combination in fine_tuning.sweep.parameters and write a results table.")
+    return parser.parse_args(argv)
+
+def build_fine_tuning_data(config, data_fetcher, data_processor, resume=False, stages=None):
+    """Fetch, process and generate the full dataset in memory, then save it as JSONL.
+
+    Each step runs as a stage of `stages`, so a stage whose config and upstream
+    data are unchanged since the last run is loaded from the stage cache.
+    Returns the total token count of the saved examples.
+    """
+    stages = stages or StageRunner(config)
+
+    # Fetch data from GitHub repositories and articles concurrently; the corpus store caches the sources
+    logging.info("Fetching data from GitHub repositories and articles...")
+    (all_repo_data, all_article_data), sources_hash = stages.run(
+        'fetch',
+        lambda: data_fetcher.fetch_all(config['github']['repos'], config['articles']['urls']),
+        output_hash=lambda sources: hash_sources(*sources),
+        always_run=True,
+    )
+
+    # Process fetched data, dropping duplicated snippets before paying for their completions
+    logging.info("Processing fetched data...")
+    processed_data, processed_hash = stages.run(
+        'process',
+        lambda: data_processor.deduplicate(data_processor.process_all(all_repo_data, all_article_data)),
+        config_keys=['data_processing.max_tokens', 'data_processing.chunking', 'data_processing.chunk_overlap',
+                     'data_processing.dedup'],
+        upstream=[sources_hash],
+    )
+
+    # Generate refined examples using OpenAI API
+    logging.info("Generating refined examples...")
+    refined_examples, refined_hash = stages.run(
+        'generate',
+        lambda: data_processor.generate_refined_examples(processed_data, resume=resume),
+        config_keys=['openai.model', 'openai.temperature', 'openai.max_tokens', 'openai.top_p',
+                     'openai.frequency_penalty', 'openai.presence_penalty', 'example_generation.mode',
+                     'example_generation.batch_size', 'example_generation.max_output_tokens',
+                     'example_generation.backend'],
+        upstream=[processed_hash],
+        # Prompts that failed are retried by the next run instead of being cached as missing
+        complete=lambda examples: len(examples) >= len(processed_data),
+    )
+
+    # Create fine-tuning data
+    logging.info("Creating fine-tuning data...")
+    def select_and_save():
+        fine_tuning_data = data_processor.create_fine_tuning_data(refined_examples)
+        data_processor.save_as_jsonl(fine_tuning_data, output_file="fine_tuning_data.jsonl")
+        # Reuses the counts memoized while the data was budgeted
+        return data_processor.token_counter.count_examples(fine_tuning_data)
+
+    total_tokens, _ = stages.run(
+        'select',
+        select_and_save,
+        config_keys=['fine_tuning.model', 'fine_tuning.target_examples', 'fine_tuning.max_tokens',
+                     'fine_tuning.selection'],
+        upstream=[refined_hash],
+        files=["fine_tuning_data.jsonl"],
+    )
+    return total_tokens
+
+def upload_training_data(config, fine_tuner, stages, file_path="fine_tuning_data.jsonl"):
+    """Upload the training data, reusing the earlier upload of an identical file.
+
+    Returns the training file IDs in order.
+    """
+    training_file_ids, _ = stages.run(
+        'upload',
+        lambda: fine_tuner.upload_training_files(file_path),
+        config_keys=['fine_tuning.upload.max_file_mb'],
+        upstream=[hash_file(file_path)],
+        validate=fine_tuner.training_files_available,
+    )
+    return training_file_ids
 
 @error_handler
-def main():
+def main(argv=None):
+    args = parse_args(argv)
+
     # Load and validate configuration
     config = load_config()
     validate_config(config)
     setup_logging(config)
     logging.info("Configuration loaded and validated.")
+    metrics.configure(config)
+    # Written on every way out of the run, including sys.exit
+    atexit.register(metrics.write_report)
 
     # Initialize API clients
     github_client = get_github_client()
@@ -24,46 +120,19 @@ def main():
     # Initialize components
     data_fetcher = DataFetcher(github_client, config)
     data_processor = DataProcessor(openai_client, config)
-    fine_tuner = FineTuner(config)
-
-    # Fetch data from GitHub repositories
-    logging.info("Fetching data from GitHub repositories...")
-    all_repo_data = {}
-    for repo_name in config['github']['repos']:
-        repo_data = data_fetcher.fetch_repo_data(repo_name)
-        if repo_data:
-            all_repo_data[repo_name] = repo_data
-
-    # Fetch data from articles
-    logging.info("Fetching data from articles...")
-    all_article_data = {}
-    for url in config['articles']['urls']:
-        article_data = data_fetcher.fetch_article_data(url)
-        if article_data:
-            all_article_data[url] = article_data
-
-    # Process fetched data
-    logging.info("Processing fetched data...")
-    processed_data = []
-    for repo_name, repo_data in all_repo_data.items():
-        processed = data_processor.process_repo_data(repo_data)
-        processed_data.extend(processed)
-
-    for url, article_text in all_article_data.items():
-        processed = data_processor.process_article_data(article_text)
-        processed_data.extend(processed)
-
-    # Generate refined examples using OpenAI API
-    logging.info("Generating refined examples...")
-    refined_examples = data_processor.generate_refined_examples(processed_data)
-
-    # Create fine-tuning data
-    logging.info("Creating fine-tuning data...")
-    fine_tuning_data = data_processor.create_fine_tuning_data(refined_examples)
-    data_processor.save_as_jsonl(fine_tuning_data, output_file="fine_tuning_data.jsonl")
+    fine_tuner = FineTuner(config, openai_client)
+    stages = StageRunner(config)
+
+    if args.stream:
+        # Stream every stage straight into the training file
+        logging.info("Running streaming pipeline...")
+        with metrics.timer('stage_seconds', stage='stream'):
+            _, total_tokens = StreamingPipeline(data_fetcher, data_processor, config).run(
+                "fine_tuning_data.jsonl", resume=args.resume)
+    else:
+        total_tokens = build_fine_tuning_data(config, data_fetcher, data_processor, resume=args.resume, stages=stages)
 
     # Estimate cost
-    total_tokens = sum(num_tokens_from_messages(example['messages']) for example in fine_tuning_data)
     estimated_cost = estimate_cost(total_tokens, cost_per_1k_tokens=0.0025)  # Adjust cost per 1K tokens as needed
     logging.info(f"Estimated fine-tuning cost: ${estimated_cost:.2f}")
 
@@ -76,18 +145,36 @@ def main():
     # Fine-tuning process
     logging.info("Starting fine-tuning process...")
     try:
-        training_file_id = fine_tuner.upload_training_file("fine_tuning_data.jsonl")
+        training_file_ids = upload_training_data(config, fine_tuner, stages)
     except Exception as e:
         logging.error(f"Training file upload failed: {str(e)}")
         sys.exit(1)
 
     try:
-        job_id = fine_tuner.create_fine_tune_job(training_file_id)
-    except Exception as e:
-        logging.error(f"Fine-tuning job creation failed: {str(e)}")
+        schedule = fine_tuner.training_schedule(training_file_ids)
+    except ValueError as e:
+        logging.error(str(e))
         sys.exit(1)
 
-    model_id = fine_tuner.monitor_fine_tune_job(job_id)
+    if args.sweep:
+        results = SweepOrchestrator(fine_tuner, config).run(training_file_ids)
+        succeeded = sum(1 for row in results if row['status'] == 'succeeded')
+        logging.info(f"Sweep finished: {succeeded}/{len(results)} runs succeeded.")
+        return
+
+    # A dataset split into several files is trained epoch by epoch, each job continuing the previous model
+    model_id = None
+    for training_file_id, n_epochs in schedule:
+        try:
+            job_id = fine_tuner.create_fine_tune_job(training_file_id, model=model_id,
+                                                     hyperparameters={'n_epochs': n_epochs})
+        except Exception as e:
+            logging.error(f"Fine-tuning job creation failed: {str(e)}")
+            sys.exit(1)
+
+        model_id = fine_tuner.monitor_fine_tune_job(job_id)
+        if not model_id:
+            break
 
     if model_id:
         logging.info(f"Fine-tuning completed successfully. Model ID: {model_id}")
@@ -0,0 +1,201 @@
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds, from a cache lookup up to a day-long fine-tuning job
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 1800, 3600, 7200,
+                   14400, 28800, 86400)
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+class Metrics:
+    """Counters and latency histograms for one pipeline run.
+
+    Components record into the shared `metrics` instance: `inc` for counts such
+    as cache hits, retries, 429s and tokens, `observe` or `timer` for durations
+    such as stage timings and API latency. Series are identified by a name and
+    keyword labels. While disabled every call returns immediately, so
+    instrumentation costs next to nothing. The results are written as a JSON
+    run report and, with `prometheus_port`, served in the Prometheus text format.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.report_file = None
+        self.prometheus_port = None
+        self._lock = threading.Lock()
+        self._server = None
+        self.reset()
+
+    def configure(self, config):
+        """Apply the `metrics` config section and start the Prometheus endpoint if one is configured."""
+        metrics_config = config.get('metrics', {})
+        self.enabled = metrics_config.get('enabled', False)
+        self.report_file = metrics_config.get('report_file', 'run_report.json')
+        self.prometheus_port = metrics_config.get('prometheus_port')
+        self.reset()
+        if self.enabled and self.prometheus_port:
+            self.serve(self.prometheus_port)
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+            self.started_at = time.time()
+
+    def inc(self, name, value=1, **labels):
+        """Add `value` to a counter."""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record a value, in seconds, in a histogram."""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * (len(DEFAULT_BUCKETS) + 1), 'sum': 0.0, 'count': 0,
+                                                     'min': value, 'max': value}
+            histogram['buckets'][bisect.bisect_left(DEFAULT_BUCKETS, value)] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+            histogram['min'] = min(histogram['min'], value)
+            histogram['max'] = max(histogram['max'], value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Record how long the block takes in a histogram."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def report(self):
+        """Return the run's counters, histogram summaries and cache hit rates as a dict."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**value, 'buckets': list(value['buckets'])} for key, value in self._histograms.items()}
+        hit_rates = {}
+        for (name, labels), value in counters.items():
+            labels = dict(labels)
+            if name == 'cache_lookups_total':
+                lookups = hit_rates.setdefault(labels.get('cache'), {'hits': 0, 'lookups': 0})
+                lookups['lookups'] += value
+                lookups['hits'] += value if labels.get('result') == 'hit' else 0
+        return {
+            'started_at': self.started_at,
+            'duration_seconds': time.time() - self.started_at,
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in sorted(counters.items())],
+            'histograms': [{'name': name, 'labels': dict(labels), 'count': value['count'], 'sum': value['sum'],
+                            'max': value['max'], 'p50': self._quantile(value, 0.5), 'p99': self._quantile(value, 0.99)}
+                           for (name, labels), value in sorted(histograms.items())],
+            'cache_hit_rates': {cache: lookups['hits'] / lookups['lookups']
+                                for cache, lookups in hit_rates.items() if lookups['lookups']},
+        }
+
+    def write_report(self, path=None):
+        """Write the JSON run report."""
+        if not self.enabled:
+            return
+        path = path or self.report_file
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, allow_nan=False)
+        logging.info(f"Run report written to {path}")
+
+    def prometheus_text(self):
+        """Render every series in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, {**value, 'buckets': list(value['buckets'])}) for key, value in self._histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(list(DEFAULT_BUCKETS) + ['+Inf'], value['buckets']):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='0.0.0.0'):
+        """Serve `/metrics` in the Prometheus text format from a background thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logging.info(f"Serving Prometheus metrics on port {self._server.server_address[1]}")
+        return self._server
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @staticmethod
+    def _quantile(histogram, fraction):
+        """Estimate a quantile by interpolating within the bucket that contains it.
+
+        The estimate is kept within the smallest and largest observed values,
+        which also close the overflow bucket above the last bound.
+        """
+        if not histogram['count']:
+            return None
+        target = fraction * histogram['count']
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(list(DEFAULT_BUCKETS) + [histogram['max']], histogram['buckets']):
+            if count and cumulative + count >= target:
+                estimate = lower + (bound - lower) * (target - cumulative) / count
+                return min(max(estimate, histogram['min']), histogram['max'])
+            cumulative += count
+            lower = bound
+        return histogram['max']
+
+# Shared by every component of a run; enabled by `metrics.configure(config)`
+metrics = Metrics()
@@ -0,0 +1,203 @@
+import json
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+from tqdm import tqdm
+from fine_tuning.checkpoint import GenerationJournal, prompt_id
+from fine_tuning.utils import split_list, strip_private_keys
+
+_DONE = object()
+
+class StreamingPipeline:
+    """Stream sources through processing and generation straight into a JSONL file.
+
+    Every stage is a generator running on its own thread and hands items to the
+    next stage through a bounded queue. Memory stays bounded by the queue sizes
+    rather than the number of configured sources, and each example is written as
+    soon as it is generated. Unlike the batch path, prompts are not shuffled
+    globally; they are generated in the order sources finish fetching.
+    """
+
+    def __init__(self, data_fetcher, data_processor, config):
+        self.data_fetcher = data_fetcher
+        self.data_processor = data_processor
+        self.config = config
+        self.queue_size = config.get('pipeline', {}).get('queue_size', 256)
+        self.deduplicator = data_processor.make_deduplicator()
+        self._stop = threading.Event()
+
+    def run(self, output_file="fine_tuning_data.jsonl", resume=False):
+        """Run the pipeline and return `(examples_written, total_tokens)`.
+
+        With `resume=True`, prompts already in the generation journal are not generated again.
+        """
+        sources = self._buffered(self.iter_sources())
+        prompts = self._buffered(self.iter_prompts(sources))
+        examples = self._buffered(self.iter_examples(prompts, resume=resume))
+        try:
+            result = self.write_jsonl(examples, output_file)
+            if self.deduplicator:
+                logging.info(f"Deduplication stats: {self.deduplicator.stats}")
+            return result
+        finally:
+            # Unblock and wind down upstream stages, e.g. once the target is reached
+            self._stop.set()
+
+    def iter_sources(self):
+        """Yield `(kind, data)` for every source that was fetched successfully."""
+        for kind, identifier, data in self.data_fetcher.iter_sources(
+            self.config['github']['repos'], self.config['articles']['urls']
+        ):
+            if data:
+                yield kind, data
+            else:
+                logging.warning(f"No data fetched for {kind}: {identifier}")
+
+    def iter_prompts(self, sources):
+        """Turn fetched sources into prompts, a few repository files at a time.
+
+        Prompts duplicating an earlier one are dropped before generation.
+        """
+        for data in self._iter_all_prompts(sources):
+            if self.deduplicator and self.data_processor.is_duplicate(self.deduplicator, data):
+                continue
+            yield data
+
+    def _iter_all_prompts(self, sources):
+        batch_size = self.config['data_processing'].get('worker_batch_size', 32)
+        for kind, data in sources:
+            if kind == 'repo':
+                for batch in split_list(data, batch_size):
+                    yield from self.data_processor.process_repo_data(batch)
+            else:
+                yield from self.data_processor.process_article_data(data)
+
+    def iter_examples(self, prompts, resume=False):
+        """Generate examples through a CompletionScheduler with a bounded number of requests in flight.
+
+        The scheduler runs on its own event loop thread, so streamed prompts get
+        the same token and request budgets, 429-aware concurrency and retries as
+        the batch path. In 'packed' mode prompts are handed over `batch_size` at
+        a time to share a request. The Batch API backend cannot stream, so
+        `--stream` always uses the scheduler. Every example is appended to the
+        generation journal; with `resume=True`, prompts already in the journal
+        are replayed from it instead of being sent again.
+        """
+        generation_config = self.config['example_generation']
+        if generation_config.get('backend', 'scheduler') == 'batch':
+            logging.warning("--stream sends requests through the completion scheduler; "
+                            "example_generation.backend 'batch' only applies without --stream.")
+        journal = GenerationJournal(generation_config.get('journal', 'generation_journal.jsonl'))
+        completed = journal.load() if resume else {}
+        max_in_flight = generation_config.get('max_concurrency', 10)
+        group_size = self.data_processor.packed_batch_size()
+        loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+        loop_thread.start()
+        client = self.data_processor.make_async_client()
+        scheduler = self.data_processor.make_scheduler(client)
+        pending = {}
+
+        def submit(group):
+            future = asyncio.run_coroutine_threadsafe(self.data_processor.generate_examples_async(scheduler, group), loop)
+            pending[future] = group
+
+        try:
+            with journal.open(resume=resume):
+                group = []
+                for data in prompts:
+                    if prompt_id(data) in completed:
+                        yield completed[prompt_id(data)]
+                        continue
+                    group.append(data)
+                    if len(group) >= group_size:
+                        submit(group)
+                        group = []
+                    if len(pending) >= max_in_flight:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        yield from self._completed_examples(done, pending, journal)
+                    if self._stop.is_set():
+                        break
+                if group and not self._stop.is_set():
+                    submit(group)
+                done, _ = wait(pending)
+                yield from self._completed_examples(done, pending, journal)
+        finally:
+            # Requests still in flight when the writer stops early are abandoned
+            for future in pending:
+                future.cancel()
+            asyncio.run_coroutine_threadsafe(client.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            loop_thread.join()
+            loop.close()
+            logging.info(f"Completion scheduler stats: {scheduler.stats}")
+
+    def _completed_examples(self, futures, pending, journal):
+        """Journal and yield the examples from finished generation futures, skipping failed prompts."""
+        for future in futures:
+            group = pending.pop(future)
+            for data, example in zip(group, future.result()):
+                if example:
+                    journal.append(prompt_id(data), example)
+                    yield example
+
+    def write_jsonl(self, examples, output_file):
+        """Write valid examples as they arrive until the example or token budget is spent."""
+        target_examples = self.config['fine_tuning']['target_examples']
+        max_tokens = self.config['fine_tuning']['max_tokens']
+        written, total_tokens = 0, 0
+        with open(output_file, 'w', encoding='utf-8') as f, tqdm(total=target_examples, desc="Writing examples") as progress:
+            for example in examples:
+                if not self.data_processor.validate_example(example):
+                    logging.warning("Invalid example detected and skipped.")
+                    continue
+                num_tokens = self.data_processor.token_counter.count_example(example)
+                if total_tokens + num_tokens > max_tokens:
+                    continue
+                f.write(json.dumps(strip_private_keys(example), ensure_ascii=False) + '\n')
+                f.flush()
+                written += 1
+                total_tokens += num_tokens
+                progress.update(1)
+                if written >= target_examples:
+                    break
+        logging.info(f"Streamed {written} examples ({total_tokens} tokens) to {output_file}")
+        return written, total_tokens
+
+    def _buffered(self, iterable):
+        """Run a generator on a background thread, handing items over through a bounded queue."""
+        items = queue.Queue(maxsize=self.queue_size)
+
+        def put(item):
+            while not self._stop.is_set():
+                try:
+                    items.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for item in iterable:
+                    if not put(item):
+                        return
+            except Exception as e:
+                put(e)
+            put(_DONE)
+
+        threading.Thread(target=produce, daemon=True).start()
+        while True:
+            try:
+                item = items.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
@@ -0,0 +1,183 @@
+import re
+import time
+import random
+import asyncio
+import logging
+import openai
+from fine_tuning.metrics import metrics
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+def parse_reset_duration(value):
+    """Parse an `x-ratelimit-reset-*` duration such as '6m0s', '1.5s' or '120ms' into seconds."""
+    if not value:
+        return 0.0
+    units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+    return sum(float(amount) * units[unit] for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value))
+
+class TokenBucket:
+    """Continuously refilling budget of `capacity` units per minute."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.available = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    async def acquire(self, amount):
+        """Wait until `amount` units are available, then take them."""
+        # A single request larger than the whole budget would otherwise wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.available >= amount:
+                self.available -= amount
+                return
+            await asyncio.sleep((amount - self.available) * 60 / self.capacity)
+
+    def sync(self, remaining, reset_seconds):
+        """Align the local budget with the server's view from rate-limit headers."""
+        self._refill()
+        if remaining < self.available:
+            self.available = remaining
+        if remaining <= 0 and reset_seconds:
+            # Refill starts from zero once the server-side window resets
+            self.available = -reset_seconds * self.capacity / 60
+
+class CompletionScheduler:
+    """Run chat completion requests concurrently within token and request budgets.
+
+    Each request's token cost (prompt plus `max_tokens`) is estimated up front and
+    drawn from a tokens-per-minute bucket, alongside a requests-per-minute bucket.
+    Concurrency grows by one after each success and halves on a 429 or when the
+    `x-ratelimit-remaining-*` headers show less than 10% of the budget left. Failed
+    requests are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, client, tokens_per_minute, requests_per_minute, estimate_tokens,
+                 max_concurrency=50, max_retries=6, base_delay=1.0, max_delay=60.0):
+        self.client = client
+        self.estimate_tokens = estimate_tokens
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.requests = TokenBucket(requests_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.concurrency = max(1, min(max_concurrency, 8))
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'failed': 0, 'callback_errors': 0}
+        self._slots = None
+
+    async def run(self, requests, on_result=None):
+        """Complete every request; returns the assistant messages in request order.
+
+        Requests that still fail after all retries yield None. `on_result(index,
+        content)` is called as each request finishes; an error it raises is
+        logged and counted rather than aborting the other requests.
+        """
+        self._slots = asyncio.Condition()
+
+        async def complete(index, request):
+            content = await self.complete(request)
+            if on_result:
+                try:
+                    on_result(index, content)
+                except Exception as e:
+                    self.stats['callback_errors'] += 1
+                    metrics.inc('openai_callback_errors_total', endpoint='chat.completions')
+                    logging.error(f"Failed to handle the result of request {index}: {e}", exc_info=True)
+            return content
+
+        return await asyncio.gather(*(complete(index, request) for index, request in enumerate(requests)))
+
+    async def complete(self, request):
+        """Complete a single request, retrying retryable errors with jittered backoff."""
+        estimated_tokens = self.estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            await self.tokens.acquire(estimated_tokens)
+            await self.requests.acquire(1)
+            await self._acquire_slot()
+            try:
+                self.stats['requests'] += 1
+                metrics.inc('openai_requests_total', endpoint='chat.completions')
+                with metrics.timer('openai_request_seconds', endpoint='chat.completions'):
+                    raw_response = await self.client.chat.completions.with_raw_response.create(**request)
+                self._observe_headers(raw_response.headers)
+                self._increase_concurrency()
+                response = raw_response.parse()
+                if response.usage:
+                    metrics.inc('openai_tokens_total', response.usage.prompt_tokens, direction='in')
+                    metrics.inc('openai_tokens_total', response.usage.completion_tokens, direction='out')
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                delay = self._backoff_delay(attempt, e)
+                if isinstance(e, openai.RateLimitError):
+                    self.stats['rate_limited'] += 1
+                    metrics.inc('openai_rate_limited_total', endpoint='chat.completions')
+                    self._decrease_concurrency()
+                if attempt == self.max_retries:
+                    self.stats['failed'] += 1
+                    metrics.inc('openai_failures_total', endpoint='chat.completions')
+                    logging.error(f"Completion failed after {self.max_retries} retries: {e}")
+                    return None
+                self.stats['retries'] += 1
+                metrics.inc('openai_retries_total', endpoint='chat.completions')
+                logging.warning(f"Retrying completion in {delay:.1f}s after error: {e}")
+            except openai.OpenAIError as e:
+                self.stats['failed'] += 1
+                metrics.inc('openai_failures_total', endpoint='chat.completions')
+                logging.error(f"Completion failed: {e}")
+                return None
+            finally:
+                await self._release_slot()
+            await asyncio.sleep(delay)
+
+    def _backoff_delay(self, attempt, error):
+        """Prefer the server's retry-after hint, else exponential backoff with full jitter."""
+        response = getattr(error, 'response', None)
+        if response is not None:
+            if response.headers.get('retry-after-ms'):
+                return float(response.headers['retry-after-ms']) / 1000
+            if response.headers.get('retry-after'):
+                return float(response.headers['retry-after'])
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _observe_headers(self, headers):
+        """Sync the buckets with the server's remaining quota and back off when it runs low."""
+        for bucket, kind in ((self.tokens, 'tokens'), (self.requests, 'requests')):
+            remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+            limit = headers.get(f'x-ratelimit-limit-{kind}')
+            if remaining is None:
+                continue
+            bucket.sync(int(remaining), parse_reset_duration(headers.get(f'x-ratelimit-reset-{kind}')))
+            if limit and int(remaining) < 0.1 * int(limit):
+                self._decrease_concurrency()
+
+    async def _acquire_slot(self):
+        if self._slots is None:
+            # Requests sent through `complete` directly, without `run`
+            self._slots = asyncio.Condition()
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+
+    async def _release_slot(self):
+        async with self._slots:
+            self.in_flight -= 1
+            self._slots.notify_all()
+
+    def _increase_concurrency(self):
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+
+    def _decrease_concurrency(self):
+        self.concurrency = max(1, self.concurrency // 2)
@@ -0,0 +1,83 @@
+import heapq
+import math
+from collections import Counter
+
+class ExampleSelector:
+    """Pick fine-tuning examples that fill the example target and token budget.
+
+    Selection runs in two O(n log n) passes. First, candidates are taken
+    smallest first, which fits the largest possible number of examples into
+    `max_tokens`. Then the remaining budget is spent by swapping the smallest
+    selected examples for the largest unselected ones that still fit, so the
+    budget carries as many training tokens as possible.
+
+    Per-source quotas cap how many examples any one source (the `_source` key
+    set during processing) contributes: `max_source_share` applies to every
+    source, and `source_quotas` overrides it per source, both as fractions of
+    `target_examples`. Examples without a source are not capped.
+    """
+
+    def __init__(self, max_tokens, target_examples, max_source_share=None, source_quotas=None):
+        self.max_tokens = max_tokens
+        self.target_examples = target_examples
+        self.max_source_share = max_source_share
+        self.source_quotas = source_quotas or {}
+        self.stats = {}
+
+    def quota(self, source):
+        """Maximum number of examples a source may contribute."""
+        share = self.source_quotas.get(source, self.max_source_share)
+        if source is None or share is None:
+            return math.inf
+        return max(1, int(share * self.target_examples))
+
+    def select(self, examples, token_counts):
+        """Return the selected examples in their original order."""
+        order = sorted(range(len(examples)), key=token_counts.__getitem__)
+        sources = [example.get('_source') for example in examples]
+        per_source = Counter()
+        selected = set()
+        total_tokens = 0
+
+        # Pass 1: smallest first maximizes how many examples fit
+        for index in order:
+            if len(selected) >= self.target_examples:
+                break
+            source = sources[index]
+            if total_tokens + token_counts[index] > self.max_tokens or per_source[source] >= self.quota(source):
+                continue
+            selected.add(index)
+            per_source[source] += 1
+            total_tokens += token_counts[index]
+
+        # Pass 2: trade the smallest selected examples for the largest ones that still fit
+        smallest = [(token_counts[index], index) for index in selected]
+        heapq.heapify(smallest)
+        swaps = 0
+        for index in reversed(order):
+            if not smallest or token_counts[index] <= smallest[0][0]:
+                break
+            if index in selected:
+                continue
+            removed_tokens, removed = smallest[0]
+            source = sources[index]
+            if total_tokens - removed_tokens + token_counts[index] > self.max_tokens:
+                continue
+            if per_source[source] - (sources[removed] == source) >= self.quota(source):
+                continue
+            heapq.heappop(smallest)
+            selected.remove(removed)
+            selected.add(index)
+            per_source[sources[removed]] -= 1
+            per_source[source] += 1
+            total_tokens += token_counts[index] - removed_tokens
+            swaps += 1
+
+        self.stats = {
+            'candidates': len(examples),
+            'selected': len(selected),
+            'total_tokens': total_tokens,
+            'swaps': swaps,
+            'per_source': dict(per_source),
+        }
+        return [examples[index] for index in sorted(selected)]
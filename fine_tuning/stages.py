@@ -0,0 +1,159 @@
+import os
+import json
+import uuid
+import pickle
+import hashlib
+import logging
+from fine_tuning.metrics import metrics
+
+def config_value(config, key):
+    """Look up a dotted key such as 'fine_tuning.upload' in the config, or None if it is missing."""
+    value = config
+    for part in key.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def hash_json(value):
+    """SHA-256 of a JSON-serializable value, independent of dict key order."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def hash_file(file_path):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_sources(all_repo_data, all_article_data):
+    """Content hash of fetched sources, using the store's blob digests where available."""
+    digest = hashlib.sha256()
+    for repo_name in sorted(all_repo_data):
+        repo_data = all_repo_data[repo_name]
+        digest.update(f"repo\0{repo_name}\0".encode('utf-8'))
+        if hasattr(repo_data, 'digests'):
+            entries = repo_data.digests()
+        else:
+            entries = [(path, hashlib.sha256(content.encode('utf-8')).hexdigest()) for path, content in repo_data]
+        for path, blob_digest in entries:
+            digest.update(f"{path}\0{blob_digest}\0".encode('utf-8'))
+    for url in sorted(all_article_data):
+        digest.update(f"article\0{url}\0".encode('utf-8'))
+        digest.update(all_article_data[url].encode('utf-8'))
+    return digest.hexdigest()
+
+class StageRunner:
+    """Run pipeline stages, skipping those whose inputs have not changed.
+
+    A stage's input hash covers the config subsections it reads and the hashes
+    of the upstream artifacts it consumes. Its output is pickled under `dir`
+    and recorded in a JSON manifest together with that input hash, so a later
+    run with the same inputs loads the output instead of recomputing it. Files
+    a stage writes are recorded by content hash and must still match for the
+    stage to be skipped. The output hash handed downstream is the stage's own
+    input hash unless the stage supplies a content hash of its output.
+    """
+
+    def __init__(self, config):
+        stage_config = config.get('stages', {})
+        self.config = config
+        self.enabled = stage_config.get('enabled', True)
+        self.dir = stage_config.get('dir', os.path.join(config['cache']['dir'], 'stages'))
+        self.manifest_path = os.path.join(self.dir, 'manifest.json')
+        self.manifest = self._load_manifest()
+        self.stats = {'run': [], 'skipped': []}
+
+    def input_hash(self, name, config_keys=(), upstream=()):
+        """Hash of everything a stage depends on."""
+        return hash_json({
+            'stage': name,
+            'config': {key: config_value(self.config, key) for key in config_keys},
+            'upstream': list(upstream),
+        })
+
+    def run(self, name, func, config_keys=(), upstream=(), files=(), output_hash=None, validate=None,
+            complete=None, always_run=False):
+        """Return `(output, output_hash)` for a stage, calling `func()` only if its inputs changed.
+
+        `files` lists paths the stage writes, `output_hash(output)` computes a
+        content hash of the output for downstream stages, `validate(output)`
+        may reject a cached output that is no longer usable, and `always_run`
+        stages (such as fetching, whose inputs live outside this process) are
+        never skipped, only hashed. An output for which `complete(output)` is
+        false (e.g. some requests failed) is not cached, so the next run tries
+        again; it gets a one-off hash so downstream stages are not cached on it
+        either.
+        """
+        key = self.input_hash(name, config_keys, upstream)
+        entry = self.manifest.get(name)
+        if self.enabled and not always_run and entry and entry['input_hash'] == key:
+            output = self._load_output(name, entry, validate)
+            if output is not None:
+                logging.info(f"Stage '{name}' is up to date; reusing its output.")
+                self.stats['skipped'].append(name)
+                metrics.inc('stage_runs_total', stage=name, result='skipped')
+                return output[0], entry['output_hash']
+
+        logging.info(f"Running stage '{name}'...")
+        with metrics.timer('stage_seconds', stage=name):
+            output = func()
+        self.stats['run'].append(name)
+        metrics.inc('stage_runs_total', stage=name, result='run')
+        result_hash = output_hash(output) if output_hash else key
+        if complete and not complete(output):
+            logging.info(f"Stage '{name}' did not complete; its output will not be reused.")
+            return output, uuid.uuid4().hex
+        if self.enabled and not always_run:
+            self._save_output(name, key, result_hash, output, files)
+        return output, result_hash
+
+    def _output_path(self, name):
+        return os.path.join(self.dir, f"{name}.pkl")
+
+    def _load_output(self, name, entry, validate):
+        """Return the cached output wrapped in a 1-tuple, or None if it is missing or stale."""
+        for file_path, file_hash in entry.get('files', {}).items():
+            if not os.path.exists(file_path) or hash_file(file_path) != file_hash:
+                logging.info(f"Stage '{name}' output {file_path} is missing or modified; rerunning.")
+                return None
+        try:
+            with open(self._output_path(name), 'rb') as f:
+                output = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logging.warning(f"Could not load cached output of stage '{name}': {e}")
+            return None
+        if validate and not validate(output):
+            logging.info(f"Cached output of stage '{name}' is no longer valid; rerunning.")
+            return None
+        return (output,)
+
+    def _save_output(self, name, key, result_hash, output, files):
+        os.makedirs(self.dir, exist_ok=True)
+        temp_path = f"{self._output_path(name)}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self._output_path(name))
+        self.manifest[name] = {
+            'input_hash': key,
+            'output_hash': result_hash,
+            'files': {file_path: hash_file(file_path) for file_path in files},
+        }
+        self._save_manifest()
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable stage manifest {self.manifest_path}: {e}")
+            return {}
+
+    def _save_manifest(self):
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
@@ -0,0 +1,106 @@
+import csv
+import json
+import asyncio
+import logging
+import itertools
+import openai
+from openai import AsyncOpenAI
+from fine_tuning.job_monitor import JobMonitor
+
+RESULT_FIELDS = ['run', 'hyperparameters', 'job_ids', 'status', 'fine_tuned_model', 'final_step', 'final_train_loss',
+                 'final_train_accuracy', 'error']
+
+def expand_sweep(parameters):
+    """Expand `{name: [values, ...]}` into the grid of hyperparameter combinations."""
+    names = list(parameters)
+    return [dict(zip(names, values)) for values in itertools.product(*(parameters[name] for name in names))]
+
+class SweepOrchestrator:
+    """Fine-tune one set of uploaded training files under many hyperparameter settings.
+
+    Every combination in `fine_tuning.sweep.parameters` becomes a run. At most
+    `max_concurrent_jobs` runs have a job in flight at once, and a job creation
+    rejected with a rate limit (the account's job limit) is retried after
+    `retry_interval` seconds. All runs are followed from one asyncio loop with
+    a shared JobMonitor. A run over several training files, as produced by
+    sharding, follows `FineTuner.training_schedule`: one epoch per file and
+    job, each job continuing the previous model.
+    Results are written as a CSV table.
+    """
+
+    def __init__(self, fine_tuner, config):
+        sweep_config = config['fine_tuning'].get('sweep', {})
+        self.fine_tuner = fine_tuner
+        self.config = config
+        self.runs = expand_sweep(sweep_config.get('parameters', {}))
+        self.max_concurrent_jobs = sweep_config.get('max_concurrent_jobs', 3)
+        self.retry_interval = sweep_config.get('retry_interval', 60)
+        self.results_file = sweep_config.get('results_file', 'sweep_results.csv')
+
+    def run(self, training_file_ids):
+        """Run every combination and write the results table; returns the result rows."""
+        results = asyncio.run(self._run_all(training_file_ids))
+        self.write_results(results)
+        return results
+
+    async def _run_all(self, training_file_ids):
+        slots = asyncio.Semaphore(self.max_concurrent_jobs)
+        client = self.fine_tuner.client
+        async with AsyncOpenAI(api_key=client.api_key, base_url=client.base_url) as async_client:
+            monitor = JobMonitor(async_client, self.config)
+            logging.info(f"Starting sweep of {len(self.runs)} runs, at most {self.max_concurrent_jobs} jobs at a time.")
+            return await asyncio.gather(*(
+                self._run_one(index, hyperparameters, training_file_ids, slots, monitor)
+                for index, hyperparameters in enumerate(self.runs)
+            ))
+
+    async def _run_one(self, index, hyperparameters, training_file_ids, slots, monitor):
+        row = {'run': index, 'hyperparameters': hyperparameters, 'job_ids': [], 'status': None,
+               'fine_tuned_model': None, 'final_step': None, 'final_train_loss': None,
+               'final_train_accuracy': None, 'error': None}
+        model = None
+        try:
+            schedule = self.fine_tuner.training_schedule(training_file_ids, hyperparameters.get('n_epochs'))
+        except ValueError as e:
+            row['status'], row['error'] = 'error', str(e)
+            return row
+        async with slots:
+            for training_file_id, n_epochs in schedule:
+                try:
+                    job_id = await self._create_job(training_file_id, model, {**hyperparameters, 'n_epochs': n_epochs})
+                except (openai.OpenAIError, ValueError) as e:
+                    row['status'], row['error'] = 'error', str(e)
+                    return row
+                row['job_ids'].append(job_id)
+                result = await monitor.watch(job_id)
+                row['status'], row['error'] = result['status'], result['error']
+                if result['metrics']:
+                    final = result['metrics'][-1]
+                    row['final_step'] = final.get('step')
+                    row['final_train_loss'] = final.get('train_loss')
+                    row['final_train_accuracy'] = final.get('train_mean_token_accuracy')
+                if result['status'] != 'succeeded':
+                    return row
+                model = row['fine_tuned_model'] = result['fine_tuned_model']
+        logging.info(f"Sweep run {index} {hyperparameters} finished: {row['fine_tuned_model']}")
+        return row
+
+    async def _create_job(self, training_file_id, model, hyperparameters):
+        """Create a job on a worker thread, waiting out the account's job limit."""
+        while True:
+            try:
+                return await asyncio.to_thread(
+                    self.fine_tuner.create_fine_tune_job, training_file_id, model=model, hyperparameters=hyperparameters
+                )
+            except openai.RateLimitError:
+                logging.info(f"Fine-tuning job limit reached; retrying in {self.retry_interval}s.")
+                await asyncio.sleep(self.retry_interval)
+
+    def write_results(self, results):
+        """Write one CSV row per run."""
+        with open(self.results_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            for row in results:
+                writer.writerow({**row, 'hyperparameters': json.dumps(row['hyperparameters']), 'job_ids': ' '.join(row['job_ids'])})
+        logging.info(f"Sweep results written to {self.results_file}")
@@ -0,0 +1,80 @@
+import tiktoken
+
+TOKENS_PER_MESSAGE = 4  # Each message is wrapped in start/role/end tokens
+TOKENS_PER_REPLY = 2  # Priming for the assistant's reply
+
+class TokenCounter:
+    """Count chat tokens with cached encoders and batch encoding.
+
+    Counts match `utils.num_tokens_from_messages` for ordinary text. Text is
+    encoded with `encode_ordinary`, so special-token strings such as
+    `<|endoftext|>` in scraped content count as plain text, where the `encode`
+    used by utils raises instead. Encoders are loaded once per model and role
+    strings are counted once each. `count_examples` encodes all message
+    contents in one `encode_ordinary_batch` call and memoizes each example's
+    count under its `_num_tokens` key, so budgeting and cost estimation reuse
+    the count instead of tokenizing again. Examples must not be edited after
+    they have been counted.
+    """
+
+    def __init__(self, model="gpt-4o-2024-08-06", num_threads=8):
+        self.model = model
+        self.num_threads = num_threads
+        self._encodings = {}
+        self._value_tokens = {}
+
+    def encoding(self, model=None):
+        """The tiktoken encoding for a model, falling back to cl100k_base."""
+        model = model or self.model
+        if model not in self._encodings:
+            try:
+                self._encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encodings[model] = tiktoken.get_encoding("cl100k_base")
+        return self._encodings[model]
+
+    def count_messages(self, messages, model=None):
+        """Return the number of tokens used by a list of messages."""
+        encoding = self.encoding(model)
+        num_tokens = TOKENS_PER_REPLY
+        for message in messages:
+            num_tokens += TOKENS_PER_MESSAGE
+            for key, value in message.items():
+                if key == 'content':
+                    num_tokens += len(encoding.encode_ordinary(value))
+                else:
+                    num_tokens += self._count_value(encoding, value)
+        return num_tokens
+
+    def count_example(self, example):
+        """Return an example's token count, computing and memoizing it on first use."""
+        if '_num_tokens' not in example:
+            example['_num_tokens'] = self.count_messages(example['messages'])
+        return example['_num_tokens']
+
+    def count_examples(self, examples):
+        """Count and memoize every example's tokens, batch-encoding the uncounted ones.
+
+        Returns the total token count.
+        """
+        uncounted = [example for example in examples if '_num_tokens' not in example]
+        if uncounted:
+            encoding = self.encoding()
+            contents = [message['content'] for example in uncounted for message in example['messages']]
+            content_tokens = iter(encoding.encode_ordinary_batch(contents, num_threads=self.num_threads))
+            for example in uncounted:
+                num_tokens = TOKENS_PER_REPLY
+                for message in example['messages']:
+                    num_tokens += TOKENS_PER_MESSAGE + len(next(content_tokens))
+                    for key, value in message.items():
+                        if key != 'content':
+                            num_tokens += self._count_value(encoding, value)
+                example['_num_tokens'] = num_tokens
+        return sum(example['_num_tokens'] for example in examples)
+
+    def _count_value(self, encoding, value):
+        """Token count of a short, repeated value such as a role, cached per encoding."""
+        key = (encoding.name, value)
+        if key not in self._value_tokens:
+            self._value_tokens[key] = len(encoding.encode_ordinary(value))
+        return self._value_tokens[key]
@@ -0,0 +1,152 @@
+import io
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+import openai
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fine_tuning.metrics import metrics
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+MB = 1024 * 1024
+
+def shard_jsonl(file_path, max_bytes):
+    """Split a JSONL file into roughly equal files of at most `max_bytes`, at line boundaries.
+
+    Returns `[file_path]` when the file already fits, otherwise the paths of the
+    `<name>.partNN.jsonl` shards written next to it.
+    """
+    size = os.path.getsize(file_path)
+    if size <= max_bytes:
+        return [file_path]
+    num_shards = math.ceil(size / max_bytes)
+    target_bytes = size / num_shards
+    stem, ext = os.path.splitext(file_path)
+    shard_paths, shard, shard_bytes = [], None, 0
+    with open(file_path, 'rb') as f:
+        for line in f:
+            # Fill each shard to the even share, never past max_bytes
+            if shard is None or shard_bytes >= target_bytes or (shard_bytes and shard_bytes + len(line) > max_bytes):
+                if shard:
+                    shard.close()
+                shard_paths.append(f"{stem}.part{len(shard_paths) + 1:02d}{ext}")
+                shard, shard_bytes = open(shard_paths[-1], 'wb'), 0
+            shard.write(line)
+            shard_bytes += len(line)
+    shard.close()
+    logging.info(f"Split {file_path} ({size} bytes) into {len(shard_paths)} training files.")
+    return shard_paths
+
+class MultipartUploader:
+    """Upload a file through the Uploads API in parallel parts.
+
+    The file is cut into `part_size_mb` parts that are sent on a thread pool,
+    each retried with jittered exponential backoff. Finished part IDs are
+    recorded in a `<file>.upload.json` state file, so a rerun after a failure
+    resumes the same upload and only sends the missing parts. The upload is
+    completed with the file's MD5 so the server can verify the assembled file.
+    """
+
+    def __init__(self, client, config):
+        upload_config = config['fine_tuning'].get('upload', {})
+        self.client = client
+        self.part_size = int(upload_config.get('part_size_mb', 64) * MB)
+        self.max_workers = upload_config.get('max_workers', 8)
+        self.max_retries = upload_config.get('max_retries', 5)
+        self.base_delay = upload_config.get('retry_delay', 1.0)
+
+    def upload(self, file_path, purpose='fine-tune', mime_type='application/jsonl'):
+        """Upload a file and return the resulting file ID."""
+        size = os.path.getsize(file_path)
+        state_path = f"{file_path}.upload.json"
+        state = self._load_state(state_path, file_path, size)
+        if state is None:
+            upload = self.client.uploads.create(
+                bytes=size, filename=os.path.basename(file_path), mime_type=mime_type, purpose=purpose
+            )
+            state = {'upload_id': upload.id, 'expires_at': upload.expires_at, 'size': size,
+                     'mtime': os.path.getmtime(file_path), 'part_size': self.part_size, 'parts': {}}
+            self._save_state(state_path, state)
+        else:
+            logging.info(f"Resuming upload {state['upload_id']}: {len(state['parts'])} parts already sent.")
+
+        num_parts = max(1, math.ceil(size / state['part_size']))
+        missing = [index for index in range(num_parts) if str(index) not in state['parts']]
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._upload_part, file_path, state, index): index for index in missing}
+            for future in as_completed(futures):
+                try:
+                    state['parts'][str(futures[future])] = future.result()
+                except openai.OpenAIError as e:
+                    errors.append(e)
+                    continue
+                # Record every finished part so a rerun can resume from here
+                self._save_state(state_path, state)
+        if errors:
+            logging.error(f"{len(errors)} parts of {file_path} failed; rerun to resume the upload.")
+            raise errors[0]
+
+        upload = self.client.uploads.complete(
+            state['upload_id'],
+            part_ids=[state['parts'][str(index)] for index in range(num_parts)],
+            md5=self._md5(file_path),
+        )
+        os.remove(state_path)
+        logging.info(f"Uploaded {file_path} in {num_parts} parts. File ID: {upload.file.id}")
+        return upload.file.id
+
+    def _upload_part(self, file_path, state, index):
+        """Send one part, retrying transient errors; returns the part ID."""
+        with open(file_path, 'rb') as f:
+            f.seek(index * state['part_size'])
+            data = f.read(state['part_size'])
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.timer('openai_request_seconds', endpoint='uploads.parts'):
+                    return self.client.uploads.parts.create(state['upload_id'], data=io.BytesIO(data)).id
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, openai.RateLimitError):
+                    metrics.inc('openai_rate_limited_total', endpoint='uploads.parts')
+                if attempt == self.max_retries:
+                    raise
+                metrics.inc('openai_retries_total', endpoint='uploads.parts')
+                delay = random.uniform(0, self.base_delay * 2 ** attempt)
+                logging.warning(f"Retrying part {index} of {file_path} in {delay:.1f}s after error: {e}")
+                time.sleep(delay)
+
+    def _load_state(self, state_path, file_path, size):
+        """Return the saved upload state if it belongs to this exact file, else None."""
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('size') != size or state.get('mtime') != os.path.getmtime(file_path):
+            logging.info(f"{file_path} changed since the interrupted upload; starting over.")
+            return None
+        if state.get('expires_at', 0) <= time.time():
+            logging.info(f"Interrupted upload {state['upload_id']} has expired; starting over.")
+            return None
+        return state
+
+    def _save_state(self, state_path, state):
+        temp_path = f"{state_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, state_path)
+
+    def _md5(self, file_path):
+        digest = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(MB), b''):
+                digest.update(block)
+        return digest.hexdigest()
@@ -87,6 +87,17 @@ def num_tokens_from_messages(messages, model="gpt-4o-2024-08-06"):
     num_tokens += 2  # For assistant's reply
     return num_tokens
 
+def strip_private_keys(example):
+    """Return an example without the underscore-prefixed bookkeeping keys.
+
+    Args:
+        example (dict): A fine-tuning example, possibly carrying keys such as `_num_tokens`.
+
+    Returns:
+        dict: The example with only the keys meant for the training file.
+    """
+    return {key: value for key, value in example.items() if not key.startswith('_')}
+
 def split_list(lst, n):
     """Split list into chunks of size n.
 
@@ -0,0 +1,383 @@
+import json
+import time
+import hashlib
+import uuid
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeOpenAIServer:
+    """Local stand-in for the parts of the OpenAI REST API the pipeline uses.
+
+    Intended for tests and benchmarks: point an `OpenAI`/`AsyncOpenAI` client at
+    `base_url` and every request is answered in-process. Chat completions wait
+    `latency` seconds, echo the prompt, and report `x-ratelimit-*` headers. The
+    first `rate_limit_first` completion requests are answered with HTTP 429.
+    JSON-mode requests whose user message lists `snippets` get one response
+    per snippet, leaving out the last `drop_packed_responses` of them.
+
+    Uploaded files are kept in memory. A batch runs its input file through the
+    chat completion handler when created, reports `in_progress` on its first
+    retrieval and `completed` after that. Multipart uploads assemble their parts
+    into a file on completion; the first `fail_parts_first` part requests are
+    answered with HTTP 500. Fine-tuning jobs advance one training step, with a
+    metrics event, each time their events are listed, and succeed after
+    `job_steps` steps; with `max_running_jobs`, creating more unfinished jobs
+    than that is answered with HTTP 429.
+    """
+
+    def __init__(self, latency=0.0, rate_limit_first=0, tokens_per_minute=1_000_000, requests_per_minute=10_000,
+                 fail_parts_first=0, job_steps=3, max_running_jobs=None, drop_packed_responses=0):
+        self.latency = latency
+        self.drop_packed_responses = drop_packed_responses
+        self.rate_limit_first = rate_limit_first
+        self.fail_parts_first = fail_parts_first
+        self.job_steps = job_steps
+        self.max_running_jobs = max_running_jobs
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.requests = []
+        self.files = {}
+        self.batches = {}
+        self.uploads = {}
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def count_requests(self, path):
+        """Return how many requests were made to a path."""
+        with self._lock:
+            return sum(1 for _, request_path, _ in self.requests if request_path == path)
+
+    def handle(self, method, path, headers, body, query=None):
+        """Dispatch a request; returns `(status, headers, payload)`."""
+        query = query or {}
+        with self._lock:
+            self.requests.append((method, path, body))
+        if method == 'POST' and path == '/v1/chat/completions':
+            return self.chat_completion(json.loads(body))
+        if method == 'POST' and path == '/v1/files':
+            return self.create_file(headers, body)
+        if method == 'GET' and path.startswith('/v1/files/') and path.endswith('/content'):
+            return self.file_content(path.split('/')[3])
+        if method == 'GET' and path.startswith('/v1/files/'):
+            return self.retrieve_file(path.split('/')[3])
+        if method == 'POST' and path == '/v1/batches':
+            return self.create_batch(json.loads(body))
+        if method == 'GET' and path.startswith('/v1/batches/'):
+            return self.retrieve_batch(path.split('/')[3])
+        if method == 'POST' and path == '/v1/uploads':
+            return self.create_upload(json.loads(body))
+        if method == 'POST' and path.startswith('/v1/uploads/') and path.endswith('/parts'):
+            return self.add_upload_part(path.split('/')[3], headers, body)
+        if method == 'POST' and path.startswith('/v1/uploads/') and path.endswith('/complete'):
+            return self.complete_upload(path.split('/')[3], json.loads(body))
+        if method == 'POST' and path == '/v1/fine_tuning/jobs':
+            return self.create_job(json.loads(body))
+        if method == 'GET' and path.startswith('/v1/fine_tuning/jobs/') and path.endswith('/events'):
+            return self.list_job_events(path.split('/')[4], query)
+        if method == 'GET' and path.startswith('/v1/fine_tuning/jobs/'):
+            return self.retrieve_job(path.split('/')[4])
+        return 404, {}, {'error': {'message': f"No fake route for {method} {path}", 'type': 'invalid_request_error'}}
+
+    def chat_completion(self, request):
+        with self._lock:
+            rate_limited = self.rate_limit_first > 0
+            if rate_limited:
+                self.rate_limit_first -= 1
+        if rate_limited:
+            return 429, {'retry-after-ms': '10'}, {
+                'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}
+            }
+        time.sleep(self.latency)
+        prompt = request['messages'][-1]['content']
+        headers = {
+            'x-ratelimit-limit-requests': str(self.requests_per_minute),
+            'x-ratelimit-remaining-requests': str(self.requests_per_minute - 1),
+            'x-ratelimit-limit-tokens': str(self.tokens_per_minute),
+            'x-ratelimit-remaining-tokens': str(self.tokens_per_minute - len(prompt)),
+            'x-ratelimit-reset-tokens': '0s',
+        }
+        return 200, headers, {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request['model'],
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': self.completion_content(request, prompt)},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': len(prompt), 'completion_tokens': 10, 'total_tokens': len(prompt) + 10},
+        }
+
+    def completion_content(self, request, prompt):
+        """Echo the prompt, answering each snippet of a packed JSON-mode request separately."""
+        if (request.get('response_format') or {}).get('type') == 'json_object':
+            try:
+                snippets = json.loads(prompt)['snippets']
+            except (ValueError, KeyError, TypeError):
+                return json.dumps({'error': 'no snippets'})
+            answered = snippets[:len(snippets) - self.drop_packed_responses]
+            return json.dumps({'responses': [{'id': snippet['id'], 'completion': f"Response to: {snippet['prompt']}"}
+                                             for snippet in answered]})
+        return f"Response to: {prompt}"
+
+    def add_file(self, content, filename, purpose):
+        """Store file content and return its file object."""
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        file_object = {
+            'id': file_id,
+            'object': 'file',
+            'bytes': len(content),
+            'created_at': int(time.time()),
+            'filename': filename,
+            'purpose': purpose,
+            'status': 'processed',
+        }
+        with self._lock:
+            self.files[file_id] = (file_object, content)
+        return file_object
+
+    def create_file(self, headers, body):
+        fields = parse_multipart(headers['Content-Type'], body)
+        filename, content = fields['file']
+        return 200, {}, self.add_file(content, filename, fields['purpose'][1].decode())
+
+    def retrieve_file(self, file_id):
+        if file_id not in self.files:
+            return 404, {}, {'error': {'message': f"No such file: {file_id}", 'type': 'invalid_request_error'}}
+        return 200, {}, self.files[file_id][0]
+
+    def file_content(self, file_id):
+        if file_id not in self.files:
+            return 404, {}, {'error': {'message': f"No such file: {file_id}", 'type': 'invalid_request_error'}}
+        return 200, {'Content-Type': 'application/octet-stream'}, self.files[file_id][1]
+
+    def create_batch(self, request):
+        output_lines, error_lines = [], []
+        for line in self.files[request['input_file_id']][1].decode('utf-8').splitlines():
+            batch_request = json.loads(line)
+            status, _, payload = self.chat_completion(batch_request['body'])
+            result = {
+                'id': f"batch_req_{uuid.uuid4().hex[:12]}",
+                'custom_id': batch_request['custom_id'],
+                'response': {'status_code': status, 'body': payload},
+                'error': None,
+            }
+            (output_lines if status == 200 else error_lines).append(json.dumps(result))
+        output_file = self.add_file('\n'.join(output_lines).encode('utf-8'), 'batch_output.jsonl', 'batch_output')
+        error_file = self.add_file('\n'.join(error_lines).encode('utf-8'), 'batch_errors.jsonl', 'batch_output') if error_lines else None
+        batch = {
+            'id': f"batch_{uuid.uuid4().hex[:24]}",
+            'object': 'batch',
+            'endpoint': request['endpoint'],
+            'input_file_id': request['input_file_id'],
+            'completion_window': request['completion_window'],
+            'created_at': int(time.time()),
+            'status': 'validating',
+            'output_file_id': output_file['id'],
+            'error_file_id': error_file['id'] if error_file else None,
+            'request_counts': {
+                'total': len(output_lines) + len(error_lines),
+                'completed': len(output_lines),
+                'failed': len(error_lines),
+            },
+        }
+        with self._lock:
+            self.batches[batch['id']] = batch
+        return 200, {}, batch
+
+    def retrieve_batch(self, batch_id):
+        with self._lock:
+            batch = self.batches[batch_id]
+            batch['status'] = 'completed' if batch['status'] == 'in_progress' else 'in_progress'
+            return 200, {}, dict(batch)
+
+    def create_upload(self, request):
+        upload = {
+            'id': f"upload_{uuid.uuid4().hex[:24]}",
+            'object': 'upload',
+            'bytes': request['bytes'],
+            'created_at': int(time.time()),
+            'expires_at': int(time.time()) + 3600,
+            'filename': request['filename'],
+            'purpose': request['purpose'],
+            'status': 'pending',
+            'file': None,
+        }
+        with self._lock:
+            self.uploads[upload['id']] = (upload, {})
+        return 200, {}, upload
+
+    def add_upload_part(self, upload_id, headers, body):
+        with self._lock:
+            failed = self.fail_parts_first > 0
+            if failed:
+                self.fail_parts_first -= 1
+        if failed:
+            return 500, {}, {'error': {'message': 'Part upload failed', 'type': 'server_error'}}
+        if upload_id not in self.uploads:
+            return 404, {}, {'error': {'message': f"No such upload: {upload_id}", 'type': 'invalid_request_error'}}
+        _, data = parse_multipart(headers['Content-Type'], body)['data']
+        part = {'id': f"part_{uuid.uuid4().hex[:24]}", 'object': 'upload.part',
+                'created_at': int(time.time()), 'upload_id': upload_id}
+        with self._lock:
+            self.uploads[upload_id][1][part['id']] = data
+        return 200, {}, part
+
+    def complete_upload(self, upload_id, request):
+        if upload_id not in self.uploads:
+            return 404, {}, {'error': {'message': f"No such upload: {upload_id}", 'type': 'invalid_request_error'}}
+        upload, parts = self.uploads[upload_id]
+        content = b''.join(parts[part_id] for part_id in request['part_ids'])
+        if len(content) != upload['bytes'] or request.get('md5', hashlib.md5(content).hexdigest()) != hashlib.md5(content).hexdigest():
+            return 400, {}, {'error': {'message': 'Uploaded parts do not match the declared file', 'type': 'invalid_request_error'}}
+        upload = dict(upload, status='completed', file=self.add_file(content, upload['filename'], upload['purpose']))
+        with self._lock:
+            self.uploads[upload_id] = (upload, parts)
+        return 200, {}, upload
+
+    def create_job(self, request):
+        with self._lock:
+            running = sum(1 for state in self.jobs.values() if state['job']['status'] not in ('succeeded', 'failed', 'cancelled'))
+        if self.max_running_jobs is not None and running >= self.max_running_jobs:
+            return 429, {}, {'error': {'message': 'Too many running fine-tuning jobs', 'type': 'invalid_request_error',
+                                       'code': 'rate_limit_exceeded'}}
+        job = {
+            'id': f"ftjob-{uuid.uuid4().hex[:24]}",
+            'object': 'fine_tuning.job',
+            'created_at': int(time.time()),
+            'model': request['model'],
+            'training_file': request['training_file'],
+            'hyperparameters': request.get('hyperparameters', {}),
+            'organization_id': 'org-fake',
+            'result_files': [],
+            'seed': 0,
+            'status': 'validating_files',
+            'fine_tuned_model': None,
+            'trained_tokens': None,
+            'error': None,
+        }
+        with self._lock:
+            self.jobs[job['id']] = {'job': job, 'events': [], 'step': 0}
+        self._add_job_event(job['id'], 'Validating training file')
+        return 200, {}, job
+
+    def retrieve_job(self, job_id):
+        if job_id not in self.jobs:
+            return 404, {}, {'error': {'message': f"No such job: {job_id}", 'type': 'invalid_request_error'}}
+        return 200, {}, self.jobs[job_id]['job']
+
+    def list_job_events(self, job_id, query):
+        if job_id not in self.jobs:
+            return 404, {}, {'error': {'message': f"No such job: {job_id}", 'type': 'invalid_request_error'}}
+        self._advance_job(job_id)
+        # Events are listed newest first; `after` pages towards older events
+        events = list(reversed(self.jobs[job_id]['events']))
+        if 'after' in query:
+            ids = [event['id'] for event in events]
+            events = events[ids.index(query['after']) + 1:]
+        limit = int(query.get('limit', 20))
+        return 200, {}, {'object': 'list', 'data': events[:limit], 'has_more': len(events) > limit}
+
+    def _advance_job(self, job_id):
+        with self._lock:
+            state = self.jobs[job_id]
+            job = state['job']
+            if job['status'] == 'validating_files':
+                job['status'] = 'running'
+                message, data, event_type = 'Fine-tuning job started', None, 'message'
+            elif job['status'] == 'running' and state['step'] < self.job_steps:
+                state['step'] += 1
+                message = f"Step {state['step']}/{self.job_steps}: training loss={1.0 / state['step']:.4f}"
+                data = {'step': state['step'], 'total_steps': self.job_steps, 'train_loss': 1.0 / state['step'],
+                        'train_mean_token_accuracy': 0.5 + 0.1 * state['step']}
+                event_type = 'metrics'
+            elif job['status'] == 'running':
+                # A job continuing a fine-tuned model names the same base model, as the real API does
+                base_model = job['model'].split(':')[1] if job['model'].startswith('ft:') else job['model']
+                job.update(status='succeeded', fine_tuned_model=f"ft:{base_model}:fake::{job_id[-8:]}",
+                           trained_tokens=1000 * self.job_steps, finished_at=int(time.time()))
+                message, data, event_type = 'The job has successfully completed', None, 'message'
+            else:
+                return
+        self._add_job_event(job_id, message, data, event_type)
+
+    def _add_job_event(self, job_id, message, data=None, event_type='message'):
+        with self._lock:
+            events = self.jobs[job_id]['events']
+            events.append({
+                'id': f"ftevent-{job_id[-8:]}-{len(events):04d}",
+                'object': 'fine_tuning.job.event',
+                'created_at': int(time.time()),
+                'level': 'info',
+                'message': message,
+                'data': data,
+                'type': event_type,
+            })
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _dispatch(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                path, _, query_string = self.path.partition('?')
+                query = {key: values[-1] for key, values in parse_qs(query_string).items()}
+                status, headers, payload = server.handle(method, path, self.headers, body, query)
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', headers.pop('Content-Type', 'application/json'))
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def parse_multipart(content_type, body):
+    """Parse a multipart/form-data body into `{name: (filename, bytes)}`."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + body
+    )
+    return {
+        part.get_param('name', header='content-disposition'): (part.get_filename(), part.get_payload(decode=True))
+        for part in message.iter_parts()
+    }
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import threading
+import unittest
+import requests
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fine_tuning.article_client import ArticleClient
+from fine_tuning.corpus_store import CorpusStore
+from fine_tuning.config import load_config
+
+class ArticleServer:
+    """Serves `pages` with ETags over keep-alive connections, counting connections and responses."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.connections = 0
+        self.responses = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def do_GET(self):
+                body = server.pages.get(self.path, b'')
+                etag = f'"{hash(body)}"'
+                if self.headers.get('If-None-Match') == etag:
+                    server.responses.append(304)
+                    self.send_response(304)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                status = 200 if self.path in server.pages else 403
+                server.responses.append(status)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def extract(content, content_type):
+    return content.decode('utf-8').strip()
+
+class TestArticleClient(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = CorpusStore(os.path.join(self.temp_dir.name, 'store'))
+        self.server = ArticleServer({'/a': b'Nightshade', '/b': b'Chain signatures', '/empty': b'  '})
+        self.client = ArticleClient(self.store, self.config)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def expire(self, url, days=30):
+        with self.store._conn:
+            self.store._conn.execute("UPDATE entries SET timestamp = ? WHERE identifier = ?",
+                                     ((datetime.now() - timedelta(days=days)).timestamp(), url))
+
+    def test_requests_share_a_connection(self):
+        self.assertEqual(self.client.fetch(self.server.url + '/a', extract), 'Nightshade')
+        self.assertEqual(self.client.fetch(self.server.url + '/b', extract), 'Chain signatures')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_fresh_copy_is_not_requested(self):
+        self.client.fetch(self.server.url + '/a', extract)
+        self.assertEqual(self.client.fetch(self.server.url + '/a', extract), 'Nightshade')
+        self.assertEqual(self.server.responses, [200])
+        self.assertEqual(self.client.stats['fresh'], 1)
+
+    def test_expired_copy_is_revalidated(self):
+        url = self.server.url + '/a'
+        self.client.fetch(url, extract)
+        self.expire(url)
+        self.assertEqual(self.client.fetch(url, extract), 'Nightshade')
+        self.assertEqual(self.server.responses, [200, 304])
+        # A 304 renews the copy, so the next fetch is served locally
+        self.client.fetch(url, extract)
+        self.assertEqual(self.server.responses, [200, 304])
+
+    def test_changed_page_is_downloaded_again(self):
+        url = self.server.url + '/a'
+        self.client.fetch(url, extract)
+        self.expire(url)
+        self.server.pages['/a'] = b'Nightshade 2.0'
+        self.assertEqual(self.client.fetch(url, extract), 'Nightshade 2.0')
+        self.assertEqual(self.store.load(url), 'Nightshade 2.0')
+
+    def test_empty_and_forbidden_pages_are_negatively_cached(self):
+        for path in ('/empty', '/forbidden'):
+            self.assertEqual(self.client.fetch(self.server.url + path, extract), "")
+            self.assertEqual(self.client.fetch(self.server.url + path, extract), "")
+        self.assertEqual(self.server.responses, [200, 403])
+        self.assertEqual(self.client.stats['negative'], 2)
+
+        # After the negative TTL the page is requested again
+        self.expire(self.server.url + '/empty', days=2)
+        self.server.pages['/empty'] = b'Now with content'
+        self.assertEqual(self.client.fetch(self.server.url + '/empty', extract), 'Now with content')
+
+    def test_forbidden_revalidation_keeps_the_cached_copy(self):
+        url = self.server.url + '/a'
+        self.client.fetch(url, extract)
+        self.expire(url)
+        del self.server.pages['/a']
+        self.assertEqual(self.client.fetch(url, extract), 'Nightshade')
+        self.assertEqual(self.server.responses, [200, 403])
+        self.assertEqual(self.store.load(url), 'Nightshade')
+
+    def test_unreachable_host_serves_the_stale_copy(self):
+        # Nothing listens on port 9 of the loopback interface
+        url = 'http://127.0.0.1:9/paper'
+        self.store.save(url, 'article', 'Nightshade')
+        self.expire(url)
+        self.assertEqual(self.client.fetch(url, extract), 'Nightshade')
+        self.assertEqual(self.client.stats['stale'], 1)
+
+        with self.assertRaises(requests.ConnectionError):
+            self.client.fetch('http://127.0.0.1:9/never-fetched', extract)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from openai import OpenAI
+from helpers import BYTE_ENCODING
+from fake_openai import FakeOpenAIServer
+from fine_tuning.batch_generation import BatchGenerator, shard_requests
+from fine_tuning.data_processors import DataProcessor
+from fine_tuning.config import load_config
+
+def make_request(prompt):
+    return {
+        'model': 'gpt-4o-mini-2024-07-18',
+        'messages': [{'role': 'user', 'content': prompt}],
+        'temperature': 0.7,
+        'max_tokens': 100,
+    }
+
+class TestShardRequests(unittest.TestCase):
+    def test_shards_respect_request_limit(self):
+        shards = list(shard_requests([make_request(f'Prompt {i}') for i in range(5)], max_requests=2))
+
+        self.assertEqual([[index for index, _ in shard] for shard in shards], [[0, 1], [2, 3], [4]])
+
+    def test_shards_respect_byte_limit(self):
+        requests = [make_request(f'Prompt {i}') for i in range(4)]
+        line_size = len(next(shard_requests(requests[:1]))[0][1])
+        shards = list(shard_requests(requests, max_bytes=line_size * 2))
+
+        self.assertEqual([len(shard) for shard in shards], [2, 2])
+
+    def test_lines_are_batch_api_requests(self):
+        (_, line), = next(shard_requests([make_request('Prompt')]))
+
+        self.assertEqual(json.loads(line), {
+            'custom_id': '0', 'method': 'POST', 'url': '/v1/chat/completions', 'body': make_request('Prompt')
+        })
+
+class TestBatchGenerator(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.config['example_generation']['batch'] = {'poll_interval': 0, 'max_requests': 3}
+
+    def test_results_are_returned_in_request_order(self):
+        with FakeOpenAIServer() as server:
+            generator = BatchGenerator(OpenAI(api_key='test', base_url=server.base_url), self.config)
+            results = generator.run([make_request(f'Prompt {i}') for i in range(7)])
+
+        self.assertEqual(results, [f'Response to: Prompt {i}' for i in range(7)])
+        self.assertEqual(generator.stats['batches'], 3)
+        self.assertEqual(server.count_requests('/v1/batches'), 3)
+
+    def test_failed_requests_yield_none(self):
+        with FakeOpenAIServer(rate_limit_first=1) as server:
+            generator = BatchGenerator(OpenAI(api_key='test', base_url=server.base_url), self.config)
+            results = generator.run([make_request(f'Prompt {i}') for i in range(3)])
+
+        self.assertEqual(results, [None, 'Response to: Prompt 1', 'Response to: Prompt 2'])
+        self.assertEqual(generator.stats['failed'], 1)
+
+@patch('tiktoken.encoding_for_model', return_value=BYTE_ENCODING)
+class TestBatchBackend(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['completions'] = {'enabled': False}
+        self.config['example_generation']['journal'] = os.path.join(self.temp_dir.name, 'journal.jsonl')
+        self.config['example_generation']['backend'] = 'batch'
+        self.config['example_generation']['batch'] = {'poll_interval': 0}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_generate_refined_examples_through_batches(self, mock_encoding_for_model):
+        processed_data = [{'prompt': f'Prompt {i}', 'completion': ''} for i in range(10)]
+        with FakeOpenAIServer() as server:
+            data_processor = DataProcessor(OpenAI(api_key='test', base_url=server.base_url), self.config)
+            examples = data_processor.generate_refined_examples(processed_data)
+
+        self.assertEqual(server.count_requests('/v1/chat/completions'), 0)
+        self.assertEqual(len(examples), 10)
+        for example in examples:
+            prompt, response = (message['content'] for message in example['messages'])
+            self.assertEqual(response, f'Response to: {prompt}')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from openai import OpenAI
+from helpers import BYTE_ENCODING
+from fake_openai import FakeOpenAIServer
+from fine_tuning.checkpoint import GenerationJournal, prompt_id
+from fine_tuning.data_processors import DataProcessor
+from fine_tuning.config import load_config
+
+def fake_generate_example(data):
+    return {
+        "messages": [
+            {"role": "user", "content": data['prompt']},
+            {"role": "assistant", "content": f"Answer to {data['prompt']}"}
+        ]
+    }
+
+class TestGenerationJournal(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.temp_dir.name, 'journal.jsonl')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_append_and_load(self):
+        with GenerationJournal(self.journal_path).open() as journal:
+            journal.append('abc', {'messages': []})
+
+        self.assertEqual(GenerationJournal(self.journal_path).load(), {'abc': {'messages': []}})
+
+    def test_truncated_last_line_is_ignored(self):
+        with GenerationJournal(self.journal_path).open() as journal:
+            journal.append('abc', {'messages': []})
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"prompt_id": "def", "exam')
+
+        self.assertEqual(list(GenerationJournal(self.journal_path).load()), ['abc'])
+
+@patch('tiktoken.encoding_for_model', return_value=BYTE_ENCODING)
+class TestResumableGeneration(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['completions'] = {'enabled': False}
+        self.config['example_generation']['journal'] = os.path.join(self.temp_dir.name, 'journal.jsonl')
+        self.config['example_generation']['mode'] = 'single'
+        self.processed_data = [{'prompt': f'Prompt {i}', 'completion': ''} for i in range(10)]
+        self.server = FakeOpenAIServer().start()
+        self.data_processor = DataProcessor(OpenAI(api_key='test', base_url=self.server.base_url), self.config)
+
+    def tearDown(self):
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def test_resume_generates_only_missing_prompts(self, mock_encoding_for_model):
+        # Simulate a run interrupted after four prompts
+        with GenerationJournal(self.config['example_generation']['journal']).open() as journal:
+            for data in self.processed_data[:4]:
+                journal.append(prompt_id(data), fake_generate_example(data))
+
+        examples = self.data_processor.generate_refined_examples(self.processed_data, resume=True)
+
+        self.assertEqual(self.server.count_requests('/v1/chat/completions'), 6)
+        self.assertEqual(len(examples), 10)
+        self.assertEqual(len(GenerationJournal(self.config['example_generation']['journal']).load()), 10)
+
+    def test_fresh_run_starts_a_new_journal(self, mock_encoding_for_model):
+        with GenerationJournal(self.config['example_generation']['journal']).open() as journal:
+            journal.append('stale', {'messages': []})
+
+        self.data_processor.generate_refined_examples(self.processed_data)
+
+        self.assertEqual(self.server.count_requests('/v1/chat/completions'), 10)
+        self.assertNotIn('stale', GenerationJournal(self.config['example_generation']['journal']).load())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import patch
+from helpers import BYTE_ENCODING
+from fine_tuning.chunking import TokenChunker, StructuredChunker
+
+@patch('tiktoken.get_encoding', return_value=BYTE_ENCODING)
+class TestTokenChunker(unittest.TestCase):
+    def test_split_respects_max_tokens(self, mock_get_encoding):
+        chunker = TokenChunker(max_tokens=4)
+
+        splits = chunker.split('abcdefghij')
+
+        self.assertEqual(splits, ['abcd', 'efgh', 'ij'])
+
+    def test_split_with_overlap(self, mock_get_encoding):
+        chunker = TokenChunker(max_tokens=4, overlap=2)
+
+        splits = chunker.split('abcdefghij')
+
+        # No trailing chunk that only repeats the previous overlap
+        self.assertEqual(splits, ['abcd', 'cdef', 'efgh', 'ghij'])
+
+    def test_split_empty_text(self, mock_get_encoding):
+        self.assertEqual(TokenChunker(max_tokens=4).split(''), [])
+
+    def test_split_batch_matches_split(self, mock_get_encoding):
+        chunker = TokenChunker(max_tokens=3)
+        texts = ['fn main() {}', '', '# NEAR docs', 'x']
+
+        self.assertEqual(chunker.split_batch(texts), [chunker.split(text) for text in texts])
+
+    def test_split_stream_matches_split_of_joined_text(self, mock_get_encoding):
+        chunker = TokenChunker(max_tokens=4, overlap=1)
+        pages = ['abcdef', 'ghi', '', 'jklmnop']
+
+        self.assertEqual(list(chunker.split_stream(pages)), chunker.split('\n'.join(pages)))
+        self.assertEqual(list(chunker.split_stream(['abc'])), chunker.split('abc'))
+
+    def test_special_token_text_is_treated_as_plain_text(self, mock_get_encoding):
+        chunker = TokenChunker(max_tokens=100)
+
+        self.assertEqual(chunker.split('<|endoftext|>'), ['<|endoftext|>'])
+
+    def test_invalid_overlap(self, mock_get_encoding):
+        with self.assertRaises(ValueError):
+            TokenChunker(max_tokens=4, overlap=4)
+
+RUST_SOURCE = """use near_sdk::near_bindgen;
+
+/// A simple counter
+#[near_bindgen]
+pub struct Counter {
+    value: u64,
+}
+
+impl Counter {
+    pub fn increment(&mut self) {
+        self.value += 1;
+    }
+
+    pub fn get(&self) -> u64 {
+        self.value
+    }
+}
+"""
+
+MARKDOWN_SOURCE = """# Accounts
+
+NEAR uses human readable account IDs.
+
+## Access keys
+
+Full access and function call keys.
+
+```bash
+# not a heading
+near login
+```
+
+## Implicit accounts
+
+Derived from an ed25519 public key.
+"""
+
+@patch('tiktoken.get_encoding', return_value=BYTE_ENCODING)
+class TestStructuredChunker(unittest.TestCase):
+    def test_rust_splits_before_items_with_attributes_attached(self, mock_get_encoding):
+        chunks = StructuredChunker(max_tokens=150).split(RUST_SOURCE, 'src/lib.rs')
+
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(chunks[0].endswith('}\n\n'))
+        self.assertTrue(chunks[1].startswith('impl Counter {'))
+        self.assertEqual(''.join(chunks), RUST_SOURCE)
+
+    def test_oversized_units_split_at_the_next_level(self, mock_get_encoding):
+        chunks = StructuredChunker(max_tokens=60).split(RUST_SOURCE, 'src/lib.rs')
+
+        self.assertIn('    pub fn get(&self) -> u64 {\n        self.value\n    }\n}\n', chunks)
+        self.assertTrue(all(len(chunk.encode('utf-8')) <= 60 for chunk in chunks))
+
+    def test_small_units_are_merged(self, mock_get_encoding):
+        chunks = StructuredChunker(max_tokens=1000).split(RUST_SOURCE, 'src/lib.rs')
+
+        self.assertEqual(chunks, [RUST_SOURCE])
+
+    def test_markdown_splits_on_headings_outside_code_fences(self, mock_get_encoding):
+        chunks = StructuredChunker(max_tokens=100).split(MARKDOWN_SOURCE, 'docs/accounts.md')
+
+        self.assertEqual([chunk.splitlines()[0] for chunk in chunks], ['# Accounts', '## Access keys', '## Implicit accounts'])
+
+    def test_python_and_typescript_boundaries(self, mock_get_encoding):
+        python_source = "import os\n\n@cache\ndef load():\n    return 1\n\n\nclass Store:\n    pass\n"
+        typescript_source = "import { connect } from 'near-api-js';\n\nexport async function view() {\n  return 1;\n}\n\nexport class Wallet {\n}\n"
+
+        self.assertTrue(StructuredChunker(max_tokens=35).split(python_source, 'store.py')[1].startswith('@cache'))
+        self.assertTrue(StructuredChunker(max_tokens=50).split(typescript_source, 'wallet.ts')[1].startswith('export async function'))
+
+    def test_units_without_boundaries_fall_back_to_windows(self, mock_get_encoding):
+        chunks = StructuredChunker(max_tokens=4).split('abcdefghij', 'notes.txt')
+
+        self.assertEqual(chunks, ['abcd', 'efgh', 'ij'])
+
+    def test_split_stream_keeps_paragraphs_that_cross_pages_together(self, mock_get_encoding):
+        chunker = StructuredChunker(max_tokens=30)
+        pages = ["Sharding splits state.\n\nChunk producers", "validate chunks.\n\nValidators rotate."]
+
+        chunks = list(chunker.split_stream(pages))
+
+        self.assertIn("Chunk producers\nvalidate chunks.\n", ''.join(chunks))
+        self.assertTrue(all(len(chunk) <= 30 for chunk in chunks))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from fine_tuning.completion_cache import CompletionCache
+from fine_tuning.data_processors import DataProcessor
+from fine_tuning.config import load_config
+
+class TestCompletionCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.temp_dir.name, 'completions.sqlite')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_covers_the_whole_request(self):
+        request = {'model': 'gpt-4o-mini', 'messages': [{'role': 'user', 'content': 'Hi'}], 'temperature': 0.7}
+
+        self.assertEqual(CompletionCache.make_key(request), CompletionCache.make_key(dict(reversed(request.items()))))
+        self.assertNotEqual(CompletionCache.make_key(request), CompletionCache.make_key({**request, 'temperature': 0.2}))
+
+    def test_get_and_put(self):
+        cache = CompletionCache(self.cache_path)
+
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', 'NEAR uses Nightshade sharding.')
+
+        self.assertEqual(cache.get('key'), 'NEAR uses Nightshade sharding.')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_entries_persist_across_instances(self):
+        CompletionCache(self.cache_path).put('key', 'response')
+
+        self.assertEqual(CompletionCache(self.cache_path).get('key'), 'response')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = CompletionCache(self.cache_path, max_size_mb=250 / (1024 * 1024))
+        cache.put('first', 'a' * 100)
+        cache.put('second', 'b' * 100)
+        cache.get('first')
+        cache.put('third', 'c' * 100)
+
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(cache.get('first'), 'a' * 100)
+        self.assertLessEqual(cache.stats()['size_bytes'], 250)
+
+class TestCachedGeneration(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['completions'] = {'path': os.path.join(self.temp_dir.name, 'completions.sqlite')}
+        self.client = MagicMock()
+        self.client.chat.completions.create.return_value.choices = [MagicMock()]
+        self.client.chat.completions.create.return_value.choices[0].message.content = 'Explanation'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_rerun_is_served_from_cache(self):
+        DataProcessor(self.client, self.config).generate_example({'prompt': 'Explain NEAR'})
+        example = DataProcessor(self.client, self.config).generate_example({'prompt': 'Explain NEAR'})
+
+        self.assertEqual(example['messages'][1]['content'], 'Explanation')
+        self.client.chat.completions.create.assert_called_once()
+
+    def test_changed_parameters_miss_the_cache(self):
+        DataProcessor(self.client, self.config).generate_example({'prompt': 'Explain NEAR'})
+        self.config['openai']['temperature'] = 0.1
+        DataProcessor(self.client, self.config).generate_example({'prompt': 'Explain NEAR'})
+
+        self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+from fine_tuning.data_fetchers import DataFetcher
+from fine_tuning.config import load_config
+
+class TestConcurrentFetch(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['dir'] = self.temp_dir.name
+        self.config['github']['max_workers'] = 8
+        self.config['articles']['per_host_limit'] = 1
+        self.github_client = MagicMock()
+        self.github_client.rate_limiting = (5000, 5000)
+        self.data_fetcher = DataFetcher(self.github_client, self.config)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_fetch_all_respects_per_host_limit(self):
+        active = {'count': 0, 'peak': 0}
+        lock = threading.Lock()
+
+        def fake_fetch_article(url):
+            with lock:
+                active['count'] += 1
+                active['peak'] = max(active['peak'], active['count'])
+            time.sleep(0.01)
+            with lock:
+                active['count'] -= 1
+            return f"text of {url}"
+
+        urls = [f"https://near.org/blog/post-{i}/" for i in range(6)]
+        with patch.object(self.data_fetcher, 'fetch_article_data', side_effect=fake_fetch_article), \
+             patch.object(self.data_fetcher, 'fetch_repo_data', side_effect=lambda name: [('README.md', name)]):
+            all_repo_data, all_article_data = self.data_fetcher.fetch_all(['near/docs', 'near/neps'], urls)
+
+        # Results keep configuration order and articles on one host never overlap
+        self.assertEqual(list(all_repo_data), ['near/docs', 'near/neps'])
+        self.assertEqual(list(all_article_data), urls)
+        self.assertEqual(active['peak'], 1)
+
+    def test_failed_sources_are_skipped(self):
+        with patch.object(self.data_fetcher, 'fetch_repo_data', side_effect=ValueError('boom')):
+            all_repo_data, all_article_data = self.data_fetcher.fetch_all(['near/docs'], [])
+
+        self.assertEqual(all_repo_data, {})
+
+    @patch('fine_tuning.data_fetchers.time.sleep', return_value=None)
+    def test_waits_for_quota_reset(self, mock_sleep):
+        self.github_client.rate_limiting = (10, 5000)
+        self.github_client.rate_limiting_resettime = time.time() + 30
+
+        self.data_fetcher._wait_for_github_quota()
+
+        mock_sleep.assert_called_once()
+        self.assertGreater(mock_sleep.call_args[0][0], 25)
+
+if __name__ == '__main__':
+    unittest.main()
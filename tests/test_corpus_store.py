@@ -0,0 +1,72 @@
+import os
+import pickle
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from fine_tuning.corpus_store import CorpusStore, LazyRepoData
+from fine_tuning.data_fetchers import DataFetcher
+from fine_tuning.config import load_config
+
+class TestCorpusStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = CorpusStore(os.path.join(self.temp_dir.name, 'store'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_save_and_load_repo(self):
+        repo_data = [('README.md', '# NEAR'), ('src/lib.rs', 'pub fn hello() {}')]
+        self.store.save('near/docs', 'repo', repo_data)
+
+        loaded = self.store.load('near/docs')
+
+        self.assertIsInstance(loaded, LazyRepoData)
+        self.assertEqual(list(loaded), repo_data)
+
+    def test_save_and_load_article(self):
+        self.store.save('https://near.org/blog/', 'article', 'Nightshade ✓')
+
+        self.assertEqual(self.store.load('https://near.org/blog/'), 'Nightshade ✓')
+
+    def test_identical_files_are_stored_once(self):
+        self.store.save('near/docs', 'repo', [('LICENSE', 'MIT License')])
+        self.store.save('near/neps', 'repo', [('LICENSE', 'MIT License')])
+
+        blob_files = [name for _, _, names in os.walk(self.store.blob_dir) for name in names]
+        self.assertEqual(len(blob_files), 1)
+
+    def test_unknown_identifier(self):
+        self.assertIsNone(self.store.get_timestamp('near/unknown'))
+        self.assertIsNone(self.store.load('near/unknown'))
+
+class TestLegacyCacheMigration(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['dir'] = self.temp_dir.name
+        self.data_fetcher = DataFetcher(MagicMock(), self.config)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_pickle(self, name, timestamp, data):
+        with open(os.path.join(self.temp_dir.name, name), 'wb') as f:
+            pickle.dump({'timestamp': timestamp, 'data': data}, f)
+
+    def test_fresh_pickle_is_migrated(self):
+        self.write_pickle('repo_near_docs.pkl', datetime.now(), [('README.md', '# NEAR')])
+
+        cached_data = self.data_fetcher.get_cached_data('near/docs', is_repo=True)
+
+        self.assertEqual(list(cached_data), [('README.md', '# NEAR')])
+        self.assertIsNotNone(self.data_fetcher.store.get_timestamp('near/docs'))
+
+    def test_expired_pickle_is_not_served(self):
+        self.write_pickle('repo_near_docs.pkl', datetime.now() - timedelta(days=30), [('README.md', '# NEAR')])
+
+        self.assertIsNone(self.data_fetcher.get_cached_data('near/docs', is_repo=True))
+
+if __name__ == '__main__':
+    unittest.main()
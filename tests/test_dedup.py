@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+from helpers import BYTE_ENCODING
+from fine_tuning.data_processors import DataProcessor
+from fine_tuning.dedup import Deduplicator
+from fine_tuning.config import load_config
+
+CONTRACT = """
+use near_sdk::{env, near_bindgen};
+
+#[near_bindgen]
+pub struct Counter { value: u64 }
+
+impl Counter {
+    pub fn increment(&mut self) { self.value += 1; env::log_str("Incremented the counter value"); }
+    pub fn decrement(&mut self) { self.value -= 1; env::log_str("Decremented the counter value"); }
+    pub fn get_value(&self) -> u64 { self.value }
+    pub fn reset(&mut self) { self.value = 0; env::log_str("Reset the counter value to zero"); }
+}
+"""
+
+class TestDeduplicator(unittest.TestCase):
+    def test_exact_duplicates_ignore_whitespace(self):
+        deduplicator = Deduplicator()
+
+        self.assertIsNone(deduplicator.check(CONTRACT))
+        self.assertEqual(deduplicator.check(CONTRACT.replace('\n', '\n\n')), 'exact')
+
+    def test_near_duplicates_are_detected(self):
+        deduplicator = Deduplicator()
+        edited = CONTRACT.replace('Reset the counter value to zero', 'Reset the counter value back to zero')
+
+        self.assertIsNone(deduplicator.check(CONTRACT))
+        self.assertEqual(deduplicator.check(edited), 'near')
+        self.assertEqual(deduplicator.stats, {'kept': 1, 'exact': 0, 'near': 1})
+
+    def test_distinct_texts_are_kept(self):
+        deduplicator = Deduplicator()
+        article = "Nightshade splits the NEAR blockchain state into shards that are validated in parallel by chunk producers."
+
+        self.assertIsNone(deduplicator.check(CONTRACT))
+        self.assertIsNone(deduplicator.check(article))
+
+    def test_similarity_estimate_tracks_jaccard(self):
+        deduplicator = Deduplicator(num_perm=256, bands=64, shingle_size=1)
+        words = [f'word{i}' for i in range(400)]
+        # Jaccard similarity of the two word sets is 200 / 600
+        first, second = ' '.join(words[:400]), ' '.join(words[200:] + [f'other{i}' for i in range(200)])
+
+        estimate = deduplicator.similarity(deduplicator.minhash(first), deduplicator.minhash(second))
+        self.assertAlmostEqual(estimate, 1 / 3, delta=0.1)
+
+    def test_num_perm_must_divide_into_bands(self):
+        with self.assertRaises(ValueError):
+            Deduplicator(num_perm=100, bands=32)
+
+@patch('tiktoken.encoding_for_model', return_value=BYTE_ENCODING)
+class TestDeduplicatePrompts(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.data_processor = DataProcessor(None, self.config)
+
+    def test_boilerplate_copied_across_repos_is_removed(self, mock_encoding_for_model):
+        prompts = [
+            {'prompt': f"Explain the following code snippet from NEAR repository file `{path}`:\n```{CONTRACT}```", 'completion': ''}
+            for path in ('near-sdk-rs/examples/counter.rs', 'core-contracts/counter/src/lib.rs')
+        ]
+        prompts.append({'prompt': "Summarize the following section of a NEAR Protocol article:\nNightshade sharding.", 'completion': ''})
+
+        with self.assertLogs(level='INFO') as logs:
+            deduplicated = self.data_processor.deduplicate(prompts)
+
+        self.assertEqual(deduplicated, [prompts[0], prompts[2]])
+        self.assertIn('removed 1 exact and 0 near-duplicate prompts', '\n'.join(logs.output))
+
+    def test_disabled_dedup_keeps_everything(self, mock_encoding_for_model):
+        self.config['data_processing']['dedup'] = {'enabled': False}
+        prompts = [{'prompt': 'Same', 'completion': ''}] * 3
+
+        self.assertEqual(self.data_processor.deduplicate(prompts), prompts)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from unittest.mock import patch
+from helpers import make_pdf
+from fine_tuning.extraction import TextExtractor, PAGE_BREAK, extract_html, iter_pdf_pages
+from fine_tuning.config import load_config
+
+class TestExtraction(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.pages = [f"Nightshade page {index}" for index in range(12)]
+        self.pdf = make_pdf(self.pages)
+
+    def test_html_prefers_main_content(self):
+        html = b"<html><body><nav>Menu</nav><main><h1>Nightshade</h1><p>Sharding   design</p></main></body></html>"
+        self.assertEqual(extract_html(html), "Nightshade Sharding design")
+        self.assertEqual(extract_html(html, parser='html.parser'), "Nightshade Sharding design")
+
+    def test_pdf_pages_come_back_in_order_from_the_pool(self):
+        pooled = list(iter_pdf_pages(self.pdf, workers=3, pages_per_task=5, pool_min_pages=1))
+        self.assertEqual(pooled, self.pages)
+        self.assertEqual(list(iter_pdf_pages(self.pdf)), self.pages)
+
+    def test_extract_joins_pdf_pages_with_page_breaks(self):
+        self.config['articles']['extraction'] = {'workers': 2, 'pages_per_task': 4, 'pool_min_pages': 8}
+        text = TextExtractor(self.config).extract(self.pdf, 'application/pdf')
+        self.assertEqual(text.split(PAGE_BREAK), self.pages)
+
+    def test_unreadable_pdf_yields_no_text(self):
+        with patch('logging.error'):
+            self.assertEqual(TextExtractor(self.config).extract(b'not a pdf', 'application/pdf'), "")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import io
+import os
+import base64
+import tarfile
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from fine_tuning.data_fetchers import DataFetcher, git_blob_sha
+from fine_tuning.file_filter import FileFilter
+from fine_tuning.config import load_config
+
+class TestFileFilter(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.config['data_processing']['extensions'] = ['.md', '.rs', '.js']
+        self.config['data_processing']['file_filter'] = {
+            'exclude': ['*.min.js', 'CHANGELOG.md'],
+            'max_file_size_kb': 1,
+            'skip_vendored': True,
+        }
+        self.file_filter = FileFilter(self.config)
+
+    def test_path_filters(self):
+        self.assertTrue(self.file_filter.check_path('src/lib.rs', 100))
+        self.assertFalse(self.file_filter.check_path('Cargo.lock', 100))
+        self.assertFalse(self.file_filter.check_path('docs/CHANGELOG.md', 100))
+        self.assertFalse(self.file_filter.check_path('static/app.min.js', 100))
+        self.assertFalse(self.file_filter.check_path('node_modules/near-api-js/index.js', 100))
+        self.assertFalse(self.file_filter.check_path('docs/big.md', 4096))
+
+        self.assertEqual(self.file_filter.stats, {
+            'kept': 0, 'skipped_bytes': 4496, 'extension': 1, 'exclude': 2, 'vendored': 1, 'size': 1,
+        })
+
+    def test_include_globs(self):
+        self.config['data_processing']['file_filter'] = {'include': ['docs/*']}
+        file_filter = FileFilter(self.config)
+
+        self.assertTrue(file_filter.check_path('docs/tutorials/intro.md'))
+        self.assertFalse(file_filter.check_path('README.md'))
+
+    def test_vendored_directories_are_pruned(self):
+        self.assertFalse(self.file_filter.check_dir('contract/target'))
+        self.assertTrue(self.file_filter.check_dir('contract/src'))
+
+    def test_content_filters(self):
+        self.assertEqual(self.file_filter.decode('README.md', b'# NEAR'), '# NEAR')
+        self.assertIsNone(self.file_filter.decode('logo.md', b'\x89PNG\r\n\x1a\n\x00\x00'))
+        self.assertIsNone(self.file_filter.decode('bindings.rs', b'// @generated by near-abi\nfn x() {}'))
+        self.assertIsNone(self.file_filter.decode('latin1.md', b'caf\xe9'))
+
+        self.assertEqual(self.file_filter.stats['binary'], 1)
+        self.assertEqual(self.file_filter.stats['generated'], 1)
+        self.assertEqual(self.file_filter.stats['encoding'], 1)
+
+class TestFilteredFetch(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['dir'] = os.path.join(self.temp_dir.name, 'cache')
+        self.config['github']['archive_dir'] = self.temp_dir.name
+        self.github_client = MagicMock()
+        self.data_fetcher = DataFetcher(self.github_client, self.config)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_archive_members_are_filtered_before_reading(self):
+        files = {
+            'near-sdk-abc123/src/lib.rs': b'pub fn hello() {}',
+            'near-sdk-abc123/package-lock.json': b'{}',
+            'near-sdk-abc123/node_modules/bn.js/index.js': b'module.exports = BN;',
+        }
+        with tarfile.open(os.path.join(self.temp_dir.name, 'near_sdk.tar.gz'), 'w:gz') as archive:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+
+        repo_data = self.data_fetcher.fetch_repo_data('near/sdk')
+
+        self.assertEqual(list(repo_data), [('src/lib.rs', 'pub fn hello() {}')])
+        self.assertEqual(self.data_fetcher.file_filter.stats['extension'], 1)
+        self.assertEqual(self.data_fetcher.file_filter.stats['vendored'], 1)
+
+    def test_filter_change_drops_newly_excluded_files_from_the_cache(self):
+        files = {'near-sdk-abc123/src/lib.rs': b'pub fn hello() {}', 'near-sdk-abc123/CONTRIBUTING.md': b'# Contributing'}
+        with tarfile.open(os.path.join(self.temp_dir.name, 'near_sdk.tar.gz'), 'w:gz') as archive:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        self.assertEqual(len(self.data_fetcher.fetch_repo_data('near/sdk')), 2)
+
+        self.config['data_processing']['file_filter']['exclude'] = ['CONTRIBUTING.md']
+        repo_data = DataFetcher(self.github_client, self.config).fetch_repo_data('near/sdk')
+
+        self.assertEqual(list(repo_data), [('src/lib.rs', 'pub fn hello() {}')])
+
+    def test_contents_mode_skips_filtered_downloads(self):
+        self.config['github']['fetch_mode'] = 'contents'
+        self.github_client.requester.requestJson.return_value = (404, {}, '')
+        repo = self.github_client.get_repo.return_value
+        readme = MagicMock(type='file', path='README.md', size=6, sha='abc123', decoded_content=b'# NEAR')
+        logo = MagicMock(type='file', path='logo.png', size=2048, sha='def456')
+        vendor = MagicMock(type='dir', path='vendor')
+        repo.get_contents.side_effect = lambda path: [readme, logo, vendor] if path == "" else readme
+
+        repo_data = self.data_fetcher.fetch_repo_data('near/docs')
+
+        self.assertEqual(list(repo_data), [('README.md', '# NEAR')])
+        requested = [call.args[0] for call in repo.get_contents.call_args_list]
+        self.assertEqual(requested, ["", 'README.md'])
+
+    def make_tree(self, repo, files):
+        self.github_client.requester.requestJson.return_value = (200, {'etag': '"etag-1"'}, 'head-sha\n')
+        repo.get_git_tree.return_value.raw_data = {'truncated': False}
+        repo.get_git_tree.return_value.tree = [
+            MagicMock(path=path, type='blob', mode='100644', size=len(data), sha=git_blob_sha(data))
+            for path, data in files.items()
+        ]
+        blobs = {git_blob_sha(data): MagicMock(content=base64.b64encode(data).decode()) for data in files.values()}
+        repo.get_git_blob.side_effect = lambda sha: blobs[sha]
+
+    def test_archive_mode_fetches_kept_blobs_when_most_bytes_are_rejected(self):
+        repo = self.github_client.get_repo.return_value
+        self.make_tree(repo, {
+            'src/lib.rs': b'pub fn hello() {}',
+            'assets/logo.png': b'\x89PNG' * 1000,
+            'node_modules/bn.js/index.js': b'module.exports = BN;' * 100,
+        })
+
+        repo_data = self.data_fetcher.fetch_repo_data('near/sdk')
+
+        self.assertEqual(list(repo_data), [('src/lib.rs', 'pub fn hello() {}')])
+        repo.get_git_blob.assert_called_once_with(git_blob_sha(b'pub fn hello() {}'))
+        repo.get_archive_link.assert_not_called()
+        self.assertEqual(self.data_fetcher.file_filter.stats['extension'], 1)
+        self.assertEqual(self.data_fetcher.file_filter.stats['vendored'], 1)
+        metadata = self.data_fetcher.store.get_metadata('near/sdk')
+        self.assertEqual(metadata['blob_shas'], {'src/lib.rs': git_blob_sha(b'pub fn hello() {}')})
+
+    def test_archive_mode_downloads_tarball_when_most_bytes_are_kept(self):
+        repo = self.github_client.get_repo.return_value
+        self.make_tree(repo, {'src/lib.rs': b'pub fn hello() {}' * 100, 'logo.png': b'\x89PNG'})
+        repo.get_archive_link.side_effect = RuntimeError("tarball requested")
+
+        with self.assertRaises(RuntimeError):
+            self.data_fetcher.fetch_repo_data('near/sdk')
+
+        repo.get_archive_link.assert_called_once()
+        repo.get_git_blob.assert_not_called()
+        # Rejections are only counted for the files the tarball path actually skips
+        self.assertNotIn('extension', self.data_fetcher.file_filter.stats)
+
+if __name__ == '__main__':
+    unittest.main()
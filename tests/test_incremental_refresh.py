@@ -0,0 +1,81 @@
+import base64
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from fine_tuning.data_fetchers import DataFetcher, git_blob_sha
+from fine_tuning.config import load_config
+
+class TestIncrementalRefresh(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['dir'] = self.temp_dir.name
+        self.github_client = MagicMock()
+        self.data_fetcher = DataFetcher(self.github_client, self.config)
+
+        # Seed an expired cache entry for a two-file repository
+        self.files = {'README.md': '# NEAR', 'src/lib.rs': 'pub fn hello() {}'}
+        self.data_fetcher.store.save(
+            'near/docs', 'repo', list(self.files.items()),
+            timestamp=datetime.now() - timedelta(days=30),
+            metadata={
+                'head_sha': 'old-sha',
+                'etag': '"etag-1"',
+                'blob_shas': {path: git_blob_sha(content.encode()) for path, content in self.files.items()},
+                'file_filter': self.data_fetcher.file_filter.fingerprint(),
+            },
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_not_modified_reuses_cache(self):
+        self.github_client.requester.requestJson.return_value = (304, {}, '')
+
+        repo_data = self.data_fetcher.fetch_repo_data('near/docs')
+
+        self.assertEqual(sorted(repo_data), sorted(self.files.items()))
+        # The conditional request carried the stored ETag
+        headers = self.github_client.requester.requestJson.call_args.kwargs['headers']
+        self.assertEqual(headers['If-None-Match'], '"etag-1"')
+        self.github_client.get_repo.assert_not_called()
+        # The entry is fresh again, so the next fetch is served from the cache
+        self.assertIsNotNone(self.data_fetcher.get_cached_data('near/docs', is_repo=True))
+
+    def test_only_changed_blobs_are_downloaded(self):
+        self.github_client.requester.requestJson.return_value = (200, {'etag': '"etag-2"'}, 'new-sha\n')
+        new_lib = b'pub fn hello_near() {}'
+        repo = self.github_client.get_repo.return_value
+        repo.get_git_tree.return_value.raw_data = {'truncated': False}
+        repo.get_git_tree.return_value.tree = [
+            MagicMock(path='README.md', type='blob', mode='100644', size=6, sha=git_blob_sha(b'# NEAR')),
+            MagicMock(path='src/lib.rs', type='blob', mode='100644', size=len(new_lib), sha=git_blob_sha(new_lib)),
+        ]
+        repo.get_git_blob.return_value.content = base64.b64encode(new_lib).decode()
+
+        repo_data = self.data_fetcher.fetch_repo_data('near/docs')
+
+        self.assertEqual(dict(repo_data), {'README.md': '# NEAR', 'src/lib.rs': 'pub fn hello_near() {}'})
+        repo.get_git_blob.assert_called_once_with(git_blob_sha(new_lib))
+        metadata = self.data_fetcher.store.get_metadata('near/docs')
+        self.assertEqual(metadata['head_sha'], 'new-sha')
+        self.assertEqual(metadata['etag'], '"etag-2"')
+
+    def test_filter_change_refreshes_an_unchanged_head(self):
+        self.github_client.requester.requestJson.return_value = (304, {}, '')
+        repo = self.github_client.get_repo.return_value
+        repo.get_git_tree.return_value.raw_data = {'truncated': False}
+        repo.get_git_tree.return_value.tree = [
+            MagicMock(path=path, type='blob', mode='100644', size=len(content), sha=git_blob_sha(content.encode()))
+            for path, content in self.files.items()
+        ]
+        self.config['data_processing']['file_filter']['exclude'] = ['src/*']
+
+        repo_data = DataFetcher(self.github_client, self.config).fetch_repo_data('near/docs')
+
+        self.assertEqual(list(repo_data), [('README.md', '# NEAR')])
+        repo.get_git_blob.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from openai import AsyncOpenAI, OpenAI
+from fake_openai import FakeOpenAIServer
+from fine_tuning.fine_tuning import FineTuner
+from fine_tuning.job_monitor import JobMonitor
+from fine_tuning.config import load_config
+
+class TestJobMonitor(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.metrics_file = os.path.join(self.temp_dir.name, 'metrics.jsonl')
+        self.config['fine_tuning']['monitoring'] = {'min_interval': 0, 'max_interval': 0.01, 'metrics_file': self.metrics_file}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def create_jobs(self, server, count):
+        client = OpenAI(api_key='test', base_url=server.base_url)
+        return [client.fine_tuning.jobs.create(training_file='file-abc', model='gpt-4o-mini-2024-07-18').id
+                for _ in range(count)]
+
+    def watch(self, server, job_ids, **monitoring):
+        self.config['fine_tuning']['monitoring'].update(monitoring)
+
+        async def run():
+            async with AsyncOpenAI(api_key='test', base_url=server.base_url, max_retries=0) as client:
+                return await JobMonitor(client, self.config).watch_all(job_ids)
+        return asyncio.run(run())
+
+    def test_job_is_followed_to_completion_with_metrics(self):
+        with FakeOpenAIServer(job_steps=3) as server:
+            job_ids = self.create_jobs(server, 1)
+            result, = self.watch(server, job_ids)
+
+        self.assertEqual(result['status'], 'succeeded')
+        self.assertTrue(result['fine_tuned_model'].startswith('ft:gpt-4o-mini-2024-07-18'))
+        self.assertEqual([record['step'] for record in result['metrics']], [1, 2, 3])
+        with open(self.metrics_file, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records, result['metrics'])
+
+    def test_only_new_events_are_fetched(self):
+        with FakeOpenAIServer(job_steps=10) as server:
+            job_ids = self.create_jobs(server, 1)
+            result, = self.watch(server, job_ids, page_size=2)
+
+        # Every step is seen exactly once even though each page holds two events
+        self.assertEqual([record['step'] for record in result['metrics']], list(range(1, 11)))
+
+    def test_many_jobs_share_one_loop(self):
+        with FakeOpenAIServer(job_steps=2) as server:
+            job_ids = self.create_jobs(server, 5)
+            results = self.watch(server, job_ids)
+
+        self.assertEqual([result['job_id'] for result in results], job_ids)
+        self.assertTrue(all(result['status'] == 'succeeded' for result in results))
+
+    def test_monitoring_times_out(self):
+        with FakeOpenAIServer(job_steps=10_000) as server:
+            job_ids = self.create_jobs(server, 1)
+            result, = self.watch(server, job_ids, timeout_hours=0.2 / 3600)
+
+        self.assertEqual(result['status'], 'timeout')
+
+    def test_persistent_errors_stop_monitoring(self):
+        with FakeOpenAIServer() as server:
+            result, = self.watch(server, ['ftjob-missing'], max_errors=3)
+
+        self.assertEqual(result['status'], 'error')
+
+    def test_fine_tuner_returns_model_id(self):
+        with FakeOpenAIServer(job_steps=2) as server:
+            job_ids = self.create_jobs(server, 1)
+            fine_tuner = FineTuner(self.config, OpenAI(api_key='test', base_url=server.base_url))
+            model_id = fine_tuner.monitor_fine_tune_job(job_ids[0])
+
+        self.assertTrue(model_id.startswith('ft:'))
+
+if __name__ == '__main__':
+    unittest.main()
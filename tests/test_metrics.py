@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from openai import AsyncOpenAI
+from fake_openai import FakeOpenAIServer
+from fine_tuning.metrics import Metrics, metrics
+from fine_tuning.scheduler import CompletionScheduler
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics(enabled=True)
+
+    def tearDown(self):
+        self.metrics.stop()
+
+    def test_disabled_metrics_record_nothing(self):
+        disabled = Metrics()
+        disabled.inc('openai_retries_total')
+        disabled.observe('stage_seconds', 1.0, stage='fetch')
+        with disabled.timer('stage_seconds', stage='process'):
+            pass
+        report = disabled.report()
+        self.assertEqual((report['counters'], report['histograms']), ([], []))
+
+    def test_report_summarizes_counters_histograms_and_hit_rates(self):
+        self.metrics.inc('cache_lookups_total', cache='completions', result='hit')
+        self.metrics.inc('cache_lookups_total', 3, cache='completions', result='miss')
+        self.metrics.inc('openai_tokens_total', 120, direction='in')
+        for seconds in (0.02, 0.02, 0.3, 4.0):
+            self.metrics.observe('openai_request_seconds', seconds, endpoint='chat.completions')
+
+        report = self.metrics.report()
+
+        self.assertEqual(report['cache_hit_rates'], {'completions': 0.25})
+        self.assertIn({'name': 'openai_tokens_total', 'labels': {'direction': 'in'}, 'value': 120}, report['counters'])
+        histogram = report['histograms'][0]
+        self.assertEqual((histogram['count'], histogram['max']), (4, 4.0))
+        self.assertAlmostEqual(histogram['p50'], 0.025)
+        # Estimates never exceed the largest observation
+        self.assertEqual(histogram['p99'], 4.0)
+        self.assertAlmostEqual(histogram['sum'], 4.34)
+
+    def test_long_durations_stay_finite(self):
+        for seconds in (10800, 200000):
+            self.metrics.observe('stage_seconds', seconds, stage='generate')
+
+        histogram = self.metrics.report()['histograms'][0]
+
+        # Both fall beyond the old 1800 s bound; the overflow bucket is closed by the largest observation
+        self.assertTrue(10800 <= histogram['p50'] <= 14400)
+        self.assertTrue(86400 < histogram['p99'] <= 200000)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'run_report.json')
+            self.metrics.write_report(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['histograms'][0]['max'], 200000)
+
+    def test_write_report(self):
+        self.metrics.inc('stage_runs_total', stage='process', result='run')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'run_report.json')
+            self.metrics.write_report(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['counters'][0]['value'], 1)
+
+    def test_prometheus_text_endpoint(self):
+        self.metrics.inc('openai_rate_limited_total', 2, endpoint='chat.completions')
+        self.metrics.observe('stage_seconds', 0.2, stage='fetch')
+        server = self.metrics.serve(0, host='127.0.0.1')
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            text = response.read().decode('utf-8')
+
+        self.assertIn('# TYPE openai_rate_limited_total counter', text)
+        self.assertIn('openai_rate_limited_total{endpoint="chat.completions"} 2', text)
+        self.assertIn('stage_seconds_bucket{stage="fetch",le="0.25"} 1', text)
+        self.assertIn('stage_seconds_bucket{stage="fetch",le="+Inf"} 1', text)
+        self.assertIn('stage_seconds_count{stage="fetch"} 1', text)
+
+class TestSchedulerMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.enabled = True
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.enabled = False
+        metrics.reset()
+
+    def test_scheduler_records_latency_tokens_and_rate_limits(self):
+        requests = [{'model': 'gpt-4o-mini-2024-07-18', 'messages': [{'role': 'user', 'content': f'Prompt {i}'}]}
+                    for i in range(5)]
+
+        async def run():
+            async with AsyncOpenAI(api_key='test', base_url=server.base_url, max_retries=0) as client:
+                scheduler = CompletionScheduler(client, tokens_per_minute=1_000_000, requests_per_minute=10_000,
+                                                estimate_tokens=lambda request: 10, base_delay=0.01)
+                return await scheduler.run(requests)
+
+        with FakeOpenAIServer(rate_limit_first=2) as server:
+            asyncio.run(run())
+
+        counters = {(item['name'], tuple(item['labels'].values())): item['value'] for item in metrics.report()['counters']}
+        self.assertEqual(counters[('openai_rate_limited_total', ('chat.completions',))], 2)
+        self.assertEqual(counters[('openai_retries_total', ('chat.completions',))], 2)
+        self.assertEqual(counters[('openai_tokens_total', ('out',))], 50)
+        self.assertEqual(metrics.report()['histograms'][0]['count'], 7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from openai import OpenAI
+from helpers import BYTE_ENCODING
+from fake_openai import FakeOpenAIServer
+from fine_tuning.data_processors import DataProcessor
+from fine_tuning.config import load_config
+
+@patch('tiktoken.encoding_for_model', return_value=BYTE_ENCODING)
+class TestPackedGeneration(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['completions'] = {'enabled': True, 'path': os.path.join(self.temp_dir.name, 'completions.sqlite')}
+        self.config['example_generation'].update({
+            'journal': os.path.join(self.temp_dir.name, 'journal.jsonl'),
+            'mode': 'packed',
+            'batch_size': 5,
+            'backend': 'scheduler',
+        })
+        self.processed_data = [{'prompt': f'Prompt {i}', 'completion': ''} for i in range(10)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def generate(self, server):
+        data_processor = DataProcessor(OpenAI(api_key='test', base_url=server.base_url), self.config)
+        return data_processor.generate_refined_examples(self.processed_data)
+
+    def assert_examples_match_prompts(self, examples):
+        self.assertEqual(len(examples), 10)
+        for example in examples:
+            prompt, response = (message['content'] for message in example['messages'])
+            self.assertEqual(response, f'Response to: {prompt}')
+
+    def test_prompts_share_requests(self, mock_encoding_for_model):
+        with FakeOpenAIServer() as server:
+            examples = self.generate(server)
+            requests = [json.loads(body) for _, path, body in server.requests if path == '/v1/chat/completions']
+
+        self.assert_examples_match_prompts(examples)
+        self.assertEqual(len(requests), 2)
+        self.assertEqual(requests[0]['response_format'], {'type': 'json_object'})
+        self.assertEqual(len(json.loads(requests[0]['messages'][1]['content'])['snippets']), 5)
+
+    def test_missing_responses_fall_back_to_single_requests(self, mock_encoding_for_model):
+        with FakeOpenAIServer(drop_packed_responses=1) as server:
+            examples = self.generate(server)
+            self.assertEqual(server.count_requests('/v1/chat/completions'), 4)
+
+        self.assert_examples_match_prompts(examples)
+
+    def test_packed_completions_are_reused_in_packed_mode(self, mock_encoding_for_model):
+        with FakeOpenAIServer() as server:
+            self.generate(server)
+            examples = self.generate(server)
+            self.assertEqual(server.count_requests('/v1/chat/completions'), 2)
+
+        self.assert_examples_match_prompts(examples)
+
+    def test_packed_completions_are_not_served_in_single_mode(self, mock_encoding_for_model):
+        with FakeOpenAIServer() as server:
+            self.generate(server)
+            self.config['example_generation']['mode'] = 'single'
+            examples = self.generate(server)
+            # Every prompt is sent on its own, as a packed answer is not an answer to the single-prompt request
+            self.assertEqual(server.count_requests('/v1/chat/completions'), 2 + 10)
+
+        self.assert_examples_match_prompts(examples)
+
+class TestParsePackedResponse(unittest.TestCase):
+    def setUp(self):
+        self.data_processor = DataProcessor(None, load_config('config.yaml'))
+
+    def test_json_responses_are_matched_by_id(self):
+        content = json.dumps({'responses': [
+            {'id': 2, 'completion': 'third'},
+            {'id': 0, 'completion': ' first '},
+            {'id': 7, 'completion': 'out of range'},
+            {'id': 1, 'completion': ''},
+        ]})
+        self.assertEqual(self.data_processor.parse_packed_response(content, 3), ['first', None, 'third'])
+
+    def test_delimited_pairs_are_matched_by_position(self):
+        content = "Prompt: a\nCompletion: first\n\nPrompt: b\nCompletion: second"
+        self.assertEqual(self.data_processor.parse_packed_response(content, 2), ['first', 'second'])
+        self.assertEqual(self.data_processor.parse_packed_response(content, 3), [None, None, None])
+
+    def test_completion_marker_inside_a_completion(self):
+        content = "Prompt: a\nCompletion: see the Completion: field\n\nPrompt: b\nCompletion: x"
+        self.assertEqual(self.data_processor.parse_packed_response(content, 2), ['see the Completion: field', 'x'])
+
+    def test_boolean_ids_are_rejected(self):
+        content = json.dumps({'responses': [{'id': True, 'completion': 'second'}]})
+        self.assertEqual(self.data_processor.parse_packed_response(content, 2), [None, None])
+
+    def test_unusable_replies_parse_to_nothing(self):
+        for content in (None, '', 'not json', '[1, 2]', '{"responses": "none"}'):
+            self.assertEqual(self.data_processor.parse_packed_response(content, 2), [None, None])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from unittest.mock import patch
+from helpers import BYTE_ENCODING
+from fine_tuning.data_processors import DataProcessor
+from fine_tuning.config import load_config
+
+@patch('tiktoken.get_encoding', return_value=BYTE_ENCODING)
+class TestParallelProcessing(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.config['data_processing']['max_tokens'] = 16
+        self.config['data_processing']['worker_batch_size'] = 2
+        self.all_repo_data = {
+            'near/docs': [(f'docs/page{i}.md', f'# Page {i}\n' + 'NEAR ' * (i * 5)) for i in range(7)],
+            'near/neps': [('README.md', 'NEAR Enhancement Proposals')],
+        }
+        self.all_article_data = {'https://near.org/blog/': 'Nightshade sharding ' * 10}
+
+    def test_parallel_matches_sequential(self, mock_get_encoding):
+        self.config['data_processing']['workers'] = 1
+        sequential = DataProcessor(None, self.config).process_all(self.all_repo_data, self.all_article_data)
+
+        self.config['data_processing']['workers'] = 2
+        parallel = DataProcessor(None, self.config).process_all(self.all_repo_data, self.all_article_data)
+
+        self.assertEqual(parallel, sequential)
+        self.assertTrue(sequential[0]['prompt'].endswith('# Page 0\n```'))
+        self.assertTrue(sequential[-1]['prompt'].startswith('Summarize the following section'))
+        self.assertEqual(sequential[0]['_source'], 'near/docs')
+        self.assertEqual(sequential[-1]['_source'], 'https://near.org/blog/')
+
+if __name__ == '__main__':
+    unittest.main()
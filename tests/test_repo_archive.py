@@ -0,0 +1,71 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from fine_tuning.data_fetchers import DataFetcher
+from fine_tuning.config import load_config
+
+class TestRepoArchive(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['dir'] = os.path.join(self.temp_dir.name, 'cache')
+        self.config['github']['archive_dir'] = self.temp_dir.name
+        self.github_client = MagicMock()
+        self.data_fetcher = DataFetcher(self.github_client, self.config)
+
+        # Build a local stand-in laid out like a GitHub tarball
+        files = {
+            'near-docs-abc123/README.md': b'# NEAR Docs',
+            'near-docs-abc123/src/lib.rs': b'pub fn hello() {}',
+            'near-docs-abc123/logo.png': b'\x89PNG\r\n\x1a\n\xff\xfe',
+        }
+        archive_path = os.path.join(self.temp_dir.name, 'near_docs.tar.gz')
+        with tarfile.open(archive_path, 'w:gz') as archive:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_fetch_repo_data_from_local_archive(self):
+        repo_data = self.data_fetcher.fetch_repo_data('near/docs')
+
+        # Paths are relative to the repository root and binary files are skipped
+        self.assertEqual(sorted(repo_data), [('README.md', '# NEAR Docs'), ('src/lib.rs', 'pub fn hello() {}')])
+        # No GitHub API calls are needed when a local archive is present
+        self.github_client.get_repo.assert_not_called()
+
+    def test_contents_fetch_mode(self):
+        self.config['github']['fetch_mode'] = 'contents'
+        repo = self.github_client.get_repo.return_value
+        readme = MagicMock(type='file', path='README.md', size=6, sha='abc123')
+        readme.decoded_content = b'# NEAR Docs'
+        repo.get_contents.side_effect = lambda path: [readme] if path == "" else readme
+
+        repo_data = self.data_fetcher.fetch_repo_data('near/docs')
+
+        self.assertEqual(list(repo_data), [('README.md', '# NEAR Docs')])
+
+    def test_contents_fetch_mode_pins_every_request_to_the_head_commit(self):
+        self.config['github']['fetch_mode'] = 'contents'
+        self.github_client.requester.requestJson.return_value = (200, {'etag': '"etag-1"'}, 'head-sha\n')
+        repo = self.github_client.get_repo.return_value
+        docs = MagicMock(type='dir', path='docs')
+        readme = MagicMock(type='file', path='docs/README.md', size=6, sha='abc123', decoded_content=b'# NEAR Docs')
+        listings = {"": [docs], 'docs': [readme]}
+        repo.get_contents.side_effect = lambda path, **kwargs: listings.get(path, readme)
+
+        # No local archive stands in for near/neps, so its head commit is resolved
+        repo_data = self.data_fetcher.fetch_repo_data('near/neps')
+
+        self.assertEqual(list(repo_data), [('docs/README.md', '# NEAR Docs')])
+        refs = [call.kwargs.get('ref') for call in repo.get_contents.call_args_list]
+        self.assertEqual(refs, ['head-sha'] * 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from openai import AsyncOpenAI, OpenAI
+from helpers import BYTE_ENCODING
+from fake_openai import FakeOpenAIServer
+from fine_tuning.data_processors import DataProcessor
+from fine_tuning.scheduler import CompletionScheduler, TokenBucket, parse_reset_duration
+from fine_tuning.config import load_config
+
+def make_request(prompt):
+    return {
+        'model': 'gpt-4o-mini-2024-07-18',
+        'messages': [{'role': 'user', 'content': prompt}],
+        'temperature': 0.7,
+        'max_tokens': 100,
+    }
+
+class TestRateLimitHelpers(unittest.TestCase):
+    def test_parse_reset_duration(self):
+        self.assertEqual(parse_reset_duration('6m0s'), 360)
+        self.assertAlmostEqual(parse_reset_duration('1.5s'), 1.5)
+        self.assertAlmostEqual(parse_reset_duration('120ms'), 0.12)
+        self.assertEqual(parse_reset_duration(None), 0.0)
+
+    def test_bucket_syncs_down_to_server_remaining(self):
+        bucket = TokenBucket(1000)
+        bucket.sync(remaining=100, reset_seconds=0)
+
+        self.assertLessEqual(bucket.available, 101)
+
+class TestCompletionScheduler(unittest.TestCase):
+    def run_scheduler(self, server, requests, on_result=None, **kwargs):
+        async def run():
+            async with AsyncOpenAI(api_key='test', base_url=server.base_url, max_retries=0) as client:
+                scheduler = CompletionScheduler(
+                    client, tokens_per_minute=1_000_000, requests_per_minute=10_000,
+                    estimate_tokens=lambda request: 200, base_delay=0.01, **kwargs
+                )
+                return await scheduler.run(requests, on_result=on_result), scheduler
+        return asyncio.run(run())
+
+    def test_results_are_returned_in_request_order(self):
+        with FakeOpenAIServer(latency=0.01) as server:
+            results, scheduler = self.run_scheduler(server, [make_request(f'Prompt {i}') for i in range(20)])
+
+        self.assertEqual(results, [f'Response to: Prompt {i}' for i in range(20)])
+        self.assertEqual(scheduler.stats['requests'], 20)
+
+    def test_rate_limited_requests_are_retried(self):
+        with FakeOpenAIServer(rate_limit_first=3) as server:
+            results, scheduler = self.run_scheduler(server, [make_request(f'Prompt {i}') for i in range(5)])
+
+        self.assertTrue(all(results))
+        self.assertEqual(scheduler.stats['rate_limited'], 3)
+        self.assertEqual(scheduler.stats['failed'], 0)
+
+    def test_callback_errors_do_not_abort_the_run(self):
+        handled = []
+        def on_result(index, content):
+            if index == 0:
+                raise ValueError("unparseable reply")
+            handled.append(index)
+
+        with FakeOpenAIServer() as server:
+            results, scheduler = self.run_scheduler(server, [make_request(f'Prompt {i}') for i in range(5)],
+                                                    on_result=on_result)
+
+        self.assertTrue(all(results))
+        self.assertEqual(sorted(handled), [1, 2, 3, 4])
+        self.assertEqual(scheduler.stats['callback_errors'], 1)
+
+    def test_requests_fail_after_max_retries(self):
+        with FakeOpenAIServer(rate_limit_first=100) as server:
+            results, scheduler = self.run_scheduler(server, [make_request('Prompt')], max_retries=2)
+
+        self.assertEqual(results, [None])
+        self.assertEqual(scheduler.stats['failed'], 1)
+
+    def test_concurrency_backs_off_on_rate_limits(self):
+        with FakeOpenAIServer(rate_limit_first=4) as server:
+            _, scheduler = self.run_scheduler(server, [make_request('Prompt')], max_concurrency=16)
+
+        # Four halvings from the initial eight, then one additive increase on success
+        self.assertEqual(scheduler.concurrency, 2)
+
+@patch('tiktoken.encoding_for_model', return_value=BYTE_ENCODING)
+class TestScheduledGeneration(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['cache']['completions'] = {'path': os.path.join(self.temp_dir.name, 'completions.sqlite')}
+        self.config['example_generation']['journal'] = os.path.join(self.temp_dir.name, 'journal.jsonl')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_generate_refined_examples_against_fake_server(self, mock_encoding_for_model):
+        processed_data = [{'prompt': f'Prompt {i}', 'completion': ''} for i in range(10)]
+        with FakeOpenAIServer(rate_limit_first=2) as server:
+            data_processor = DataProcessor(OpenAI(api_key='test', base_url=server.base_url), self.config)
+            examples = data_processor.generate_refined_examples(processed_data)
+
+        self.assertEqual(len(examples), 10)
+        for example in examples:
+            prompt, response = (message['content'] for message in example['messages'])
+            self.assertEqual(response, f'Response to: {prompt}')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import random
+import unittest
+from fine_tuning.selection import ExampleSelector
+
+def make_examples(sizes, source=None):
+    examples = [{'messages': [], 'id': i} for i in range(len(sizes))]
+    if source:
+        for example in examples:
+            example['_source'] = source
+    return examples
+
+class TestExampleSelector(unittest.TestCase):
+    def test_smaller_examples_after_an_overflow_are_used(self):
+        sizes = [40, 90, 10, 20, 30]
+        selector = ExampleSelector(max_tokens=100, target_examples=10)
+
+        selected = selector.select(make_examples(sizes), sizes)
+
+        # Greedy in input order would stop at the 90-token example with one example
+        self.assertEqual([example['id'] for example in selected], [0, 2, 3, 4])
+        self.assertEqual(selector.stats['total_tokens'], 100)
+
+    def test_leftover_budget_is_swapped_into_larger_examples(self):
+        sizes = [10, 10, 50, 60, 5]
+        selector = ExampleSelector(max_tokens=75, target_examples=2)
+
+        selected = selector.select(make_examples(sizes), sizes)
+
+        # The two smallest use 15 tokens; swapping the 5 for the 60 still fits the budget
+        self.assertEqual(sorted(sizes[example['id']] for example in selected), [10, 60])
+        self.assertEqual(selector.stats['swaps'], 1)
+
+    def test_results_keep_input_order(self):
+        sizes = [30, 10, 20]
+        selected = ExampleSelector(max_tokens=1000, target_examples=3).select(make_examples(sizes), sizes)
+
+        self.assertEqual([example['id'] for example in selected], [0, 1, 2])
+
+    def test_source_quotas(self):
+        examples = make_examples([10] * 8, source='near/docs') + make_examples([20] * 4, source='near/neps')
+        sizes = [10] * 8 + [20] * 4
+        selector = ExampleSelector(max_tokens=1000, target_examples=10, max_source_share=0.5,
+                                   source_quotas={'near/neps': 0.2})
+
+        selector.select(examples, sizes)
+
+        self.assertEqual(selector.stats['per_source'], {'near/docs': 5, 'near/neps': 2})
+
+    def test_selection_fills_target_from_tens_of_thousands(self):
+        # Timing at this scale is measured by benchmarks/bench_selection.py
+        random.seed(0)
+        sizes = [random.randint(100, 4000) for _ in range(50_000)]
+        examples = make_examples(sizes)
+        selector = ExampleSelector(max_tokens=10_000_000, target_examples=5000)
+
+        selected = selector.select(examples, sizes)
+
+        self.assertEqual(len(selected), 5000)
+        self.assertEqual(len({example['id'] for example in selected}), 5000)
+        self.assertEqual(selector.stats['total_tokens'], sum(sizes[example['id']] for example in selected))
+        self.assertLessEqual(selector.stats['total_tokens'], 10_000_000)
+
+if __name__ == '__main__':
+    unittest.main()
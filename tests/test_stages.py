@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from openai import OpenAI
+from fake_openai import FakeOpenAIServer
+from fine_tuning.fine_tuning import FineTuner
+from fine_tuning.main import build_fine_tuning_data, upload_training_data
+from fine_tuning.stages import StageRunner, config_value
+from fine_tuning.config import load_config
+
+class TestStageRunner(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['stages'] = {'enabled': True, 'dir': os.path.join(self.temp_dir.name, 'stages')}
+        self.calls = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def stage(self, value):
+        def func():
+            self.calls.append(value)
+            return value
+        return func
+
+    def test_config_value(self):
+        self.assertEqual(config_value(self.config, 'fine_tuning.n_epochs'), 4)
+        self.assertIsNone(config_value(self.config, 'fine_tuning.missing.key'))
+
+    def test_unchanged_inputs_are_skipped_across_runs(self):
+        output, first_hash = StageRunner(self.config).run('process', self.stage('a'), ['data_processing.max_tokens'])
+        runner = StageRunner(self.config)
+        cached, second_hash = runner.run('process', self.stage('b'), ['data_processing.max_tokens'])
+        self.assertEqual((output, cached), ('a', 'a'))
+        self.assertEqual(first_hash, second_hash)
+        self.assertEqual(self.calls, ['a'])
+        self.assertEqual(runner.stats['skipped'], ['process'])
+
+    def test_only_the_stage_config_invalidates(self):
+        StageRunner(self.config).run('process', self.stage('a'), ['data_processing.max_tokens'])
+        self.config['fine_tuning']['n_epochs'] = 2
+        StageRunner(self.config).run('process', self.stage('b'), ['data_processing.max_tokens'])
+        self.config['data_processing']['max_tokens'] = 500
+        output, _ = StageRunner(self.config).run('process', self.stage('c'), ['data_processing.max_tokens'])
+        self.assertEqual(output, 'c')
+        self.assertEqual(self.calls, ['a', 'c'])
+
+    def test_upstream_change_invalidates(self):
+        StageRunner(self.config).run('generate', self.stage('a'), upstream=['x'])
+        StageRunner(self.config).run('generate', self.stage('b'), upstream=['y'])
+        self.assertEqual(self.calls, ['a', 'b'])
+
+    def test_modified_output_file_invalidates(self):
+        path = os.path.join(self.temp_dir.name, 'data.jsonl')
+        def write():
+            with open(path, 'w') as f:
+                f.write('{}\n')
+            self.calls.append('write')
+            return 1
+        StageRunner(self.config).run('select', write, files=[path])
+        StageRunner(self.config).run('select', write, files=[path])
+        with open(path, 'a') as f:
+            f.write('{}\n')
+        StageRunner(self.config).run('select', write, files=[path])
+        self.assertEqual(self.calls, ['write', 'write'])
+
+    def test_rejected_output_and_always_run_stages_rerun(self):
+        StageRunner(self.config).run('upload', self.stage('a'))
+        StageRunner(self.config).run('upload', self.stage('b'), validate=lambda output: False)
+        StageRunner(self.config).run('fetch', self.stage('c'), always_run=True)
+        StageRunner(self.config).run('fetch', self.stage('d'), always_run=True)
+        self.assertEqual(self.calls, ['a', 'b', 'c', 'd'])
+
+    def test_incomplete_output_is_not_reused(self):
+        _, first_hash = StageRunner(self.config).run('generate', self.stage('a'), complete=lambda output: False)
+        _, second_hash = StageRunner(self.config).run('generate', self.stage('b'), complete=lambda output: False)
+        StageRunner(self.config).run('generate', self.stage('c'), complete=lambda output: True)
+        StageRunner(self.config).run('generate', self.stage('d'), complete=lambda output: True)
+        self.assertEqual(self.calls, ['a', 'b', 'c'])
+        self.assertNotEqual(first_hash, second_hash)
+
+    def test_disabled_cache_always_runs(self):
+        self.config['stages']['enabled'] = False
+        StageRunner(self.config).run('process', self.stage('a'))
+        StageRunner(self.config).run('process', self.stage('b'))
+        self.assertEqual(self.calls, ['a', 'b'])
+
+class TestStagedPipeline(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config['stages'] = {'enabled': True, 'dir': os.path.join(self.temp_dir.name, 'stages')}
+        self.cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def make_processor(self):
+        processor = MagicMock()
+        processor.process_all.return_value = [{'prompt': 'p'}]
+        processor.deduplicate.side_effect = lambda data: data
+        processor.generate_refined_examples.return_value = [{'prompt': 'p', 'completion': 'c'}]
+        processor.create_fine_tuning_data.side_effect = lambda examples: examples
+        def save_as_jsonl(data, output_file):
+            with open(output_file, 'w') as f:
+                f.write('{"messages": []}\n')
+        processor.save_as_jsonl.side_effect = save_as_jsonl
+        processor.token_counter.count_examples.return_value = 10
+        return processor
+
+    def build(self, processor):
+        fetcher = MagicMock()
+        fetcher.fetch_all.return_value = ({'near/docs': [('README.md', '# NEAR')]}, {'https://near.org': 'text'})
+        return build_fine_tuning_data(self.config, fetcher, processor, stages=StageRunner(self.config))
+
+    def test_hyperparameter_change_reuses_data_and_upload(self):
+        processor = self.make_processor()
+        with FakeOpenAIServer() as server:
+            client = OpenAI(api_key='test', base_url=server.base_url, max_retries=0)
+            fine_tuner = FineTuner(self.config, client)
+            self.assertEqual(self.build(processor), 10)
+            first_ids = upload_training_data(self.config, fine_tuner, StageRunner(self.config))
+
+            self.config['fine_tuning']['n_epochs'] = 2
+            self.assertEqual(self.build(processor), 10)
+            second_ids = upload_training_data(self.config, fine_tuner, StageRunner(self.config))
+
+            self.assertEqual(first_ids, second_ids)
+            self.assertEqual(len(server.files), 1)
+        self.assertEqual(processor.process_all.call_count, 1)
+        self.assertEqual(processor.generate_refined_examples.call_count, 1)
+        self.assertEqual(processor.save_as_jsonl.call_count, 1)
+
+    def test_generation_change_reruns_downstream_only(self):
+        processor = self.make_processor()
+        self.build(processor)
+        self.config['openai']['temperature'] = 0.2
+        self.build(processor)
+        self.assertEqual(processor.process_all.call_count, 1)
+        self.assertEqual(processor.generate_refined_examples.call_count, 2)
+        self.assertEqual(processor.save_as_jsonl.call_count, 2)
+
+    def test_failed_prompts_are_generated_again(self):
+        processor = self.make_processor()
+        processor.process_all.return_value = [{'prompt': 'p'}, {'prompt': 'q'}]
+        self.build(processor)
+        self.build(processor)
+        self.assertEqual(processor.generate_refined_examples.call_count, 2)
+        self.assertEqual(processor.save_as_jsonl.call_count, 2)
+
+    def test_generation_mode_change_reruns_generation(self):
+        processor = self.make_processor()
+        self.build(processor)
+        self.config['example_generation']['mode'] = 'single'
+        self.build(processor)
+        self.assertEqual(processor.generate_refined_examples.call_count, 2)
+
+    def test_deleted_upload_is_sent_again(self):
+        self.build(self.make_processor())
+        with FakeOpenAIServer() as server:
+            client = OpenAI(api_key='test', base_url=server.base_url, max_retries=0)
+            fine_tuner = FineTuner(self.config, client)
+            first_ids = upload_training_data(self.config, fine_tuner, StageRunner(self.config))
+            server.files.clear()
+            second_ids = upload_training_data(self.config, fine_tuner, StageRunner(self.config))
+        self.assertNotEqual(first_ids, second_ids)
+
+if __name__ == '__main__':
+    unittest.main()
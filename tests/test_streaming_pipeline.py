@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from openai import OpenAI
+from helpers import BYTE_ENCODING
+from fake_openai import FakeOpenAIServer
+from fine_tuning.data_processors import DataProcessor
+from fine_tuning.pipeline import StreamingPipeline
+from fine_tuning.config import load_config
+
+@patch('tiktoken.encoding_for_model', return_value=BYTE_ENCODING)
+@patch('tiktoken.get_encoding', return_value=BYTE_ENCODING)
+class TestStreamingPipeline(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.config['data_processing']['max_tokens'] = 8
+        self.config['pipeline'] = {'queue_size': 2}
+        self.config['example_generation']['max_concurrency'] = 2
+        self.config['example_generation']['mode'] = 'single'
+        self.config['data_processing']['dedup'] = {'enabled': False}
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_file = os.path.join(self.temp_dir.name, 'fine_tuning_data.jsonl')
+        self.config['cache']['completions'] = {'enabled': False}
+        self.config['example_generation']['journal'] = os.path.join(self.temp_dir.name, 'journal.jsonl')
+
+        self.data_fetcher = MagicMock()
+        self.data_fetcher.iter_sources.side_effect = lambda repos, urls: iter([
+            ('repo', 'near/docs', [(f'docs/page{i}.md', f'NEAR page {i}') for i in range(20)]),
+            ('repo', 'near/neps', None),
+            ('article', 'https://near.org/blog/', 'Nightshade sharding design'),
+        ])
+        self.server = FakeOpenAIServer().start()
+        self.data_processor = self.make_processor()
+
+    def tearDown(self):
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def make_processor(self):
+        return DataProcessor(OpenAI(api_key='test', base_url=self.server.base_url), self.config)
+
+    def run_pipeline(self, resume=False):
+        return StreamingPipeline(self.data_fetcher, self.data_processor, self.config).run(self.output_file, resume=resume)
+
+    def completion_requests(self):
+        return self.server.count_requests('/v1/chat/completions')
+
+    def read_output(self):
+        with open(self.output_file, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_streams_every_prompt_to_jsonl(self, mock_get_encoding, mock_encoding_for_model):
+        written, total_tokens = self.run_pipeline()
+
+        examples = self.read_output()
+        # 20 repository files of two 8-byte chunks each plus four article chunks
+        self.assertEqual(written, 44)
+        self.assertEqual(len(examples), written)
+        self.assertGreater(total_tokens, 0)
+        for example in examples:
+            prompt, response = (message['content'] for message in example['messages'])
+            self.assertEqual(response, f'Response to: {prompt}')
+
+    def test_stops_at_target_examples(self, mock_get_encoding, mock_encoding_for_model):
+        self.config['fine_tuning']['target_examples'] = 5
+        written, _ = self.run_pipeline()
+
+        self.assertEqual(written, 5)
+        self.assertEqual(len(self.read_output()), 5)
+        # Bounded queues keep generation from running far ahead of the writer
+        self.assertLess(self.completion_requests(), 44)
+
+    def test_duplicate_prompts_are_dropped(self, mock_get_encoding, mock_encoding_for_model):
+        self.config['data_processing']['dedup'] = {'enabled': True}
+        self.data_processor = self.make_processor()
+        written, _ = self.run_pipeline()
+
+        # Every file starts with the same 8-byte chunk "NEAR pag"; only its first copy is kept
+        self.assertEqual(written, 44 - 19)
+
+    def test_rate_limited_prompts_are_retried(self, mock_get_encoding, mock_encoding_for_model):
+        self.server.rate_limit_first = 3
+        written, _ = self.run_pipeline()
+
+        self.assertEqual(written, 44)
+        self.assertEqual(self.completion_requests(), 44 + 3)
+
+    def test_failed_generations_are_skipped(self, mock_get_encoding, mock_encoding_for_model):
+        self.config['example_generation']['max_retries'] = 0
+        self.server.rate_limit_first = 1000
+        written, _ = self.run_pipeline()
+
+        self.assertEqual(written, 0)
+
+    def test_resume_replays_the_journal(self, mock_get_encoding, mock_encoding_for_model):
+        self.run_pipeline()
+        with open(self.config['example_generation']['journal'], encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 44)
+
+        written, _ = self.run_pipeline(resume=True)
+
+        self.assertEqual(written, 44)
+        self.assertEqual(self.completion_requests(), 44)
+
+    def test_packed_mode_shares_requests(self, mock_get_encoding, mock_encoding_for_model):
+        self.config['example_generation']['mode'] = 'packed'
+        self.config['example_generation']['batch_size'] = 4
+        written, _ = self.run_pipeline()
+
+        examples = self.read_output()
+        self.assertEqual(written, 44)
+        self.assertEqual(self.completion_requests(), 44 // 4)
+        for example in examples:
+            prompt, response = (message['content'] for message in example['messages'])
+            self.assertEqual(response, f'Response to: {prompt}')
+
+    def test_packed_mode_falls_back_to_single_prompts(self, mock_get_encoding, mock_encoding_for_model):
+        self.config['example_generation']['mode'] = 'packed'
+        self.config['example_generation']['batch_size'] = 4
+        self.server.drop_packed_responses = 1
+        written, _ = self.run_pipeline()
+
+        self.assertEqual(written, 44)
+        self.assertEqual(self.completion_requests(), 44 // 4 + 11)
+
+    def test_warns_that_batch_backend_is_not_streamed(self, mock_get_encoding, mock_encoding_for_model):
+        self.config['example_generation']['backend'] = 'batch'
+        with self.assertLogs(level='WARNING') as logs:
+            written, _ = self.run_pipeline()
+
+        self.assertEqual(written, 44)
+        self.assertTrue(any('--stream' in line for line in logs.output))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from openai import OpenAI
+from fake_openai import FakeOpenAIServer
+from fine_tuning.fine_tuning import FineTuner
+from fine_tuning.sweep import SweepOrchestrator, expand_sweep
+from fine_tuning.config import load_config
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.results_file = os.path.join(self.temp_dir.name, 'sweep_results.csv')
+        self.config['fine_tuning']['monitoring'] = {'min_interval': 0, 'max_interval': 0.01}
+        self.config['fine_tuning']['sweep'] = {
+            'parameters': {'n_epochs': [2, 4], 'learning_rate_multiplier': [0.05, 0.1]},
+            'max_concurrent_jobs': 2,
+            'retry_interval': 0.01,
+            'results_file': self.results_file,
+        }
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_expand_sweep(self):
+        self.assertEqual(expand_sweep({'n_epochs': [2, 4], 'learning_rate_multiplier': [0.1]}), [
+            {'n_epochs': 2, 'learning_rate_multiplier': 0.1},
+            {'n_epochs': 4, 'learning_rate_multiplier': 0.1},
+        ])
+
+    def run_sweep(self, server, num_files=1):
+        client = OpenAI(api_key='test', base_url=server.base_url, max_retries=0)
+        file_ids = [client.files.create(file=('train.jsonl', b'{}\n'), purpose='fine-tune').id for _ in range(num_files)]
+        return SweepOrchestrator(FineTuner(self.config, client), self.config).run(file_ids)
+
+    def test_every_combination_runs_within_the_job_limit(self):
+        with FakeOpenAIServer(job_steps=2, max_running_jobs=2) as server:
+            results = self.run_sweep(server)
+
+        self.assertEqual([row['status'] for row in results], ['succeeded'] * 4)
+        self.assertEqual(len(server.jobs), 4)
+        submitted = sorted(json.dumps(state['job']['hyperparameters'], sort_keys=True) for state in server.jobs.values())
+        self.assertEqual(submitted, sorted(json.dumps(run, sort_keys=True) for run in expand_sweep(
+            self.config['fine_tuning']['sweep']['parameters'])))
+
+        with open(self.results_file, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(json.loads(rows[0]['hyperparameters']), {'n_epochs': 2, 'learning_rate_multiplier': 0.05})
+        self.assertEqual(float(rows[0]['final_train_loss']), 0.5)
+
+    def test_job_limit_rejections_are_retried(self):
+        self.config['fine_tuning']['sweep']['max_concurrent_jobs'] = 4
+        with FakeOpenAIServer(job_steps=2, max_running_jobs=1) as server:
+            results = self.run_sweep(server)
+
+        self.assertEqual([row['status'] for row in results], ['succeeded'] * 4)
+
+    def test_sharded_runs_need_sequential_training(self):
+        with FakeOpenAIServer(job_steps=1) as server:
+            results = self.run_sweep(server, num_files=2)
+
+        self.assertEqual([row['status'] for row in results], ['error'] * 4)
+        self.assertEqual(server.jobs, {})
+
+    def test_sharded_runs_train_epoch_by_epoch(self):
+        self.config['fine_tuning']['upload'] = {'sequential_training': True}
+        self.config['fine_tuning']['sweep']['parameters'] = {'n_epochs': [2]}
+        with FakeOpenAIServer(job_steps=1) as server:
+            row, = self.run_sweep(server, num_files=2)
+
+        jobs = [server.jobs[job_id]['job'] for job_id in row['job_ids']]
+        self.assertEqual(len(jobs), 4)
+        self.assertEqual([job['hyperparameters']['n_epochs'] for job in jobs], [1] * 4)
+        self.assertEqual(jobs[2]['training_file'], jobs[0]['training_file'])
+        for previous, job in zip(jobs, jobs[1:]):
+            self.assertEqual(job['model'], previous['fine_tuned_model'])
+        self.assertEqual(row['fine_tuned_model'], jobs[-1]['fine_tuned_model'])
+
+    def test_continued_models_must_come_from_the_base_model(self):
+        with FakeOpenAIServer() as server:
+            client = OpenAI(api_key='test', base_url=server.base_url, max_retries=0)
+            file_id = client.files.create(file=('train.jsonl', b'{}\n'), purpose='fine-tune').id
+            with self.assertRaises(ValueError):
+                FineTuner(self.config, client).create_fine_tune_job(file_id, model='ft:davinci-002:org::abc')
+            self.assertEqual(server.jobs, {})
+
+if __name__ == '__main__':
+    unittest.main()
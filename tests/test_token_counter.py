@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from helpers import BYTE_ENCODING
+from fine_tuning.data_processors import DataProcessor
+from fine_tuning.token_counter import TokenCounter
+from fine_tuning.utils import num_tokens_from_messages
+from fine_tuning.config import load_config
+
+def make_example(i):
+    return {
+        "messages": [
+            {"role": "user", "content": f"How do I deploy contract {i}?"},
+            {"role": "assistant", "content": f"Run `near deploy` for contract {i}."}
+        ]
+    }
+
+@patch('tiktoken.encoding_for_model', return_value=BYTE_ENCODING)
+class TestTokenCounter(unittest.TestCase):
+    def test_counts_match_num_tokens_from_messages(self, mock_encoding_for_model):
+        counter = TokenCounter()
+        examples = [make_example(i) for i in range(10)]
+
+        total = counter.count_examples(examples)
+
+        expected = [num_tokens_from_messages(example['messages']) for example in examples]
+        self.assertEqual([example['_num_tokens'] for example in examples], expected)
+        self.assertEqual(total, sum(expected))
+        self.assertEqual(counter.count_messages(examples[0]['messages']), expected[0])
+
+    def test_encoder_is_loaded_once_per_model(self, mock_encoding_for_model):
+        counter = TokenCounter()
+        for i in range(5):
+            counter.count_messages(make_example(i)['messages'])
+
+        mock_encoding_for_model.assert_called_once_with("gpt-4o-2024-08-06")
+
+    def test_counts_are_memoized_on_examples(self, mock_encoding_for_model):
+        counter = TokenCounter()
+        example = make_example(0)
+        example['_num_tokens'] = 7
+
+        self.assertEqual(counter.count_example(example), 7)
+        self.assertEqual(counter.count_examples([example, make_example(1)]), 7 + num_tokens_from_messages(make_example(1)['messages']))
+
+@patch('tiktoken.encoding_for_model', return_value=BYTE_ENCODING)
+class TestFineTuningDataBudget(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.data_processor = DataProcessor(None, self.config)
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_token_budget_uses_memoized_counts(self, mock_encoding_for_model):
+        examples = [make_example(i) for i in range(10)]
+        self.config['fine_tuning']['max_tokens'] = num_tokens_from_messages(examples[0]['messages']) * 3
+
+        fine_tuning_data = self.data_processor.create_fine_tuning_data(examples)
+
+        self.assertEqual(len(fine_tuning_data), 3)
+        self.assertTrue(all('_num_tokens' in example for example in fine_tuning_data))
+
+    def test_saved_examples_omit_token_counts(self, mock_encoding_for_model):
+        example = make_example(0)
+        self.data_processor.token_counter.count_example(example)
+        output_file = os.path.join(self.temp_dir.name, 'fine_tuning_data.jsonl')
+
+        self.data_processor.save_as_jsonl([example], output_file=output_file)
+
+        with open(output_file, encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline()), make_example(0))
+
+if __name__ == '__main__':
+    unittest.main()
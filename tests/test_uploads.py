@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+import unittest
+import openai
+from openai import OpenAI
+from fake_openai import FakeOpenAIServer
+from fine_tuning.fine_tuning import FineTuner
+from fine_tuning.uploads import MultipartUploader, shard_jsonl, MB
+from fine_tuning.config import load_config
+
+def write_dataset(path, count):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            example = {"messages": [{"role": "user", "content": f"Prompt {i}"}, {"role": "assistant", "content": "A" * 100}]}
+            f.write(json.dumps(example) + '\n')
+
+class TestShardJsonl(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'fine_tuning_data.jsonl')
+        write_dataset(self.file_path, 100)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_small_file_is_not_split(self):
+        self.assertEqual(shard_jsonl(self.file_path, os.path.getsize(self.file_path)), [self.file_path])
+
+    def test_large_file_is_split_at_line_boundaries(self):
+        size = os.path.getsize(self.file_path)
+        shard_paths = shard_jsonl(self.file_path, size // 3 + 200)
+
+        self.assertEqual(len(shard_paths), 3)
+        self.assertTrue(shard_paths[0].endswith('fine_tuning_data.part01.jsonl'))
+        lines = []
+        for shard_path in shard_paths:
+            self.assertLessEqual(os.path.getsize(shard_path), size // 3 + 200)
+            with open(shard_path, encoding='utf-8') as f:
+                lines.extend(f.readlines())
+        with open(self.file_path, encoding='utf-8') as f:
+            self.assertEqual(lines, f.readlines())
+
+class TestMultipartUploader(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.config['fine_tuning']['upload'] = {'part_size_mb': 1024 / MB, 'max_workers': 4, 'retry_delay': 0.01}
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'fine_tuning_data.jsonl')
+        write_dataset(self.file_path, 50)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read_dataset(self):
+        with open(self.file_path, 'rb') as f:
+            return f.read()
+
+    def test_parts_are_assembled_in_order(self):
+        with FakeOpenAIServer() as server:
+            uploader = MultipartUploader(OpenAI(api_key='test', base_url=server.base_url), self.config)
+            file_id = uploader.upload(self.file_path)
+
+        self.assertEqual(server.files[file_id][1], self.read_dataset())
+        self.assertGreater(server.count_requests(f"/v1/uploads/{list(server.uploads)[0]}/parts"), 1)
+        self.assertFalse(os.path.exists(f"{self.file_path}.upload.json"))
+
+    def test_failed_parts_are_retried(self):
+        with FakeOpenAIServer(fail_parts_first=3) as server:
+            client = OpenAI(api_key='test', base_url=server.base_url, max_retries=0)
+            file_id = MultipartUploader(client, self.config).upload(self.file_path)
+
+        self.assertEqual(server.files[file_id][1], self.read_dataset())
+
+    def test_interrupted_upload_resumes_missing_parts(self):
+        self.config['fine_tuning']['upload']['max_retries'] = 0
+        with FakeOpenAIServer(fail_parts_first=2) as server:
+            client = OpenAI(api_key='test', base_url=server.base_url, max_retries=0)
+            with self.assertRaises(openai.InternalServerError):
+                MultipartUploader(client, self.config).upload(self.file_path)
+            with open(f"{self.file_path}.upload.json", encoding='utf-8') as f:
+                sent_parts = len(json.load(f)['parts'])
+            upload_id = list(server.uploads)[0]
+            parts_before = server.count_requests(f"/v1/uploads/{upload_id}/parts")
+
+            file_id = MultipartUploader(client, self.config).upload(self.file_path)
+
+            num_parts = -(-len(self.read_dataset()) // 1024)
+            self.assertEqual(server.count_requests(f"/v1/uploads/{upload_id}/parts") - parts_before, num_parts - sent_parts)
+            self.assertEqual(len(server.uploads), 1)
+        self.assertEqual(server.files[file_id][1], self.read_dataset())
+
+class TestUploadTrainingFiles(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config('config.yaml')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'fine_tuning_data.jsonl')
+        write_dataset(self.file_path, 100)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_oversized_dataset_is_uploaded_as_several_files(self):
+        size = os.path.getsize(self.file_path)
+        self.config['fine_tuning']['upload'] = {
+            'max_file_mb': (size // 2 + 200) / MB,
+            'multipart_threshold_mb': 4096 / MB,
+            'part_size_mb': 4096 / MB,
+        }
+        with FakeOpenAIServer() as server:
+            fine_tuner = FineTuner(self.config, OpenAI(api_key='test', base_url=server.base_url))
+            file_ids = fine_tuner.upload_training_files(self.file_path)
+
+        self.assertEqual(len(file_ids), 2)
+        # Both shards exceed the multipart threshold
+        self.assertEqual(server.count_requests('/v1/uploads'), 2)
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(b''.join(server.files[file_id][1] for file_id in file_ids), f.read())
+
+if __name__ == '__main__':
+    unittest.main()